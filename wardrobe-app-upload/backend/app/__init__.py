@@ -1,3 +1,10 @@
-﻿from .main import app
+﻿__all__ = ["app"]
 
-__all__ = ["app"]
+
+def __getattr__(name: str):
+    # Lazy so tools importing app.* submodules do not build the whole FastAPI app.
+    if name == "app":
+        from .main import app
+
+        return app
+    raise AttributeError(name)
@@ -0,0 +1,36 @@
+﻿from __future__ import annotations
+
+import hashlib
+from collections.abc import Callable
+
+from fastapi import Request, Response
+
+# Clients may keep a copy but must revalidate it (cheaply, via If-None-Match) before reuse.
+REVALIDATE = "private, no-cache"
+NO_STORE = "no-store"
+
+
+def make_etag(*parts: object) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so a W/ prefix on either side is ignored.
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def conditional_response(request: Request, etag: str, build: Callable[[], Response]) -> Response:
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    response = build()
+    response.headers.update(headers)
+    return response
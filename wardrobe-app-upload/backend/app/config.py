@@ -1,6 +1,6 @@
 ﻿from functools import lru_cache
 
-from pydantic import Field
+from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -16,6 +16,75 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 60 * 24 * 7
 
     database_url: str = "sqlite:///./backend/wardrobe.db"
+    # Run schema upgrades in the app lifespan; disable when migrations run as a separate step.
+    auto_migrate: bool = True
+    # With shard_count > 0 each user's items, tags, change log and ingest jobs live in shard
+    # user_id % shard_count, one SQLite file per shard, so writes for different users stop
+    # contending for one database lock; accounts stay in database_url. Changing the count
+    # needs tools/rebalance_shards.py to move existing rows.
+    shard_count: int = 0
+    shard_url_template: str = "sqlite:///./backend/wardrobe-shard{shard}.db"
+
+    # Max Hamming distance between 64-bit perceptual hashes for two uploads to count as duplicates.
+    duplicate_hash_distance: int = 6
+    # dHash only sees luminance structure, so matches must also be this close in weighted HSL.
+    duplicate_color_distance: float = 8.0
+
+    # Uploads sent with "Prefer: respond-async" are queued and analyzed by in-process worker threads.
+    ingest_workers: int = 2
+    ingest_max_attempts: int = 5
+    # Retry n waits ingest_retry_base_seconds * 2**(n - 1).
+    ingest_retry_base_seconds: float = 2.0
+    # How long a claimed job may run before another worker assumes its owner crashed.
+    ingest_lease_seconds: float = 60.0
+    ingest_poll_seconds: float = 1.0
+
+    # Longest single NDJSON line POST /items/import accepts (one item with its image).
+    import_max_line_bytes: int = 16 * 1024 * 1024
+
+    # Prometheus text at {api_prefix}/metrics plus per-request latency histograms.
+    metrics_enabled: bool = True
+    # Adds a Server-Timing header (total and hot-path timers) to every response.
+    server_timing: bool = True
+
+    # Count queries, rows and bytes per request; log queries slower than slow_query_ms.
+    query_tracing: bool = True
+    slow_query_ms: float = 200.0
+    # Fail requests that exceed their declared query budget instead of logging them. Test-only:
+    # the query over budget raises and rolls back, but a route that committed before it keeps
+    # its write (create and delete commit before refreshing), so never enable it in production.
+    query_budget_strict: bool = False
+
+    # Advertised at {api_prefix}/upload/policy so clients resize and re-encode before uploading.
+    # Uploads and analyze requests outside it are rejected before the image is decoded
+    # (413 too many bytes, 422 too large or wrong format) unless upload_policy_enforced is off.
+    upload_max_dimension: int = 1280
+    upload_max_bytes: int = 2 * 1024 * 1024
+    upload_format: str = "image/webp"
+    # For browsers whose canvas cannot encode upload_format; both keep transparency.
+    upload_fallback_format: str = "image/png"
+    upload_quality: float = 0.85
+    upload_accepted_formats: str = "image/webp,image/png,image/jpeg"
+    upload_policy_enforced: bool = True
+
+    # Token buckets as "<requests>/<seconds>" (bursts up to <requests>); "" disables a rule.
+    # The default applies per user (or IP when anonymous) to every API call; the rest add a
+    # bucket for expensive routes. Login is limited per IP.
+    rate_limit_enabled: bool = True
+    rate_limit_default: str = "300/60"
+    rate_limit_upload: str = "30/60"
+    rate_limit_analyze: str = "30/60"
+    rate_limit_recommend: str = "60/60"
+    rate_limit_login: str = "10/60"
+    # Load shedding: at most max_in_flight API requests run at once; a request that waits longer
+    # than max_queue_seconds for a slot gets 503 + Retry-After. 0 disables the limit.
+    max_in_flight: int = 64
+    max_queue_seconds: float = 2.0
+    # Proxies trusted to set X-Forwarded-For (comma-separated addresses or networks). The client
+    # is the rightmost hop not listed here, so a header the client sends itself cannot choose its
+    # rate-limit bucket. Behind a hosting proxy it must be listed or every visitor shares the
+    # proxy's bucket. "*" is refused: it would believe the leftmost, client-written hop.
+    trusted_proxies: str = "127.0.0.1,::1"
 
     cors_origins: str = (
         "http://localhost:8000,http://127.0.0.1:8000,"
@@ -30,10 +99,21 @@ class Settings(BaseSettings):
     qq_app_secret: str = ""
     qq_redirect_uri: str = "http://localhost:8000/api/auth/qq/callback"
 
+    @field_validator("trusted_proxies")
+    @classmethod
+    def _no_wildcard_proxy(cls, value: str) -> str:
+        if "*" in value:
+            raise ValueError("list the proxy addresses or networks; '*' trusts client-written X-Forwarded-For")
+        return value
+
     @property
     def cors_origin_list(self) -> list[str]:
         return [item.strip() for item in self.cors_origins.split(",") if item.strip()]
 
+    @property
+    def upload_accepted_format_list(self) -> list[str]:
+        return [item.strip() for item in self.upload_accepted_formats.split(",") if item.strip()]
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
@@ -1,22 +1,106 @@
-﻿from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+﻿from functools import lru_cache
+
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.sql.util import find_tables
 
 from .config import get_settings
+from .query_tracing import install_query_tracing
+
+# Per-user tables; with shard_count > 0 they live in the user's shard, everything else
+# (users) stays in database_url.
+SHARDED_TABLES = frozenset(
+    {"clothing_items", "clothing_item_tags", "item_changes", "ingest_jobs", "wardrobe_counts", "wardrobe_versions"}
+)
+
+
+class RoutingSession(Session):
+    """Sends sharded tables to the shard chosen by route_session(), the rest to the main engine."""
 
-settings = get_settings()
+    def get_bind(self, mapper=None, clause=None, **kw):
+        shards = get_shard_engines()
+        if shards and _touches_sharded_table(mapper, clause):
+            shard = self.info.get("shard")
+            if shard is None:
+                raise RuntimeError("Session used a sharded table before route_session() picked a user")
+            return shards[shard]
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
 
-connect_args = {}
-if settings.database_url.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
 
-engine = create_engine(settings.database_url, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _touches_sharded_table(mapper, clause) -> bool:
+    if mapper is not None:
+        return mapper.persist_selectable.name in SHARDED_TABLES
+    if clause is not None:
+        return any(getattr(table, "name", None) in SHARDED_TABLES for table in find_tables(clause, include_crud=True))
+    return False
+
+
+# Bound on first use by get_engine(), so importing the app never opens the database.
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
 Base = declarative_base()
 
 
+def _create_engine(url: str) -> Engine:
+    settings = get_settings()
+
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args = {"check_same_thread": False}
+
+    engine = create_engine(url, connect_args=connect_args)
+    if settings.query_tracing:
+        install_query_tracing(engine)
+    return engine
+
+
+@lru_cache(maxsize=1)
+def get_engine() -> Engine:
+    engine = _create_engine(get_settings().database_url)
+    SessionLocal.configure(bind=engine)
+    return engine
+
+
+@lru_cache(maxsize=1)
+def get_shard_engines() -> tuple[Engine, ...]:
+    settings = get_settings()
+    return tuple(
+        _create_engine(settings.shard_url_template.format(shard=shard)) for shard in range(settings.shard_count)
+    )
+
+
+def all_engines() -> list[Engine]:
+    return [get_engine(), *get_shard_engines()]
+
+
+def shard_for_user(user_id: int) -> int | None:
+    shard_count = get_settings().shard_count
+    return user_id % shard_count if shard_count > 0 else None
+
+
+def all_shards() -> list[int | None]:
+    shard_count = get_settings().shard_count
+    return list(range(shard_count)) if shard_count > 0 else [None]
+
+
+def route_session(db: Session, user_id: int) -> Session:
+    db.info["shard"] = shard_for_user(user_id)
+    return db
+
+
+def user_session(user_id: int, **kwargs) -> Session:
+    """A new session already routed to the user's shard."""
+    return shard_session(shard_for_user(user_id), **kwargs)
+
+
+def shard_session(shard: int | None, **kwargs) -> Session:
+    get_engine()
+    return SessionLocal(info={"shard": shard}, **kwargs)
+
+
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        db.close()
@@ -3,7 +3,7 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from .config import get_settings
-from .database import get_db
+from .database import get_db, route_session
 from .models import User
 from .security import decode_token
 
@@ -22,4 +22,6 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
+    # Every later query in this request is about this user's wardrobe.
+    route_session(db, user.id)
     return user
@@ -1,44 +1,95 @@
-﻿from pathlib import Path
+﻿from contextlib import asynccontextmanager
+from pathlib import Path
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
 from .config import get_settings
-from .database import Base, engine
-from .routers import auth, items, recommend
+from .metrics import MetricsMiddleware, metrics
+from .query_tracing import QueryTracingMiddleware
+from .rate_limit import RateLimitMiddleware
+from .upload_policy import UploadSizeLimitMiddleware, max_upload_body_bytes
+from .migrations import migrate_all
+from .routers import auth, items, jobs, recommend, upload
+from .services.ingest_queue import workers as ingest_workers
+from .static_assets import StaticAssetIndex, frontend_root
 
 settings = get_settings()
 
-app = FastAPI(title=settings.app_name, debug=settings.debug)
 
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Schema work happens once per process start, not at import time (keeps imports and test
+    # collection fast). Set AUTO_MIGRATE=false to run `python -m app.migrations` separately.
+    if settings.auto_migrate:
+        migrate_all()
+    ingest_workers.start(settings.ingest_workers, settings.ingest_poll_seconds)
+    yield
+    ingest_workers.stop()
+
+
+app = FastAPI(title=settings.app_name, debug=settings.debug, lifespan=lifespan)
+
+if settings.rate_limit_enabled:
+    # Innermost, so CORS headers still reach browsers on 429/503.
+    app.add_middleware(
+        RateLimitMiddleware,
+        api_prefix=settings.api_prefix,
+        default_rate=settings.rate_limit_default,
+        route_rates={
+            ("POST", "/items"): ("upload", settings.rate_limit_upload),
+            ("POST", "/items/analyze"): ("analyze", settings.rate_limit_analyze),
+            ("GET", "/recommend"): ("recommend", settings.rate_limit_recommend),
+            ("POST", "/auth/login"): ("login", settings.rate_limit_login),
+        },
+        max_in_flight=settings.max_in_flight,
+        max_queue_seconds=settings.max_queue_seconds,
+        exempt=("/health", "/metrics"),
+    )
+
+if settings.upload_policy_enforced:
+    app.add_middleware(
+        UploadSizeLimitMiddleware,
+        paths={("POST", f"{settings.api_prefix}/items"), ("POST", f"{settings.api_prefix}/items/analyze")},
+        max_body_bytes=max_upload_body_bytes(settings),
+    )
+
+# Outside the limiters: they see the real client address, taken from X-Forwarded-For only when
+# the connecting peer is a trusted proxy, as the rightmost hop that is not one.
+app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=settings.trusted_proxies)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origin_list or ["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Location", "Preference-Applied", "Retry-After", "Server-Timing"],
 )
+if settings.query_tracing:
+    app.add_middleware(
+        QueryTracingMiddleware, strict=settings.query_budget_strict, server_timing=settings.server_timing
+    )
+if settings.metrics_enabled:
+    # Added last so it is outermost and its latency includes every other middleware.
+    app.add_middleware(MetricsMiddleware, server_timing=settings.server_timing)
 
 app.include_router(auth.router, prefix=settings.api_prefix)
 app.include_router(items.router, prefix=settings.api_prefix)
+app.include_router(jobs.router, prefix=settings.api_prefix)
 app.include_router(recommend.router, prefix=settings.api_prefix)
-
-# Ensure tables exist for both runtime and local test clients.
-Base.metadata.create_all(bind=engine)
-
+app.include_router(upload.router, prefix=settings.api_prefix)
 
 frontend_dir = Path(__file__).resolve().parents[2] / "frontend"
-if frontend_dir.exists():
-    app.mount("/assets", StaticFiles(directory=frontend_dir / "assets"), name="assets")
+static_assets = StaticAssetIndex(frontend_root(frontend_dir))
 
 
 @app.get("/", include_in_schema=False)
-def root():
-    index_path = frontend_dir / "index.html"
-    if index_path.exists():
-        return FileResponse(index_path)
+def root(request: Request):
+    index = static_assets.get("index.html")
+    if index is not None:
+        return static_assets.respond(request, index)
     return {"message": "Wardrobe backend is running"}
 
 
@@ -47,13 +98,24 @@ def health_check():
     return {"status": "ok", "service": settings.app_name}
 
 
+if settings.metrics_enabled:
+
+    @app.get(f"{settings.api_prefix}/metrics", include_in_schema=False)
+    def metrics_endpoint():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/{file_path:path}", include_in_schema=False)
-def static_files(file_path: str):
+def static_files(file_path: str, request: Request):
     if file_path.startswith(settings.api_prefix.strip("/") + "/") or file_path == settings.api_prefix.strip("/"):
         raise HTTPException(status_code=404, detail="API route not found")
 
-    # SPA fallback: serve frontend files when available.
-    candidate = frontend_dir / file_path
-    if frontend_dir.exists() and candidate.exists() and candidate.is_file():
-        return FileResponse(candidate)
-    return FileResponse(frontend_dir / "index.html")
+    asset = static_assets.get(file_path)
+    if asset is not None:
+        return static_assets.respond(request, asset)
+
+    # SPA fallback only for extension-less routes; a missing asset file is a real 404.
+    index = static_assets.get("index.html")
+    if index is None or "." in file_path.rsplit("/", 1)[-1]:
+        raise HTTPException(status_code=404, detail="Not found")
+    return static_assets.respond(request, index)
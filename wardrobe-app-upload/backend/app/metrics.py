@@ -0,0 +1,187 @@
+﻿from __future__ import annotations
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Upper bounds in seconds, Prometheus-style (an implicit +Inf bucket follows).
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Timers finished while handling the current request, as (name, seconds), for Server-Timing.
+_request_timings: ContextVar[list[tuple[str, float]] | None] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class MetricsRegistry:
+    """Process-local request and timer metrics rendered in the Prometheus text format.
+
+    One lock guards plain ints and floats, so recording costs a dict lookup and a bisect.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests: dict[tuple[str, str], Histogram] = {}
+        self._statuses: dict[tuple[str, str, int], int] = {}
+        # Keyed by method only: the route is not known until routing has run.
+        self._in_flight: dict[str, int] = {}
+        self._timers: dict[str, Histogram] = {}
+
+    def request_started(self, method: str) -> None:
+        with self._lock:
+            self._in_flight[method] = self._in_flight.get(method, 0) + 1
+
+    def request_finished(self, method: str, route: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self._in_flight[method] -= 1
+            histogram = self._requests.get((method, route))
+            if histogram is None:
+                histogram = self._requests[(method, route)] = Histogram()
+            histogram.observe(seconds)
+            status_key = (method, route, status)
+            self._statuses[status_key] = self._statuses.get(status_key, 0) + 1
+
+    def observe_timer(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._timers.get(name)
+            if histogram is None:
+                histogram = self._timers[name] = Histogram()
+            histogram.observe(seconds)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP http_requests_in_flight Requests currently being handled.",
+                "# TYPE http_requests_in_flight gauge",
+            ]
+            for method, value in sorted(self._in_flight.items()):
+                lines.append(f'http_requests_in_flight{{method="{method}"}} {value}')
+
+            lines += ["# HELP http_requests_total Finished requests.", "# TYPE http_requests_total counter"]
+            for (method, route, status), value in sorted(self._statuses.items()):
+                lines.append(
+                    f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {value}'
+                )
+
+            lines += [
+                "# HELP http_request_duration_seconds Request latency by route template.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for (method, route), histogram in sorted(self._requests.items()):
+                labels = f'method="{method}",route="{_escape(route)}"'
+                lines += _histogram_lines("http_request_duration_seconds", labels, histogram)
+
+            lines += [
+                "# HELP wardrobe_operation_duration_seconds Hot-path operation latency.",
+                "# TYPE wardrobe_operation_duration_seconds histogram",
+            ]
+            for name, histogram in sorted(self._timers.items()):
+                lines += _histogram_lines("wardrobe_operation_duration_seconds", f'operation="{name}"', histogram)
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(metric: str, labels: str, histogram: Histogram) -> list[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    cumulative += histogram.counts[-1]
+    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {cumulative}')
+    lines.append(f"{metric}_sum{{{labels}}} {histogram.total:.6f}")
+    lines.append(f"{metric}_count{{{labels}}} {cumulative}")
+    return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+metrics = MetricsRegistry()
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe_timer(name, elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def timed(name: str) -> Callable[[F], F]:
+    def decorate(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with timer(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: per-route latency and in-flight counts, plus a Server-Timing header.
+
+    Server-Timing lists the whole request ("app") and every timer that finished before the
+    response headers went out; the route label is the matched path template, not the raw path.
+    """
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        timings: list[tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        status = 500
+        start = time.perf_counter()
+        metrics.request_started(method)
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    elapsed = time.perf_counter() - start
+                    entries = [f"app;dur={elapsed * 1000:.1f}"]
+                    entries += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings]
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            metrics.request_finished(
+                method, getattr(route, "path", "<unmatched>"), status, time.perf_counter() - start
+            )
+            _request_timings.reset(token)
@@ -0,0 +1,173 @@
+﻿from __future__ import annotations
+
+import json
+from collections import Counter
+from collections.abc import Callable
+
+from sqlalchemy import Connection, Engine, Table, inspect, text
+
+from . import models  # noqa: F401  (registers every table on Base.metadata)
+from .database import SHARDED_TABLES, Base, get_engine, get_shard_engines
+from .services.image_analysis import decode_base64_image, image_digest, perceptual_hash
+from .services.tagging import split_tags, tag_mask
+from .services.wardrobe_summary import summary_keys
+
+
+def migrate_all() -> None:
+    """Upgrade the main database and, when sharding is on, every shard with its own tables."""
+    shards = get_shard_engines()
+    if not shards:
+        upgrade_schema(get_engine())
+        return
+
+    upgrade_schema(get_engine(), [table for table in Base.metadata.sorted_tables if table.name not in SHARDED_TABLES])
+    for engine in shards:
+        upgrade_schema(engine, [table for table in Base.metadata.sorted_tables if table.name in SHARDED_TABLES])
+
+
+def upgrade_schema(engine: Engine, tables: list[Table] | None = None) -> None:
+    """Create missing tables and add columns introduced after a database was first created."""
+    tables = tables if tables is not None else Base.metadata.sorted_tables
+    existing_tables = set(inspect(engine).get_table_names())
+    Base.metadata.create_all(bind=engine, tables=tables)
+
+    inspector = inspect(engine)
+    # (table, column) for added columns, (table, None) for tables created just now.
+    added: set[tuple[str, str | None]] = {
+        (table.name, None) for table in tables if table.name not in existing_tables
+    }
+    with engine.begin() as conn:
+        for table in tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    # Quoted like create_all renders it; SQLite applies column affinity to '0'.
+                    default = str(column.server_default.arg).replace("'", "''")
+                    ddl += f" DEFAULT '{default}'"
+                conn.execute(text(ddl))
+                added.add((table.name, column.name))
+
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+        for key, backfill in _BACKFILLS.items():
+            if key in added:
+                backfill(conn)
+
+
+def _backfill_tags(conn: Connection) -> None:
+    rows = conn.execute(text("SELECT id, user_id, style_tags FROM clothing_items")).all()
+    for item_id, user_id, style_tags in rows:
+        tags = split_tags(style_tags or "")
+        conn.execute(
+            text("UPDATE clothing_items SET tag_mask = :mask WHERE id = :id"),
+            {"mask": tag_mask(tags), "id": item_id},
+        )
+        for tag in tags:
+            conn.execute(
+                text("INSERT INTO clothing_item_tags (item_id, tag, user_id) VALUES (:item_id, :tag, :user_id)"),
+                {"item_id": item_id, "tag": tag, "user_id": user_id},
+            )
+
+
+def _backfill_style_tag_lists(conn: Connection) -> None:
+    rows = conn.execute(text("SELECT id, style_tags FROM clothing_items")).all()
+    for item_id, style_tags in rows:
+        conn.execute(
+            text("UPDATE clothing_items SET style_tag_list = :tags WHERE id = :id"),
+            {"tags": json.dumps(split_tags(style_tags or "")), "id": item_id},
+        )
+
+
+def _backfill_image_hashes(conn: Connection) -> None:
+    item_ids = conn.execute(text("SELECT id FROM clothing_items")).scalars().all()
+    for item_id in item_ids:
+        # One row at a time so large wardrobes never hold every image in memory.
+        image_base64 = conn.execute(
+            text("SELECT image_base64 FROM clothing_items WHERE id = :id"), {"id": item_id}
+        ).scalar_one()
+        try:
+            image_hash = perceptual_hash(decode_base64_image(image_base64))
+        except Exception:
+            continue
+        conn.execute(
+            text("UPDATE clothing_items SET image_hash = :image_hash WHERE id = :id"),
+            {"image_hash": image_hash, "id": item_id},
+        )
+
+
+def _backfill_image_digests(conn: Connection) -> None:
+    item_ids = conn.execute(text("SELECT id FROM clothing_items")).scalars().all()
+    for item_id in item_ids:
+        image_base64 = conn.execute(
+            text("SELECT image_base64 FROM clothing_items WHERE id = :id"), {"id": item_id}
+        ).scalar_one()
+        conn.execute(
+            text("UPDATE clothing_items SET image_digest = :digest WHERE id = :id"),
+            {"digest": image_digest(image_base64), "id": item_id},
+        )
+
+
+def _backfill_item_changes(conn: Connection) -> None:
+    # Seed the change log so delta sync from cursor 0 sees items created before it existed.
+    conn.execute(
+        text(
+            "INSERT INTO item_changes (user_id, item_id, op, created_at) "
+            "SELECT user_id, id, 'upsert', COALESCE(created_at, CURRENT_TIMESTAMP) FROM clothing_items ORDER BY id"
+        )
+    )
+
+
+def _backfill_wardrobe_counts(conn: Connection) -> None:
+    rows = conn.execute(
+        text("SELECT user_id, category, occasion, status, hue, saturation, lightness FROM clothing_items")
+    ).all()
+    counts: Counter[tuple[int, str, str]] = Counter()
+    for row in rows:
+        for dimension, bucket in summary_keys(row):
+            counts[(row.user_id, dimension, bucket)] += 1
+    for (user_id, dimension, bucket), count in counts.items():
+        conn.execute(
+            text(
+                "INSERT INTO wardrobe_counts (user_id, dimension, bucket, item_count) "
+                "VALUES (:user_id, :dimension, :bucket, :count)"
+            ),
+            {"user_id": user_id, "dimension": dimension, "bucket": bucket, "count": count},
+        )
+
+
+def _backfill_wardrobe_versions(conn: Connection) -> None:
+    # Start above every version a client's ETag or a worker's index may carry: each write logged
+    # at least one change, and before this table the counter was users.wardrobe_version.
+    versions = dict(conn.execute(text("SELECT user_id, COUNT(*) FROM item_changes GROUP BY user_id")).all())
+    inspector = inspect(conn)
+    if "users" in inspector.get_table_names() and "wardrobe_version" in {
+        column["name"] for column in inspector.get_columns("users")
+    }:
+        for user_id, version in conn.execute(text("SELECT id, wardrobe_version FROM users")).all():
+            versions[user_id] = max(versions.get(user_id, 0), version or 0)
+    for user_id, version in versions.items():
+        conn.execute(
+            text("INSERT INTO wardrobe_versions (user_id, version) VALUES (:user_id, :version)"),
+            {"user_id": user_id, "version": version},
+        )
+
+
+# Data backfills keyed by the column (or, with None, the table) whose creation triggers them.
+_BACKFILLS: dict[tuple[str, str | None], Callable[[Connection], None]] = {
+    ("clothing_items", "tag_mask"): _backfill_tags,
+    ("clothing_items", "style_tag_list"): _backfill_style_tag_lists,
+    ("clothing_items", "image_hash"): _backfill_image_hashes,
+    ("clothing_items", "image_digest"): _backfill_image_digests,
+    ("item_changes", None): _backfill_item_changes,
+    ("wardrobe_counts", None): _backfill_wardrobe_counts,
+    ("wardrobe_versions", None): _backfill_wardrobe_versions,
+}
+
+
+if __name__ == "__main__":
+    migrate_all()
@@ -1,6 +1,6 @@
 ﻿from datetime import datetime, timezone
 
-from sqlalchemy import DateTime, Float, ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy import JSON, Boolean, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .database import Base
@@ -10,6 +10,11 @@ def utc_now() -> datetime:
     return datetime.now(tz=timezone.utc)
 
 
+# Items uploaded asynchronously stay "pending" with a placeholder color until a worker analyzes them.
+ITEM_READY = "ready"
+ITEM_PENDING = "pending"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -48,7 +53,91 @@ class ClothingItem(Base):
     fit: Mapped[str] = mapped_column(String(24), default="regular")
     warmth: Mapped[int] = mapped_column(Integer, default=2)
     style_tags: Mapped[str] = mapped_column(String(255), default="")
+    # The same normalized tags as a list, so serializing an item never re-splits style_tags.
+    style_tag_list: Mapped[list[str]] = mapped_column(JSON, default=list, server_default="[]")
+    tag_mask: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    image_hash: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    # sha256 of image_base64; exact-copy detection for bulk import (image_hash is perceptual).
+    image_digest: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    status: Mapped[str] = mapped_column(String(16), default=ITEM_READY, server_default=ITEM_READY)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now)
+
+    owner: Mapped[User] = relationship(back_populates="items")
+    tags: Mapped[list["ClothingTag"]] = relationship(back_populates="item", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_clothing_items_user_image_hash", "user_id", "image_hash"),
+        Index("ix_clothing_items_user_image_digest", "user_id", "image_digest"),
+    )
+
+
+# Append-only log of item upserts and deletes; the row id is the delta-sync cursor.
+class ItemChange(Base):
+    __tablename__ = "item_changes"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer)
+    item_id: Mapped[int] = mapped_column(Integer)
+    op: Mapped[str] = mapped_column(String(8))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now)
+
+    __table_args__ = (
+        Index("ix_item_changes_user_cursor", "user_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+# Durable queue of asynchronous uploads, claimed by services.ingest_queue worker threads.
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, index=True)
+    item_id: Mapped[int] = mapped_column(Integer)
+    # queued -> running -> done | failed; a failed attempt goes back to queued until max_attempts.
+    status: Mapped[str] = mapped_column(String(16), default="queued")
+    allow_duplicate: Mapped[bool] = mapped_column(Boolean, default=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer)
+    error: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    run_after: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now)
+    # A running job whose lease has expired belongs to a crashed worker and is claimed again.
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utc_now)
+
+    __table_args__ = (Index("ix_ingest_jobs_claim", "status", "run_after"),)
+
+
+# Per-user item counts, kept in step with every item write by services.wardrobe_summary.
+class WardrobeCount(Base):
+    __tablename__ = "wardrobe_counts"
+
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # "status" counts every item; "slot" (category|occasion) and "color" count ready items only.
+    dimension: Mapped[str] = mapped_column(String(16), primary_key=True)
+    bucket: Mapped[str] = mapped_column(String(64), primary_key=True)
+    item_count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+# Bumped whenever the user's items change; drives ETags and cache invalidation. Kept in the
+# user's shard so item writes never touch the main database.
+class WardrobeVersion(Base):
+    __tablename__ = "wardrobe_versions"
+
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class ClothingTag(Base):
+    __tablename__ = "clothing_item_tags"
+
+    item_id: Mapped[int] = mapped_column(ForeignKey("clothing_items.id", ondelete="CASCADE"), primary_key=True)
+    tag: Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer)
+
+    item: Mapped[ClothingItem] = relationship(back_populates="tags")
 
-    owner: Mapped[User] = relationship(back_populates="items")
+    __table_args__ = (Index("ix_clothing_item_tags_user_tag", "user_id", "tag", "item_id"),)
@@ -0,0 +1,161 @@
+﻿from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import Engine, event
+
+from .config import get_settings
+from .metrics import metrics
+
+logger = logging.getLogger("app.sql")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More queries than declared for a route or an expect_queries() block (strict mode only)."""
+
+
+@dataclass
+class QueryStats:
+    queries: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+    budget: int | None = None
+    # Raise instead of logging once the budget is exceeded.
+    strict: bool = False
+
+
+# Stats of the request (or expect_queries block) being handled; None outside of one.
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> QueryStats | None:
+    return _current.get()
+
+
+def install_query_tracing(engine: Engine) -> None:
+    slow_seconds = get_settings().slow_query_ms / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            if stats.strict and stats.budget is not None and stats.queries > stats.budget:
+                raise QueryBudgetExceeded(f"query {stats.queries} exceeds budget of {stats.budget}: {statement}")
+        context._trace_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._trace_start
+        metrics.observe_timer("sql", elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.seconds += elapsed
+        if elapsed >= slow_seconds:
+            logger.warning("slow query (%.1f ms): %s params=%s", elapsed * 1000, statement, redact(parameters))
+
+    if engine.dialect.name == "sqlite":
+        # sqlite3 hands every fetched row to row_factory, so rows and bytes come almost for free.
+        @event.listens_for(engine, "connect")
+        def connect(dbapi_connection, connection_record):
+            dbapi_connection.row_factory = _count_row
+
+
+def _count_row(cursor, row: tuple) -> tuple:
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += 1
+        stats.bytes += sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in row if value is not None)
+    return row
+
+
+def redact(parameters) -> object:
+    # Keep the shape (types, lengths) for debugging; never the values, which include images and hashes.
+    if isinstance(parameters, dict):
+        return {key: _describe(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) if isinstance(value, (list, tuple, dict)) else _describe(value) for value in parameters]
+    return _describe(parameters)
+
+
+def _describe(value: object) -> str:
+    if value is None:
+        return "None"
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def query_budget(max_queries: int) -> Callable[[], None]:
+    """Route dependency declaring how many queries one request may issue, auth included.
+
+        @router.get("", dependencies=[Depends(query_budget(2))])
+    """
+
+    def declare() -> None:
+        stats = _current.get()
+        if stats is not None:
+            stats.budget = max_queries
+
+    return declare
+
+
+@contextmanager
+def expect_queries(max_queries: int) -> Iterator[QueryStats]:
+    """Fail with QueryBudgetExceeded when the block runs more than max_queries queries.
+
+        with expect_queries(2):
+            load_wardrobe(db, user_id)
+    """
+    stats = QueryStats(budget=max_queries, strict=True)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class QueryTracingMiddleware:
+    """Pure ASGI middleware giving each request its own QueryStats.
+
+    Totals go out as a Server-Timing "db" entry; requests over their declared budget are
+    logged, or fail outright when QUERY_BUDGET_STRICT is set. Strict mode is for tests: the
+    failing query raises before it runs, which undoes uncommitted work but not an earlier
+    commit in the same request.
+    """
+
+    def __init__(self, app, strict: bool = False, server_timing: bool = True):
+        self.app = app
+        self.strict = strict
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(strict=self.strict)
+        token = _current.set(stats)
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start" and self.server_timing:
+                entry = f'db;dur={stats.seconds * 1000:.1f};desc="{stats.queries} queries, {stats.rows} rows"'
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", entry.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if stats.budget is not None and stats.queries > stats.budget:
+                route = getattr(scope.get("route"), "path", scope.get("path"))
+                logger.warning(
+                    "%s %s ran %d queries (budget %d)", scope["method"], route, stats.queries, stats.budget
+                )
+
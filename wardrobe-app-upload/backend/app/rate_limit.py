@@ -0,0 +1,191 @@
+﻿from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+from .security import decode_token
+
+# Buckets kept per process; the least recently used are dropped (a dropped bucket is simply full).
+MAX_BUCKETS = 20_000
+
+
+@dataclass
+class Rate:
+    requests: int
+    seconds: float
+
+    @classmethod
+    def parse(cls, spec: str) -> Rate | None:
+        """"30/60" is 30 requests per 60 seconds, with bursts of up to 30; "" or "0" disables."""
+        spec = spec.strip()
+        if not spec or spec == "0":
+            return None
+        requests, _, seconds = spec.partition("/")
+        return cls(int(requests), float(seconds or 1))
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+
+
+class RateLimiter:
+    def __init__(self):
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: Rate) -> float:
+        """Spend one token; returns 0 when allowed, else seconds until a token is available."""
+        refill = rate.requests / rate.seconds
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate.requests, now)
+                if len(self._buckets) > MAX_BUCKETS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket.tokens = min(rate.requests, bucket.tokens + (now - bucket.updated) * refill)
+                bucket.updated = now
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0.0
+            return (1 - bucket.tokens) / refill
+
+
+class ConcurrencyLimiter:
+    """Caps requests in flight; callers wait at most max_wait seconds for a slot."""
+
+    def __init__(self, max_in_flight: int, max_wait: float):
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    async def acquire(self) -> bool:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Semaphores belong to one event loop; a server has one, test clients start their own.
+            self._loop, self._semaphore = loop, asyncio.Semaphore(self.max_in_flight)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+
+@lru_cache(maxsize=4096)
+def _token_subject(token: str) -> str | None:
+    # Verified, so a forged token cannot drain another user's budget; only used as a bucket key.
+    try:
+        return str(decode_token(token).get("sub") or "") or None
+    except ValueError:
+        return None
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware: per-client token buckets plus a global in-flight limit for the API.
+
+    Every API request spends from a general bucket keyed by user (bearer token subject) or
+    client IP; expensive routes also spend from their own bucket. Over-budget requests get 429,
+    and requests that cannot start within max_queue_seconds are shed with 503. Both carry
+    Retry-After. Exempt paths (health checks, metrics) and non-API paths bypass everything.
+    """
+
+    def __init__(
+        self,
+        app,
+        api_prefix: str,
+        default_rate: str,
+        route_rates: dict[tuple[str, str], tuple[str, str]],
+        max_in_flight: int,
+        max_queue_seconds: float,
+        exempt: tuple[str, ...] = (),
+    ):
+        self.app = app
+        self.api_prefix = api_prefix.rstrip("/")
+        self.default_rate = Rate.parse(default_rate)
+        # (method, path) -> (bucket name, rate); login is keyed by IP since there is no user yet.
+        self.route_rates = {
+            (method, f"{self.api_prefix}{path}"): (name, Rate.parse(spec))
+            for (method, path), (name, spec) in route_rates.items()
+        }
+        self.exempt = {f"{self.api_prefix}{path}" for path in exempt}
+        self.limiter = RateLimiter()
+        self.concurrency = ConcurrencyLimiter(max_in_flight, max_queue_seconds) if max_in_flight > 0 else None
+
+    async def __call__(self, scope, receive, send) -> None:
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or not path.startswith(self.api_prefix + "/")
+            or path.rstrip("/") in self.exempt
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = self._check_rates(scope, path.rstrip("/"))
+        if retry_after:
+            await _reject(send, 429, "Too many requests", retry_after)
+            return
+
+        if self.concurrency is None:
+            await self.app(scope, receive, send)
+            return
+        if not await self.concurrency.acquire():
+            await _reject(send, 503, "Server is busy, please retry", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.concurrency.release()
+
+    def _check_rates(self, scope, path: str) -> float:
+        ip = (scope.get("client") or ("unknown",))[0]
+        client = f"ip:{ip}"
+        for name, value in scope.get("headers", []):
+            if name == b"authorization" and value[:7].lower() == b"bearer ":
+                subject = _token_subject(value[7:].decode("latin-1").strip())
+                if subject:
+                    client = f"user:{subject}"
+                break
+
+        wait = 0.0
+        if self.default_rate is not None:
+            wait = self.limiter.take(f"default|{client}", self.default_rate)
+        route = self.route_rates.get((scope["method"], path))
+        if route is not None and route[1] is not None and not wait:
+            name, rate = route
+            key = f"{name}|ip:{ip}" if name == "login" else f"{name}|{client}"
+            wait = self.limiter.take(key, rate)
+        return wait
+
+
+async def _reject(send, status: int, detail: str, retry_after: float) -> None:
+    body = f'{{"detail":"{detail}"}}'.encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
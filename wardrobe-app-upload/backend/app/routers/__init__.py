@@ -1,3 +1,3 @@
-﻿from . import auth, items, recommend
+﻿from . import auth, items, jobs, recommend, upload
 
-__all__ = ["auth", "items", "recommend"]
+__all__ = ["auth", "items", "jobs", "recommend", "upload"]
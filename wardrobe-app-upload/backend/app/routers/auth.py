@@ -4,17 +4,20 @@ import json
 from urllib.parse import parse_qs, urlencode
 from urllib.parse import urlparse
 
-import httpx
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.responses import RedirectResponse
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from ..caching import conditional_response, make_etag
 from ..config import get_settings
 from ..database import get_db
 from ..deps import get_current_user
+from ..metrics import timer
 from ..models import User
+from ..query_tracing import query_budget
 from ..schemas import TokenResponse, UserCreate, UserLogin, UserOut
+from ..serializers import FastJSONResponse
 from ..security import (
     create_access_token,
     create_oauth_state,
@@ -24,10 +27,9 @@ from ..security import (
 )
 
 router = APIRouter(prefix="/auth", tags=["auth"])
-settings = get_settings()
 
 
-@router.post("/register", response_model=TokenResponse)
+@router.post("/register", response_model=TokenResponse, dependencies=[Depends(query_budget(3))])
 def register(payload: UserCreate, db: Session = Depends(get_db)):
     existing = db.query(User).filter(User.username == payload.username).first()
     if existing:
@@ -41,7 +43,7 @@ def register(payload: UserCreate, db: Session = Depends(get_db)):
     return TokenResponse(access_token=create_access_token(str(user.id)))
 
 
-@router.post("/login", response_model=TokenResponse)
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(query_budget(1))])
 def login(payload: UserLogin, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.username == payload.username).first()
     if not user or not user.password_hash:
@@ -53,13 +55,16 @@ def login(payload: UserLogin, db: Session = Depends(get_db)):
     return TokenResponse(access_token=create_access_token(str(user.id)))
 
 
-@router.get("/me", response_model=UserOut)
-def me(current_user: User = Depends(get_current_user)):
-    return current_user
+@router.get("/me", response_model=UserOut, dependencies=[Depends(query_budget(1))])
+def me(request: Request, current_user: User = Depends(get_current_user)):
+    user = UserOut.model_validate(current_user)
+    etag = make_etag("me", user.id, user.username, user.provider, user.avatar_url)
+    return conditional_response(request, etag, lambda: FastJSONResponse(user.model_dump()))
 
 
 @router.get("/providers/status")
 def providers_status():
+    settings = get_settings()
     return {
         "wechat": {
             "configured": bool(settings.wechat_app_id and settings.wechat_app_secret),
@@ -82,6 +87,7 @@ def providers_status():
 
 @router.get("/{provider}/login")
 def oauth_login(provider: str, front_redirect: str | None = Query(default=None)):
+    settings = get_settings()
     provider = provider.lower().strip()
     if provider not in {"wechat", "qq"}:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unsupported provider")
@@ -119,7 +125,8 @@ def oauth_login(provider: str, front_redirect: str | None = Query(default=None))
     return {"provider": "qq", "authorization_url": f"https://graph.qq.com/oauth2.0/authorize?{query}"}
 
 
-@router.get("/{provider}/callback")
+# Username collisions cost one lookup each, so this allows a few retries.
+@router.get("/{provider}/callback", dependencies=[Depends(query_budget(8))])
 async def oauth_callback(
     provider: str,
     code: str = Query(...),
@@ -193,19 +200,23 @@ async def oauth_callback(
 
 
 async def _fetch_wechat_profile(code: str) -> dict:
+    import httpx
+
+    settings = get_settings()
     if not settings.wechat_app_id or not settings.wechat_app_secret:
         raise HTTPException(status_code=400, detail="WeChat OAuth is not configured")
 
     async with httpx.AsyncClient(timeout=12) as client:
-        token_resp = await client.get(
-            "https://api.weixin.qq.com/sns/oauth2/access_token",
-            params={
-                "appid": settings.wechat_app_id,
-                "secret": settings.wechat_app_secret,
-                "code": code,
-                "grant_type": "authorization_code",
-            },
-        )
+        with timer("oauth_wechat_token"):
+            token_resp = await client.get(
+                "https://api.weixin.qq.com/sns/oauth2/access_token",
+                params={
+                    "appid": settings.wechat_app_id,
+                    "secret": settings.wechat_app_secret,
+                    "code": code,
+                    "grant_type": "authorization_code",
+                },
+            )
         token_data = token_resp.json()
 
         if "errcode" in token_data:
@@ -217,10 +228,11 @@ async def _fetch_wechat_profile(code: str) -> dict:
         if not access_token or not openid:
             raise HTTPException(status_code=400, detail="WeChat token exchange returned incomplete data")
 
-        profile_resp = await client.get(
-            "https://api.weixin.qq.com/sns/userinfo",
-            params={"access_token": access_token, "openid": openid, "lang": "zh_CN"},
-        )
+        with timer("oauth_wechat_profile"):
+            profile_resp = await client.get(
+                "https://api.weixin.qq.com/sns/userinfo",
+                params={"access_token": access_token, "openid": openid, "lang": "zh_CN"},
+            )
         profile_data = profile_resp.json()
 
         return {
@@ -231,20 +243,24 @@ async def _fetch_wechat_profile(code: str) -> dict:
 
 
 async def _fetch_qq_profile(code: str) -> dict:
+    import httpx
+
+    settings = get_settings()
     if not settings.qq_app_id or not settings.qq_app_secret:
         raise HTTPException(status_code=400, detail="QQ OAuth is not configured")
 
     async with httpx.AsyncClient(timeout=12) as client:
-        token_resp = await client.get(
-            "https://graph.qq.com/oauth2.0/token",
-            params={
-                "grant_type": "authorization_code",
-                "client_id": settings.qq_app_id,
-                "client_secret": settings.qq_app_secret,
-                "code": code,
-                "redirect_uri": settings.qq_redirect_uri,
-            },
-        )
+        with timer("oauth_qq_token"):
+            token_resp = await client.get(
+                "https://graph.qq.com/oauth2.0/token",
+                params={
+                    "grant_type": "authorization_code",
+                    "client_id": settings.qq_app_id,
+                    "client_secret": settings.qq_app_secret,
+                    "code": code,
+                    "redirect_uri": settings.qq_redirect_uri,
+                },
+            )
 
         token_text = token_resp.text
         parsed = parse_qs(token_text)
@@ -253,7 +269,8 @@ async def _fetch_qq_profile(code: str) -> dict:
         if not access_token:
             raise HTTPException(status_code=400, detail="QQ token exchange failed")
 
-        me_resp = await client.get("https://graph.qq.com/oauth2.0/me", params={"access_token": access_token})
+        with timer("oauth_qq_openid"):
+            me_resp = await client.get("https://graph.qq.com/oauth2.0/me", params={"access_token": access_token})
         me_text = me_resp.text.strip()
 
         openid = None
@@ -267,14 +284,15 @@ async def _fetch_qq_profile(code: str) -> dict:
         if not openid:
             raise HTTPException(status_code=400, detail="QQ openid fetch failed")
 
-        profile_resp = await client.get(
-            "https://graph.qq.com/user/get_user_info",
-            params={
-                "access_token": access_token,
-                "oauth_consumer_key": settings.qq_app_id,
-                "openid": openid,
-            },
-        )
+        with timer("oauth_qq_profile"):
+            profile_resp = await client.get(
+                "https://graph.qq.com/user/get_user_info",
+                params={
+                    "access_token": access_token,
+                    "oauth_consumer_key": settings.qq_app_id,
+                    "openid": openid,
+                },
+            )
         profile_data = profile_resp.json()
 
         return {
@@ -300,6 +318,7 @@ def _build_unique_username(db: Session, provider: str, nickname: str | None) ->
 
 
 def _validate_front_redirect(front_redirect: str | None) -> str | None:
+    settings = get_settings()
     if not front_redirect:
         return None
 
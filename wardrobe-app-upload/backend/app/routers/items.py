@@ -1,57 +1,303 @@
 ﻿from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
+from ..caching import NO_STORE, conditional_response, make_etag
+from ..config import get_settings
 from ..database import get_db
 from ..deps import get_current_user
-from ..models import ClothingItem, User
-from ..schemas import ClothingCreate, ClothingOut, ImageAnalysisRequest, ImageAnalysisResult
-from ..services.image_analysis import dominant_color_from_base64, suggest_clothing_metadata
+from ..models import ClothingItem, ClothingTag, ItemChange, User
+from ..query_tracing import query_budget
+from ..schemas import (
+    ClothingCreate,
+    ClothingOut,
+    ImageAnalysisRequest,
+    ImageAnalysisResult,
+    ImportResult,
+    IngestJobOut,
+    ItemChangesOut,
+    WardrobeSummaryOut,
+)
+from ..serializers import FastJSONResponse, item_to_dict, job_to_dict
+from ..services.color_index import color_indexes
+from ..services.image_analysis import (
+    decode_base64_image,
+    dominant_color,
+    hex_to_rgb,
+    perceptual_hash,
+    rgb_to_hsl,
+    suggest_metadata,
+)
+from ..services.ingest_queue import enqueue_upload
+from ..services.item_transfer import ItemImporter, export_lines
+from ..services.item_store import (
+    apply_features,
+    build_item,
+    extract_features,
+    find_duplicates,
+    index_item,
+    record_change,
+    unindex_item,
+)
+from ..services.tagging import normalize_tags
+from ..services.user_index import wardrobe_version
+from ..services.wardrobe_summary import load_summary, summary_delta, update_summary
+from ..upload_policy import check_upload
 
 router = APIRouter(prefix="/items", tags=["items"])
 
 
-@router.get("", response_model=list[ClothingOut])
-def list_items(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    items = (
-        db.query(ClothingItem)
-        .filter(ClothingItem.user_id == current_user.id)
-        .order_by(ClothingItem.created_at.desc())
-        .all()
-    )
-    return [_to_schema(item) for item in items]
+@router.get("", response_model=list[ClothingOut], dependencies=[Depends(query_budget(3))])
+def list_items(
+    request: Request,
+    tag: list[str] = Query(default=[]),
+    category: str | None = Query(default=None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    tags = normalize_tags(tag)
+    etag = make_etag("items", current_user.id, wardrobe_version(db, current_user.id), category, *tags)
+    return conditional_response(request, etag, lambda: _list_items(db, current_user, tags, category))
+
+
+def _list_items(db: Session, current_user: User, tags: list[str], category: str | None) -> FastJSONResponse:
+    query = db.query(ClothingItem).filter(ClothingItem.user_id == current_user.id)
+    if category:
+        query = query.filter(ClothingItem.category == category)
+    for clean in tags:
+        tagged = select(ClothingTag.item_id).where(ClothingTag.user_id == current_user.id, ClothingTag.tag == clean)
+        query = query.filter(ClothingItem.id.in_(tagged))
+
+    items = query.order_by(ClothingItem.created_at.desc()).all()
+    return FastJSONResponse([item_to_dict(item) for item in items])
 
 
-@router.post("", response_model=ClothingOut, status_code=status.HTTP_201_CREATED)
-def create_item(payload: ClothingCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.post(
+    "",
+    response_model=ClothingOut,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": IngestJobOut}},
+    # Includes the version read, building the duplicate and color indexes on a cold cache, and
+    # the summary upsert.
+    dependencies=[Depends(query_budget(10))],
+)
+def create_item(
+    payload: ClothingCreate,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    raw = check_upload(payload.image_base64)
+    if _prefers_async(request):
+        # Store the raw upload and answer immediately; a worker fills in color and hash.
+        job, item = enqueue_upload(db, current_user.id, payload)
+        return FastJSONResponse(
+            job_to_dict(job, item),
+            status_code=status.HTTP_202_ACCEPTED,
+            headers={
+                "Location": f"{get_settings().api_prefix}/jobs/{job.id}",
+                "Preference-Applied": "respond-async",
+            },
+        )
+
     try:
-        color_hex, hue, saturation, lightness = dominant_color_from_base64(payload.image_base64)
+        features = extract_features(payload.image_base64, raw)
     except Exception as exc:
         raise HTTPException(status_code=400, detail="Invalid image data") from exc
 
-    item = ClothingItem(
-        user_id=current_user.id,
-        name=payload.name,
-        category=payload.category,
-        occasion=payload.occasion,
-        image_base64=payload.image_base64,
-        color_hex=color_hex,
-        hue=hue,
-        saturation=saturation,
-        lightness=lightness,
-        fit=payload.fit,
-        warmth=payload.warmth,
-        style_tags=",".join(_normalize_tags(payload.style_tags)),
-    )
+    duplicates = []
+    if not payload.allow_duplicate:
+        duplicates = find_duplicates(db, current_user.id, features.image_hash, features.color)
+    if duplicates:
+        # The matches let the client show what it collides with and resubmit with allow_duplicate.
+        return FastJSONResponse(
+            {"detail": "Likely duplicate of an existing item", "duplicate_item_ids": duplicates},
+            status_code=status.HTTP_409_CONFLICT,
+        )
 
+    item = build_item(current_user.id, payload)
+    apply_features(item, features)
     db.add(item)
+    db.flush()
+    update_summary(db, current_user.id, summary_delta([item]))
+    version = record_change(db, current_user.id, item.id, "upsert")
     db.commit()
     db.refresh(item)
-    return _to_schema(item)
 
+    index_item(item, version)
+    return FastJSONResponse(item_to_dict(item), status_code=status.HTTP_201_CREATED)
+
+
+def _prefers_async(request: Request) -> bool:
+    # RFC 7240: Prefer: respond-async (preferences are comma separated, parameters follow ";").
+    for preference in request.headers.get("prefer", "").split(","):
+        if preference.split(";", 1)[0].split("=", 1)[0].strip().lower() == "respond-async":
+            return True
+    return False
+
+
+@router.get("/summary", response_model=WardrobeSummaryOut, dependencies=[Depends(query_budget(3))])
+def wardrobe_summary(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    # Counts are maintained on every write, so this never touches the items themselves.
+    version = wardrobe_version(db, current_user.id)
+    etag = make_etag("summary", current_user.id, version)
+    return conditional_response(
+        request, etag, lambda: FastJSONResponse({"version": version, **load_summary(db, current_user.id)})
+    )
+
+
+@router.get("/changes", response_model=ItemChangesOut, dependencies=[Depends(query_budget(3))])
+def item_changes(
+    since: int = Query(default=0, ge=0),
+    limit: int = Query(default=500, ge=1, le=2000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    if since == 0:
+        # Full snapshot. Read the cursor first so a concurrent write is re-sent, never skipped.
+        cursor = (
+            db.query(func.max(ItemChange.id)).filter(ItemChange.user_id == current_user.id).scalar() or 0
+        )
+        items = (
+            db.query(ClothingItem)
+            .filter(ClothingItem.user_id == current_user.id)
+            .order_by(ClothingItem.created_at.desc())
+            .all()
+        )
+        return FastJSONResponse(
+            {
+                "cursor": cursor,
+                "reset": True,
+                "has_more": False,
+                "items": [item_to_dict(item) for item in items],
+                "deleted": [],
+            },
+            headers={"Cache-Control": NO_STORE},
+        )
+
+    changes = (
+        db.query(ItemChange.id, ItemChange.item_id, ItemChange.op)
+        .filter(ItemChange.user_id == current_user.id, ItemChange.id > since)
+        .order_by(ItemChange.id)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    # Only the latest operation per item matters to the client.
+    latest: dict[int, str] = {}
+    for _, changed_id, op in changes:
+        latest[changed_id] = op
+
+    upserted = [changed_id for changed_id, op in latest.items() if op == "upsert"]
+    items = []
+    if upserted:
+        items = (
+            db.query(ClothingItem)
+            .filter(ClothingItem.user_id == current_user.id, ClothingItem.id.in_(upserted))
+            .order_by(ClothingItem.created_at.desc())
+            .all()
+        )
+    present = {item.id for item in items}
+
+    return FastJSONResponse(
+        {
+            "cursor": changes[-1][0] if changes else since,
+            "reset": False,
+            "has_more": has_more,
+            "items": [item_to_dict(item) for item in items],
+            # An upsert whose row is already gone was deleted past this page; report it as deleted.
+            "deleted": [changed_id for changed_id, op in latest.items() if op == "delete" or changed_id not in present],
+        },
+        headers={"Cache-Control": NO_STORE},
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_items(current_user: User = Depends(get_current_user)):
+    # NDJSON, one item per line; streamed page by page so memory does not grow with the wardrobe.
+    return StreamingResponse(
+        export_lines(current_user.id),
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="wardrobe-{current_user.id}.ndjson"',
+            "Cache-Control": NO_STORE,
+        },
+    )
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_items(request: Request, current_user: User = Depends(get_current_user)):
+    max_line = get_settings().import_max_line_bytes
+    importer = ItemImporter(current_user.id)
+    buffer = bytearray()
+    line_number = 0
+
+    async for chunk in request.stream():
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line_number += 1
+            importer.add(line_number, bytes(buffer[start:end]))
+            start = end + 1
+            if importer.full:
+                await run_in_threadpool(importer.flush)
+        del buffer[:start]
+        if len(buffer) > max_line:
+            raise HTTPException(status_code=413, detail=f"Line {line_number + 1} is too long")
 
-@router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
+    if buffer:
+        importer.add(line_number + 1, bytes(buffer))
+    await run_in_threadpool(importer.flush)
+    return FastJSONResponse(importer.result())
+
+
+@router.get("/similar", response_model=list[ClothingOut], dependencies=[Depends(query_budget(4))])
+def similar_items(
+    color: str | None = Query(default=None),
+    item_id: int | None = Query(default=None),
+    k: int = Query(default=10, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    index = color_indexes.get(db, current_user.id)
+
+    if item_id is not None:
+        point = index.get(item_id)
+        if point is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        neighbors = index.nearest(*point, k=k, exclude=item_id)
+    elif color:
+        try:
+            hue, saturation, lightness = rgb_to_hsl(*hex_to_rgb(color))
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="Invalid color") from exc
+        neighbors = index.nearest(hue, saturation, lightness, k=k)
+    else:
+        raise HTTPException(status_code=400, detail="Provide color or item_id")
+
+    ids = [neighbor_id for neighbor_id, _ in neighbors]
+    if not ids:
+        return FastJSONResponse([])
+    by_id = {
+        item.id: item
+        for item in db.query(ClothingItem).filter(ClothingItem.user_id == current_user.id, ClothingItem.id.in_(ids))
+    }
+    return FastJSONResponse([item_to_dict(by_id[neighbor_id]) for neighbor_id in ids if neighbor_id in by_id])
+
+
+@router.delete(
+    "/{item_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(query_budget(9))]
+)
 def delete_item(item_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     item = (
         db.query(ClothingItem)
@@ -61,15 +307,28 @@ def delete_item(item_id: int, current_user: User = Depends(get_current_user), db
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
 
+    # Read before commit: afterwards the expired User row would be loaded again just for its id.
+    user_id = current_user.id
     db.delete(item)
+    update_summary(db, user_id, summary_delta([item], -1))
+    version = record_change(db, user_id, item_id, "delete")
     db.commit()
 
+    unindex_item(user_id, item_id, item.image_hash, version)
+
 
-@router.post("/analyze", response_model=ImageAnalysisResult)
-def analyze_image(payload: ImageAnalysisRequest, current_user: User = Depends(get_current_user)):
+@router.post("/analyze", response_model=ImageAnalysisResult, dependencies=[Depends(query_budget(4))])
+def analyze_image(
+    payload: ImageAnalysisRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    raw = check_upload(payload.image_base64)
     try:
-        color_hex, hue, saturation, lightness = dominant_color_from_base64(payload.image_base64)
-        category, fit, tags = suggest_clothing_metadata(payload.image_base64)
+        image = decode_base64_image(payload.image_base64, raw)
+        color_hex, hue, saturation, lightness = dominant_color(image)
+        category, fit, tags = suggest_metadata(image)
+        image_hash = perceptual_hash(image)
     except Exception as exc:
         raise HTTPException(status_code=400, detail="Invalid image data") from exc
 
@@ -81,32 +340,5 @@ def analyze_image(payload: ImageAnalysisRequest, current_user: User = Depends(ge
         suggested_category=category,
         suggested_fit=fit,
         suggested_style_tags=tags,
-    )
-
-
-def _normalize_tags(tags: list[str]) -> list[str]:
-    result: list[str] = []
-    for tag in tags:
-        clean = tag.strip().lower()
-        if clean and clean not in result:
-            result.append(clean)
-    return result
-
-
-def _to_schema(item: ClothingItem) -> ClothingOut:
-    tags = [tag.strip() for tag in item.style_tags.split(",") if tag.strip()]
-    return ClothingOut(
-        id=item.id,
-        name=item.name,
-        category=item.category,
-        occasion=item.occasion,
-        image_base64=item.image_base64,
-        color_hex=item.color_hex,
-        hue=item.hue,
-        saturation=item.saturation,
-        lightness=item.lightness,
-        fit=item.fit,
-        warmth=item.warmth,
-        style_tags=tags,
-        created_at=item.created_at,
+        duplicate_item_ids=find_duplicates(db, current_user.id, image_hash, (hue, saturation, lightness)),
     )
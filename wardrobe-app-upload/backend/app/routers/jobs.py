@@ -0,0 +1,31 @@
+﻿from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from ..caching import NO_STORE
+from ..database import get_db
+from ..deps import get_current_user
+from ..models import ClothingItem, IngestJob, User
+from ..query_tracing import query_budget
+from ..schemas import IngestJobOut
+from ..serializers import FastJSONResponse, job_to_dict
+from ..services.ingest_queue import JOB_DONE, JOB_FAILED
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}", response_model=IngestJobOut, dependencies=[Depends(query_budget(3))])
+def get_job(job_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    job = db.query(IngestJob).filter(IngestJob.user_id == current_user.id, IngestJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    item = None
+    if job.status != JOB_FAILED:
+        item = db.query(ClothingItem).filter(ClothingItem.user_id == current_user.id, ClothingItem.id == job.item_id).first()
+
+    headers = {"Cache-Control": NO_STORE}
+    if job.status not in {JOB_DONE, JOB_FAILED}:
+        headers["Retry-After"] = "1"
+    return FastJSONResponse(job_to_dict(job, item), headers=headers)
@@ -1,57 +1,89 @@
 ﻿from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+import random
 
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session, defer
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..caching import NO_STORE, conditional_response, make_etag
 from ..database import get_db
 from ..deps import get_current_user
-from ..models import ClothingItem, User
-from ..schemas import ClothingOut, OutfitResponse, OutfitSlot
+from ..models import ITEM_READY, ClothingItem, User
+from ..query_tracing import query_budget
+from ..schemas import OutfitResponse
+from ..serializers import FastJSONResponse, item_to_dict
 from ..services.recommendation import generate_outfit
+from ..services.user_index import wardrobe_version
+from ..services.wardrobe_summary import candidate_counts, missing_slots
 
 router = APIRouter(prefix="/recommend", tags=["recommend"])
 
 
-@router.get("", response_model=OutfitResponse)
+@router.get("", response_model=OutfitResponse, dependencies=[Depends(query_budget(5))])
 def recommend_outfit(
+    request: Request,
     occasion: str = Query(default="all"),
+    seed: int | None = Query(default=None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    items = db.query(ClothingItem).filter(ClothingItem.user_id == current_user.id).all()
+    # Only seeded results are reproducible, so only those can be revalidated.
+    if seed is None:
+        response = _build_outfit(db, current_user, occasion, None)
+        response.headers["Cache-Control"] = NO_STORE
+        return response
+
+    etag = make_etag("recommend", current_user.id, wardrobe_version(db, current_user.id), occasion, seed)
+    return conditional_response(request, etag, lambda: _build_outfit(db, current_user, occasion, seed))
+
+
+def _build_outfit(db: Session, current_user: User, occasion: str, seed: int | None) -> FastJSONResponse:
+    # The summary answers "impossible" without reading a single item row, and says which
+    # categories hold candidates at all.
+    counts = candidate_counts(db, current_user.id, occasion)
+    if missing_slots(counts):
+        raise HTTPException(status_code=400, detail="Not enough items to generate outfit")
+
+    query = (
+        db.query(ClothingItem)
+        # Scoring never looks at images; only the few picked items need theirs.
+        .options(defer(ClothingItem.image_base64))
+        # Pending uploads only carry a placeholder color, so they cannot be scored yet.
+        .filter(
+            ClothingItem.user_id == current_user.id,
+            ClothingItem.status == ITEM_READY,
+            ClothingItem.category.in_(list(counts)),
+        )
+    )
+    if occasion != "all":
+        query = query.filter(ClothingItem.occasion.in_((occasion, "all")))
+    items = query.order_by(ClothingItem.id).all()
 
-    result = generate_outfit(items, occasion=occasion)
+    result = generate_outfit(items, occasion=occasion, rng=random.Random(seed))
     if not result:
         raise HTTPException(status_code=400, detail="Not enough items to generate outfit")
 
+    picked = [item.id for item in result.slots.values()]
+    images = dict(
+        db.query(ClothingItem.id, ClothingItem.image_base64).filter(
+            ClothingItem.user_id == current_user.id, ClothingItem.id.in_(picked)
+        )
+    )
+    for item in result.slots.values():
+        set_committed_value(item, "image_base64", images[item.id])
+
     slots = []
     order = ["top", "bottom", "shoes", "outer", "accessory"]
     for key in order:
         if key in result.slots:
-            slots.append(OutfitSlot(slot=key, item=_to_schema(result.slots[key])))
-
-    return OutfitResponse(
-        occasion=occasion,
-        score=result.score,
-        reasons=result.reasons,
-        slots=slots,
-    )
-
+            slots.append({"slot": key, "item": item_to_dict(result.slots[key])})
 
-def _to_schema(item: ClothingItem) -> ClothingOut:
-    tags = [tag.strip() for tag in item.style_tags.split(",") if tag.strip()]
-    return ClothingOut(
-        id=item.id,
-        name=item.name,
-        category=item.category,
-        occasion=item.occasion,
-        image_base64=item.image_base64,
-        color_hex=item.color_hex,
-        hue=item.hue,
-        saturation=item.saturation,
-        lightness=item.lightness,
-        fit=item.fit,
-        warmth=item.warmth,
-        style_tags=tags,
-        created_at=item.created_at,
+    return FastJSONResponse(
+        {
+            "occasion": occasion,
+            "score": result.score,
+            "reasons": result.reasons,
+            "slots": slots,
+        }
     )
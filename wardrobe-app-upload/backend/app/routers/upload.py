@@ -0,0 +1,15 @@
+﻿from __future__ import annotations
+
+from fastapi import APIRouter
+
+from ..schemas import UploadPolicyOut
+from ..serializers import FastJSONResponse
+from ..upload_policy import upload_policy
+
+router = APIRouter(prefix="/upload", tags=["upload"])
+
+
+@router.get("/policy", response_model=UploadPolicyOut)
+def get_upload_policy():
+    # Same for every user and only changes with a deploy, so shared caches may keep it briefly.
+    return FastJSONResponse(upload_policy(), headers={"Cache-Control": "public, max-age=3600"})
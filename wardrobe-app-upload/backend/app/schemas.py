@@ -35,6 +35,25 @@ class ClothingCreate(BaseModel):
     fit: str = "regular"
     warmth: int = Field(default=2, ge=1, le=5)
     style_tags: list[str] = Field(default_factory=list)
+    allow_duplicate: bool = False
+
+
+class ClothingImport(ClothingCreate):
+    # Analyzed fields from an export; when all are present the image is not re-analyzed.
+    color_hex: str | None = None
+    hue: float | None = None
+    saturation: float | None = None
+    lightness: float | None = None
+    image_hash: str | None = Field(default=None, pattern=r"^[0-9a-f]{16}$")
+    status: str | None = None
+    created_at: datetime | None = None
+
+
+class ImportResult(BaseModel):
+    imported: int
+    skipped: int
+    failed: int
+    errors: list[str]
 
 
 class ClothingOut(BaseModel):
@@ -50,7 +69,38 @@ class ClothingOut(BaseModel):
     fit: str
     warmth: int
     style_tags: list[str]
+    status: str = "ready"
+    created_at: datetime
+
+
+class IngestJobOut(BaseModel):
+    id: int
+    status: str
+    item_id: int
+    attempts: int
+    max_attempts: int
+    error: str | None = None
     created_at: datetime
+    updated_at: datetime
+    item: ClothingOut | None = None
+
+
+class ItemChangesOut(BaseModel):
+    cursor: int
+    reset: bool
+    has_more: bool
+    items: list[ClothingOut]
+    deleted: list[int]
+
+
+class WardrobeSummaryOut(BaseModel):
+    version: int
+    total: int
+    statuses: dict[str, int]
+    categories: dict[str, int]
+    occasions: dict[str, int]
+    category_occasions: dict[str, dict[str, int]]
+    colors: dict[str, int]
 
 
 class ImageAnalysisRequest(BaseModel):
@@ -65,6 +115,17 @@ class ImageAnalysisResult(BaseModel):
     suggested_category: str
     suggested_fit: str
     suggested_style_tags: list[str]
+    duplicate_item_ids: list[int] = Field(default_factory=list)
+
+
+class UploadPolicyOut(BaseModel):
+    max_dimension: int
+    max_bytes: int
+    format: str
+    fallback_format: str
+    quality: float
+    accepted_formats: list[str]
+    enforced: bool
 
 
 class OutfitSlot(BaseModel):
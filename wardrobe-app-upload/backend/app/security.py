@@ -4,11 +4,9 @@ import hmac
 import os
 from datetime import datetime, timedelta, timezone
 
-from jose import JWTError, jwt
-
 from .config import get_settings
+from .metrics import timed
 
-settings = get_settings()
 PBKDF2_ITERATIONS = 120_000
 
 
@@ -22,6 +20,7 @@ def hash_password(password: str) -> str:
     )
 
 
+@timed("verify_password")
 def verify_password(password: str, password_hash: str) -> bool:
     try:
         algorithm, iterations_raw, salt_raw, hash_raw = password_hash.split("$", 3)
@@ -39,6 +38,9 @@ def verify_password(password: str, password_hash: str) -> bool:
 
 
 def create_access_token(subject: str, expires_minutes: int | None = None) -> str:
+    from jose import jwt
+
+    settings = get_settings()
     expire_delta = timedelta(minutes=expires_minutes or settings.access_token_expire_minutes)
     payload = {
         "sub": subject,
@@ -48,6 +50,9 @@ def create_access_token(subject: str, expires_minutes: int | None = None) -> str
 
 
 def decode_token(token: str) -> dict:
+    from jose import JWTError, jwt
+
+    settings = get_settings()
     try:
         return jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
     except JWTError as exc:
@@ -55,6 +60,9 @@ def decode_token(token: str) -> dict:
 
 
 def create_oauth_state(provider: str, extra: dict | None = None) -> str:
+    from jose import jwt
+
+    settings = get_settings()
     payload = {
         "provider": provider,
         "exp": datetime.now(tz=timezone.utc) + timedelta(minutes=10),
@@ -65,6 +73,9 @@ def create_oauth_state(provider: str, extra: dict | None = None) -> str:
 
 
 def decode_oauth_state(state: str) -> dict:
+    from jose import JWTError, jwt
+
+    settings = get_settings()
     try:
         return jwt.decode(state, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
     except JWTError as exc:
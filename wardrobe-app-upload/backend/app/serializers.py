@@ -0,0 +1,77 @@
+﻿from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi.responses import Response
+
+from .models import ClothingItem, IngestJob
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def item_to_dict(item: ClothingItem) -> dict[str, Any]:
+    # Mirrors schemas.ClothingOut; rows are trusted, so no pydantic validation pass is needed.
+    return {
+        "id": item.id,
+        "name": item.name,
+        "category": item.category,
+        "occasion": item.occasion,
+        "image_base64": item.image_base64,
+        "color_hex": item.color_hex,
+        "hue": item.hue,
+        "saturation": item.saturation,
+        "lightness": item.lightness,
+        "fit": item.fit,
+        "warmth": item.warmth,
+        "style_tags": item.style_tag_list,
+        "status": item.status,
+        "created_at": item.created_at,
+    }
+
+
+def item_to_export_dict(item: ClothingItem) -> dict[str, Any]:
+    # One NDJSON line of GET /items/export; POST /items/import reads it back without re-analysis.
+    return {**item_to_dict(item), "image_hash": item.image_hash}
+
+
+def job_to_dict(job: IngestJob, item: ClothingItem | None = None) -> dict[str, Any]:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "item_id": job.item_id,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "item": item_to_dict(item) if item is not None else None,
+    }
+
+
+def render_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(Response):
+    """JSON response that writes plain dicts straight to bytes, bypassing response_model validation.
+
+    Routes keep their response_model for the OpenAPI schema but return this class directly.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
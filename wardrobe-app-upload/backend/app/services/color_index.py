@@ -0,0 +1,150 @@
+﻿from __future__ import annotations
+
+import heapq
+import math
+import threading
+
+from sqlalchemy.orm import Session
+
+from ..models import ITEM_READY, ClothingItem
+from .image_analysis import hue_distance
+from .user_index import UserIndexRegistry
+
+# Scale hue gaps so the widest gap (180 degrees) weighs the same as a full saturation/lightness span.
+HUE_WEIGHT = 100 / 180
+# Cells are CELL_SIZE wide in weighted units on every axis, so shell distance bounds are uniform.
+CELL_SIZE = 10.0
+HUE_BIN_WIDTH = CELL_SIZE / HUE_WEIGHT
+HUE_BINS = round(360 / HUE_BIN_WIDTH)
+LEVEL_BINS = round(100 / CELL_SIZE)
+# Below this size a linear scan is cheaper than walking empty shells.
+SCAN_THRESHOLD = 64
+
+Point = tuple[float, float, float]
+Cell = tuple[int, int, int]
+
+
+def color_distance(a: Point, b: Point) -> float:
+    hue_gap = hue_distance(a[0], b[0]) * HUE_WEIGHT
+    return math.sqrt(hue_gap**2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2)
+
+
+class ColorIndex:
+    """Uniform grid over one user's items in weighted HSL space, with hue wrapping around.
+
+    Queries visit cubic shells of cells around the query cell and stop once no unvisited
+    cell can hold a point closer than the current k-th best.
+    """
+
+    def __init__(self):
+        self._cells: dict[Cell, dict[int, Point]] = {}
+        self._cell_of: dict[int, Cell] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cell_of)
+
+    def add(self, item_id: int, hue: float, saturation: float, lightness: float) -> None:
+        point = (hue % 360, saturation, lightness)
+        with self._lock:
+            self._remove(item_id)
+            cell = _cell_for(point)
+            self._cells.setdefault(cell, {})[item_id] = point
+            self._cell_of[item_id] = cell
+
+    def remove(self, item_id: int) -> None:
+        with self._lock:
+            self._remove(item_id)
+
+    def get(self, item_id: int) -> Point | None:
+        with self._lock:
+            cell = self._cell_of.get(item_id)
+            return None if cell is None else self._cells[cell][item_id]
+
+    def nearest(
+        self,
+        hue: float,
+        saturation: float,
+        lightness: float,
+        k: int,
+        exclude: int | None = None,
+    ) -> list[tuple[int, float]]:
+        query = (hue % 360, saturation, lightness)
+        # Max-heap (negated distances) of the best k candidates seen so far.
+        best: list[tuple[float, int]] = []
+
+        def consider(points: dict[int, Point]) -> None:
+            for item_id, point in points.items():
+                if item_id == exclude:
+                    continue
+                distance = color_distance(query, point)
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, item_id))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, item_id))
+
+        with self._lock:
+            if len(self._cell_of) <= SCAN_THRESHOLD:
+                for points in self._cells.values():
+                    consider(points)
+            else:
+                center = _cell_for(query)
+                for ring in range(max(HUE_BINS // 2, LEVEL_BINS) + 1):
+                    # Every point in this shell is at least (ring - 1) whole cells away.
+                    if len(best) == k and -best[0][0] <= max(0, ring - 1) * CELL_SIZE:
+                        break
+                    for cell in _shell(center, ring):
+                        points = self._cells.get(cell)
+                        if points:
+                            consider(points)
+
+        return sorted(((item_id, -neg) for neg, item_id in best), key=lambda entry: entry[1])
+
+    def _remove(self, item_id: int) -> None:
+        cell = self._cell_of.pop(item_id, None)
+        if cell is not None:
+            points = self._cells[cell]
+            points.pop(item_id, None)
+            if not points:
+                del self._cells[cell]
+
+
+def _cell_for(point: Point) -> Cell:
+    return (
+        int(point[0] // HUE_BIN_WIDTH) % HUE_BINS,
+        min(LEVEL_BINS - 1, max(0, int(point[1] // CELL_SIZE))),
+        min(LEVEL_BINS - 1, max(0, int(point[2] // CELL_SIZE))),
+    )
+
+
+def _shell(center: Cell, ring: int) -> set[Cell]:
+    hue_bin, sat_bin, light_bin = center
+    cells: set[Cell] = set()
+    span = range(-ring, ring + 1)
+    for dh in span:
+        for ds in span:
+            sat = sat_bin + ds
+            if not 0 <= sat < LEVEL_BINS:
+                continue
+            for dl in span:
+                if max(abs(dh), abs(ds), abs(dl)) != ring:
+                    continue
+                light = light_bin + dl
+                if 0 <= light < LEVEL_BINS:
+                    cells.add(((hue_bin + dh) % HUE_BINS, sat, light))
+    return cells
+
+
+def _build_color_index(db: Session, user_id: int) -> ColorIndex:
+    index = ColorIndex()
+    rows = (
+        db.query(ClothingItem.id, ClothingItem.hue, ClothingItem.saturation, ClothingItem.lightness)
+        .filter(ClothingItem.user_id == user_id, ClothingItem.status == ITEM_READY)
+        .all()
+    )
+    for item_id, hue, saturation, lightness in rows:
+        index.add(item_id, hue, saturation, lightness)
+    return index
+
+
+color_indexes: UserIndexRegistry[ColorIndex] = UserIndexRegistry(_build_color_index)
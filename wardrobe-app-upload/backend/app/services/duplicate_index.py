@@ -0,0 +1,91 @@
+﻿from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+
+from sqlalchemy.orm import Session
+
+from ..models import ClothingItem
+from .user_index import UserIndexRegistry
+
+
+@dataclass
+class _Node:
+    value: int
+    item_ids: list[int] = field(default_factory=list)
+    children: dict[int, "_Node"] = field(default_factory=dict)
+
+
+class HashIndex:
+    """BK-tree over one user's perceptual hashes, searched by Hamming distance."""
+
+    def __init__(self):
+        self._root: _Node | None = None
+        self._lock = threading.Lock()
+
+    def add(self, item_id: int, image_hash: str) -> None:
+        value = int(image_hash, 16)
+        with self._lock:
+            if self._root is None:
+                self._root = _Node(value, [item_id])
+                return
+
+            node = self._root
+            while True:
+                distance = _hamming(value, node.value)
+                if distance == 0:
+                    if item_id not in node.item_ids:
+                        node.item_ids.append(item_id)
+                    return
+                child = node.children.get(distance)
+                if child is None:
+                    node.children[distance] = _Node(value, [item_id])
+                    return
+                node = child
+
+    def remove(self, item_id: int, image_hash: str) -> None:
+        # Nodes stay in place to keep routing intact; only the item reference goes away.
+        value = int(image_hash, 16)
+        with self._lock:
+            node = self._root
+            while node is not None:
+                distance = _hamming(value, node.value)
+                if distance == 0:
+                    if item_id in node.item_ids:
+                        node.item_ids.remove(item_id)
+                    return
+                node = node.children.get(distance)
+
+    def search(self, image_hash: str, max_distance: int) -> list[tuple[int, int]]:
+        value = int(image_hash, 16)
+        matches: list[tuple[int, int]] = []
+        with self._lock:
+            stack = [self._root] if self._root is not None else []
+            while stack:
+                node = stack.pop()
+                distance = _hamming(value, node.value)
+                if distance <= max_distance:
+                    matches.extend((item_id, distance) for item_id in node.item_ids)
+                for edge, child in node.children.items():
+                    if distance - max_distance <= edge <= distance + max_distance:
+                        stack.append(child)
+        return sorted(matches, key=lambda entry: (entry[1], entry[0]))
+
+
+def _hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _build_hash_index(db: Session, user_id: int) -> HashIndex:
+    index = HashIndex()
+    rows = (
+        db.query(ClothingItem.id, ClothingItem.image_hash)
+        .filter(ClothingItem.user_id == user_id, ClothingItem.image_hash.is_not(None))
+        .all()
+    )
+    for item_id, image_hash in rows:
+        index.add(item_id, image_hash)
+    return index
+
+
+hash_indexes: UserIndexRegistry[HashIndex] = UserIndexRegistry(_build_hash_index)
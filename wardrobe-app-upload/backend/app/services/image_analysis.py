@@ -1,7 +1,14 @@
-﻿import base64
+﻿from __future__ import annotations
+
+import base64
+import hashlib
 import io
+from typing import TYPE_CHECKING
+
+from ..metrics import timed
 
-from PIL import Image
+if TYPE_CHECKING:
+    from PIL import Image
 
 
 def _strip_data_url_prefix(data: str) -> str:
@@ -10,14 +17,41 @@ def _strip_data_url_prefix(data: str) -> str:
     return data
 
 
-def decode_base64_image(image_base64: str) -> Image.Image:
-    raw = base64.b64decode(_strip_data_url_prefix(image_base64))
-    image = Image.open(io.BytesIO(raw)).convert("RGBA")
-    return image
+def decode_base64(image_base64: str) -> bytes:
+    return base64.b64decode(_strip_data_url_prefix(image_base64))
+
+
+@timed("decode_image")
+def decode_image(raw: bytes) -> Image.Image:
+    from PIL import Image
+
+    return Image.open(io.BytesIO(raw)).convert("RGBA")
+
+
+def decode_base64_image(image_base64: str, raw: bytes | None = None) -> Image.Image:
+    # raw is image_base64 already decoded by the caller (see upload_policy.check_upload).
+    return decode_image(raw if raw is not None else decode_base64(image_base64))
+
+
+def encoded_size(image_base64: str) -> int:
+    # Decoded byte count from the base64 length alone (within padding), without decoding.
+    return len(_strip_data_url_prefix(image_base64).strip()) * 3 // 4
+
+
+def probe_image(raw: bytes) -> tuple[str, int, int]:
+    """MIME type, width and height read from the image header; pixels are not decoded."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(raw)) as image:
+        return image.get_format_mimetype() or "", image.width, image.height
 
 
 def dominant_color_from_base64(image_base64: str) -> tuple[str, float, float, float]:
-    image = decode_base64_image(image_base64)
+    return dominant_color(decode_base64_image(image_base64))
+
+
+@timed("dominant_color")
+def dominant_color(image: Image.Image) -> tuple[str, float, float, float]:
     tiny = image.resize((48, 48))
     pixels = list(tiny.getdata())
 
@@ -35,7 +69,10 @@ def dominant_color_from_base64(image_base64: str) -> tuple[str, float, float, fl
 
 
 def suggest_clothing_metadata(image_base64: str) -> tuple[str, str, list[str]]:
-    image = decode_base64_image(image_base64)
+    return suggest_metadata(decode_base64_image(image_base64))
+
+
+def suggest_metadata(image: Image.Image) -> tuple[str, str, list[str]]:
     width, height = image.size
     ratio = width / max(height, 1)
 
@@ -47,7 +84,7 @@ def suggest_clothing_metadata(image_base64: str) -> tuple[str, str, list[str]]:
         box_h = max(1, bbox[3] - bbox[1])
         coverage = (box_w * box_h) / max(width * height, 1)
 
-    _, hue, sat, lig = dominant_color_from_base64(image_base64)
+    _, hue, sat, lig = dominant_color(image)
 
     if coverage < 0.2:
         category = "accessory"
@@ -80,6 +117,38 @@ def suggest_clothing_metadata(image_base64: str) -> tuple[str, str, list[str]]:
     return category, fit, tags
 
 
+# 64-bit difference hash (dHash) as 16 hex chars; transparent areas are flattened to white
+# so cut-out photos of the same garment hash alike regardless of their background.
+@timed("perceptual_hash")
+def perceptual_hash(image: Image.Image) -> str:
+    from PIL import Image
+
+    flat = Image.new("RGBA", image.size, (255, 255, 255, 255))
+    flat.alpha_composite(image)
+    gray = flat.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(gray.getdata())
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:016x}"
+
+
+def image_digest(image_base64: str) -> str:
+    # Exact-copy fingerprint of the encoded bytes; the data URL prefix does not count.
+    return hashlib.sha256(_strip_data_url_prefix(image_base64).strip().encode("ascii", "ignore")).hexdigest()
+
+
+def hex_to_rgb(color_hex: str) -> tuple[int, int, int]:
+    value = color_hex.strip().lstrip("#")
+    if len(value) != 6:
+        raise ValueError("expected a #rrggbb color")
+    return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+
+
 def rgb_to_hsl(r: int, g: int, b: int) -> tuple[float, float, float]:
     rn = r / 255
     gn = g / 255
@@ -103,4 +172,10 @@ def rgb_to_hsl(r: int, g: int, b: int) -> tuple[float, float, float]:
         else:
             hue = 60 * (((rn - gn) / delta) + 4)
 
-    return round(hue, 2), round(sat * 100, 2), round(light * 100, 2)
+    return round(hue, 2), round(sat * 100, 2), round(light * 100, 2)
+
+
+def hue_distance(h1: float, h2: float) -> float:
+    """Shortest way around the hue circle, in degrees (0..180)."""
+    gap = abs(h1 - h2)
+    return min(gap, 360 - gap)
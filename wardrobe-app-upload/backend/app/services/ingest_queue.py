@@ -0,0 +1,269 @@
+﻿from __future__ import annotations
+
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import all_shards, get_engine, shard_session
+from ..models import ITEM_PENDING, ClothingItem, IngestJob, utc_now
+from ..schemas import ClothingCreate
+from .item_store import apply_features, build_item, extract_features, find_duplicates, index_item, record_change
+from .wardrobe_summary import summary_delta, update_summary
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class PermanentJobError(Exception):
+    """A failure that retrying cannot fix, such as an undecodable image."""
+
+
+def enqueue_upload(db: Session, user_id: int, payload: ClothingCreate) -> tuple[IngestJob, ClothingItem]:
+    item = build_item(user_id, payload)
+    db.add(item)
+    db.flush()
+    update_summary(db, user_id, summary_delta([item]))
+    record_change(db, user_id, item.id, "upsert")
+
+    job = IngestJob(
+        user_id=user_id,
+        item_id=item.id,
+        status=JOB_QUEUED,
+        allow_duplicate=payload.allow_duplicate,
+        max_attempts=get_settings().ingest_max_attempts,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(item)
+    db.refresh(job)
+    workers.notify()
+    return job, item
+
+
+def _claimable(now):
+    # Queued jobs that are due, plus running jobs whose worker died without releasing them.
+    return or_(
+        and_(IngestJob.status == JOB_QUEUED, IngestJob.run_after <= now),
+        and_(
+            IngestJob.status == JOB_RUNNING,
+            IngestJob.lease_expires_at < now,
+            IngestJob.attempts < IngestJob.max_attempts,
+        ),
+    )
+
+
+def _abandoned(now):
+    # Expired leases with no attempts left: an upload that kills its worker every time (OOM,
+    # decompression bomb) must fail instead of being retried forever.
+    return and_(
+        IngestJob.status == JOB_RUNNING,
+        IngestJob.lease_expires_at < now,
+        IngestJob.attempts >= IngestJob.max_attempts,
+    )
+
+
+def _held(job_id: int, lease_expires_at: datetime):
+    # Still running under this worker's lease; once it expires another worker may own the job.
+    return and_(
+        IngestJob.id == job_id, IngestJob.status == JOB_RUNNING, IngestJob.lease_expires_at == lease_expires_at
+    )
+
+
+def claim_next_job(db: Session) -> tuple[int, datetime] | None:
+    """Claim a due job; returns its id and the lease expiry that proves ownership."""
+    now = utc_now()
+    _fail_abandoned(db, now)
+    lease = timedelta(seconds=get_settings().ingest_lease_seconds)
+    candidates = db.scalars(
+        select(IngestJob.id).where(_claimable(now)).order_by(IngestJob.run_after, IngestJob.id).limit(8)
+    ).all()
+    for job_id in candidates:
+        # The conditional UPDATE is the lock: only one worker (or process) sees rowcount 1.
+        claimed = db.execute(
+            update(IngestJob)
+            .where(IngestJob.id == job_id, _claimable(now))
+            .values(
+                status=JOB_RUNNING,
+                attempts=IngestJob.attempts + 1,
+                lease_expires_at=now + lease,
+                updated_at=now,
+            )
+        ).rowcount
+        db.commit()
+        if claimed:
+            return job_id, now + lease
+    return None
+
+
+def _fail_abandoned(db: Session, now: datetime) -> None:
+    job_ids = db.scalars(select(IngestJob.id).where(_abandoned(now)).limit(8)).all()
+    for job_id in job_ids:
+        failed = db.execute(
+            update(IngestJob)
+            .where(IngestJob.id == job_id, _abandoned(now))
+            .values(
+                status=JOB_FAILED,
+                error="Worker stopped while processing the upload",
+                lease_expires_at=None,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if failed:
+            _discard_pending_item(db, db.get(IngestJob, job_id).item_id)
+        db.commit()
+
+
+def process_job(job_id: int, lease_expires_at: datetime, shard: int | None = None) -> None:
+    # Job ids are only unique within a shard, so the shard travels with them.
+    db = shard_session(shard)
+    try:
+        _process(db, job_id, lease_expires_at)
+    except PermanentJobError as exc:
+        db.rollback()
+        _fail(db, job_id, lease_expires_at, str(exc), retry=False)
+    except Exception as exc:
+        db.rollback()
+        logger.exception("ingest job %s failed", job_id)
+        _fail(db, job_id, lease_expires_at, f"{type(exc).__name__}: {exc}"[:255], retry=True)
+    finally:
+        db.close()
+
+
+def _process(db: Session, job_id: int, lease_expires_at: datetime) -> None:
+    job = db.get(IngestJob, job_id)
+    item = db.get(ClothingItem, job.item_id)
+    if item is None:
+        raise PermanentJobError("Item was deleted before processing")
+
+    try:
+        features = extract_features(item.image_base64)
+    except Exception as exc:
+        raise PermanentJobError("Invalid image data") from exc
+
+    if not job.allow_duplicate and find_duplicates(db, item.user_id, features.image_hash, features.color):
+        raise PermanentJobError("Likely duplicate of an existing item")
+
+    finished = db.execute(
+        update(IngestJob)
+        .where(_held(job_id, lease_expires_at))
+        .values(status=JOB_DONE, error=None, lease_expires_at=None, updated_at=utc_now())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not finished:
+        # The lease ran out and the job was claimed again; applying this result as well would
+        # count the item twice.
+        db.rollback()
+        return
+
+    # Moves the item from the pending count to the ready category and color counts.
+    delta = summary_delta([item], -1)
+    apply_features(item, features)
+    delta.update(summary_delta([item]))
+    update_summary(db, item.user_id, delta)
+    version = record_change(db, item.user_id, item.id, "upsert")
+    db.commit()
+    index_item(item, version)
+
+
+def _fail(db: Session, job_id: int, lease_expires_at: datetime, error: str, retry: bool) -> None:
+    job = db.get(IngestJob, job_id)
+    now = utc_now()
+    if retry and job.attempts < job.max_attempts:
+        delay = get_settings().ingest_retry_base_seconds * 2 ** (job.attempts - 1)
+        values = {"status": JOB_QUEUED, "run_after": now + timedelta(seconds=delay)}
+    else:
+        values = {"status": JOB_FAILED}
+
+    released = db.execute(
+        update(IngestJob)
+        .where(_held(job_id, lease_expires_at))
+        .values(error=error, lease_expires_at=None, updated_at=now, **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if released and values["status"] == JOB_FAILED:
+        _discard_pending_item(db, job.item_id)
+    db.commit()
+
+
+def _discard_pending_item(db: Session, item_id: int) -> None:
+    # The placeholder never became a real item, so take it back out of the wardrobe.
+    item = db.get(ClothingItem, item_id)
+    if item is not None and item.status == ITEM_PENDING:
+        db.delete(item)
+        update_summary(db, item.user_id, summary_delta([item], -1))
+        record_change(db, item.user_id, item.id, "delete")
+
+
+class IngestWorkers:
+    """Daemon threads that claim and process ingest jobs until stopped."""
+
+    def __init__(self):
+        self._threads: list[threading.Thread] = []
+        self._next_shard = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def start(self, count: int, poll_seconds: float) -> None:
+        if self._threads or count <= 0:
+            return
+        get_engine()
+        self._stop.clear()
+        for number in range(count):
+            thread = threading.Thread(
+                target=self._run, args=(poll_seconds,), name=f"ingest-worker-{number}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        # Jobs still running when the process exits are picked up again once their lease expires.
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def _run(self, poll_seconds: float) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                claimed = self._claim()
+            except Exception:
+                logger.exception("could not claim ingest job")
+                claimed = None
+
+            if claimed is None:
+                self._wake.wait(poll_seconds)
+                continue
+            try:
+                process_job(*claimed)
+            except Exception:
+                # process_job records job failures itself; this is one it could not record (the
+                # database went away). The lease expires and another claim retries the job.
+                logger.exception("ingest job %s could not be processed", claimed[0])
+
+    def _claim(self) -> tuple[int, datetime, int | None] | None:
+        # Start at a different shard each time so one busy shard cannot starve the others.
+        shards = all_shards()
+        self._next_shard = (self._next_shard + 1) % len(shards)
+        for shard in shards[self._next_shard :] + shards[: self._next_shard]:
+            with shard_session(shard) as db:
+                claimed = claim_next_job(db)
+            if claimed is not None:
+                return *claimed, shard
+        return None
+
+
+workers = IngestWorkers()
@@ -0,0 +1,135 @@
+﻿from __future__ import annotations
+
+from dataclasses import dataclass
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import ITEM_PENDING, ITEM_READY, ClothingItem, ClothingTag, ItemChange
+from ..schemas import ClothingCreate
+from .color_index import ColorIndex, color_distance, color_indexes
+from .duplicate_index import HashIndex, hash_indexes
+from .image_analysis import decode_base64_image, dominant_color, image_digest, perceptual_hash
+from .tagging import normalize_tags, tag_mask
+from .user_index import bump_wardrobe_version, wardrobe_version
+
+# Shown for pending items until their dominant color is known.
+PENDING_COLOR = ("#d9d9d9", 0.0, 0.0, 85.0)
+
+
+@dataclass
+class ImageFeatures:
+    color_hex: str
+    hue: float
+    saturation: float
+    lightness: float
+    image_hash: str
+
+    @property
+    def color(self) -> tuple[float, float, float]:
+        return (self.hue, self.saturation, self.lightness)
+
+
+def extract_features(image_base64: str, raw: bytes | None = None) -> ImageFeatures:
+    image = decode_base64_image(image_base64, raw)
+    color_hex, hue, saturation, lightness = dominant_color(image)
+    return ImageFeatures(color_hex, hue, saturation, lightness, perceptual_hash(image))
+
+
+def build_item(user_id: int, payload: ClothingCreate) -> ClothingItem:
+    """A pending item from an upload; apply_features() fills in the analyzed fields."""
+    tags = normalize_tags(payload.style_tags)
+    color_hex, hue, saturation, lightness = PENDING_COLOR
+    return ClothingItem(
+        user_id=user_id,
+        name=payload.name,
+        category=payload.category,
+        occasion=payload.occasion,
+        image_base64=payload.image_base64,
+        color_hex=color_hex,
+        hue=hue,
+        saturation=saturation,
+        lightness=lightness,
+        fit=payload.fit,
+        warmth=payload.warmth,
+        style_tags=",".join(tags),
+        style_tag_list=tags,
+        tag_mask=tag_mask(tags),
+        image_digest=image_digest(payload.image_base64),
+        status=ITEM_PENDING,
+        tags=[ClothingTag(user_id=user_id, tag=tag) for tag in tags],
+    )
+
+
+def apply_features(item: ClothingItem, features: ImageFeatures) -> None:
+    item.color_hex = features.color_hex
+    item.hue = features.hue
+    item.saturation = features.saturation
+    item.lightness = features.lightness
+    item.image_hash = features.image_hash
+    item.status = ITEM_READY
+
+
+def record_change(db: Session, user_id: int, item_id: int, op: str) -> int:
+    return record_changes(db, user_id, [item_id], op)
+
+
+def record_changes(db: Session, user_id: int, item_ids: list[int], op: str) -> int:
+    """Log the changes and bump the wardrobe version; returns the new version."""
+    # One executemany; added as objects, SQLite would insert them a row at a time to return ids.
+    db.execute(insert(ItemChange), [{"user_id": user_id, "item_id": item_id, "op": op} for item_id in item_ids])
+    return bump_wardrobe_version(db, user_id)
+
+
+def find_duplicates(
+    db: Session,
+    user_id: int,
+    image_hash: str,
+    color: tuple[float, float, float],
+    version: int | None = None,
+) -> list[int]:
+    settings = get_settings()
+    if version is None:
+        version = wardrobe_version(db, user_id)
+    matches = hash_indexes.get(db, user_id, version).search(image_hash, settings.duplicate_hash_distance)
+    if not matches:
+        return []
+
+    colors = color_indexes.get(db, user_id, version)
+    result: list[int] = []
+    for item_id, _ in matches:
+        point = colors.get(item_id)
+        if point is not None and color_distance(point, color) <= settings.duplicate_color_distance:
+            result.append(item_id)
+    return result
+
+
+def index_items(user_id: int, items: list[ClothingItem], version: int) -> None:
+    # Only indexes that are already built are maintained; the rest load from the table on first use.
+    ready = [item for item in items if item.status == ITEM_READY]
+
+    def add_colors(index: ColorIndex) -> None:
+        for item in ready:
+            index.add(item.id, item.hue, item.saturation, item.lightness)
+
+    def add_hashes(index: HashIndex) -> None:
+        for item in ready:
+            if item.image_hash:
+                index.add(item.id, item.image_hash)
+
+    color_indexes.apply(user_id, version, add_colors)
+    hash_indexes.apply(user_id, version, add_hashes)
+
+
+def index_item(item: ClothingItem, version: int) -> None:
+    index_items(item.user_id, [item], version)
+
+
+def unindex_item(user_id: int, item_id: int, image_hash: str | None, version: int) -> None:
+    def remove_hash(index: HashIndex) -> None:
+        if image_hash:
+            index.remove(item_id, image_hash)
+
+    color_indexes.apply(user_id, version, lambda index: index.remove(item_id))
+    hash_indexes.apply(user_id, version, remove_hash)
@@ -0,0 +1,135 @@
+﻿from __future__ import annotations
+
+import json
+from collections.abc import Iterator
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..database import user_session
+from ..models import ITEM_PENDING, ClothingItem
+from ..schemas import ClothingImport
+from ..serializers import item_to_export_dict, render_json
+from .item_store import ImageFeatures, apply_features, build_item, extract_features, index_items, record_changes
+from .wardrobe_summary import summary_delta, update_summary
+
+# Export reads in short keyset-paged transactions: an SQLite cursor held open for the whole
+# download would block writers for as long as the slowest client takes to read it.
+EXPORT_PAGE_SIZE = 100
+# Import commits once either limit is reached; images dominate the size of a batch.
+IMPORT_BATCH_ITEMS = 100
+IMPORT_BATCH_BYTES = 8 * 1024 * 1024
+MAX_REPORTED_ERRORS = 50
+
+
+def export_lines(user_id: int) -> Iterator[bytes]:
+    last_id = 0
+    while True:
+        with user_session(user_id) as db:
+            items = db.scalars(
+                select(ClothingItem)
+                .where(ClothingItem.user_id == user_id, ClothingItem.id > last_id)
+                .order_by(ClothingItem.id)
+                .limit(EXPORT_PAGE_SIZE)
+            ).all()
+            lines = [render_json(item_to_export_dict(item)) + b"\n" for item in items]
+
+        yield from lines
+        if len(items) < EXPORT_PAGE_SIZE:
+            return
+        last_id = items[-1].id
+
+
+class ItemImporter:
+    """Collects parsed NDJSON lines and writes them in batched transactions.
+
+    add() only parses; flush() does the database work and is meant for a worker thread.
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.imported = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors: list[str] = []
+        self._batch: list[tuple[int, ClothingImport]] = []
+        self._batch_bytes = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self._batch) >= IMPORT_BATCH_ITEMS or self._batch_bytes >= IMPORT_BATCH_BYTES
+
+    def add(self, line_number: int, line: bytes) -> None:
+        if not line.strip():
+            return
+        try:
+            row = ClothingImport.model_validate(json.loads(line))
+        except (ValueError, ValidationError) as exc:
+            self._error(line_number, f"invalid record ({type(exc).__name__})")
+            return
+        self._batch.append((line_number, row))
+        self._batch_bytes += len(line)
+
+    def flush(self) -> None:
+        batch, self._batch, self._batch_bytes = self._batch, [], 0
+        if not batch:
+            return
+
+        # Committed rows stay loaded so index maintenance does not reload them one by one.
+        with user_session(self.user_id, expire_on_commit=False) as db:
+            items = self._build_items(db, batch)
+            if not items:
+                return
+            db.add_all(items)
+            db.flush()
+            update_summary(db, self.user_id, summary_delta(items))
+            version = record_changes(db, self.user_id, [item.id for item in items], "upsert")
+            db.commit()
+            index_items(self.user_id, items, version)
+        self.imported += len(items)
+
+    def result(self) -> dict[str, object]:
+        return {"imported": self.imported, "skipped": self.skipped, "failed": self.failed, "errors": self.errors}
+
+    def _build_items(self, db: Session, batch: list[tuple[int, ClothingImport]]) -> list[ClothingItem]:
+        candidates = [(line_number, row, build_item(self.user_id, row)) for line_number, row in batch]
+        digests = {item.image_digest for _, _, item in candidates}
+        # Also covers copies earlier in this same file, since those batches are already committed.
+        seen = set(
+            db.scalars(
+                select(ClothingItem.image_digest).where(
+                    ClothingItem.user_id == self.user_id, ClothingItem.image_digest.in_(digests)
+                )
+            )
+        )
+
+        items: list[ClothingItem] = []
+        for line_number, row, item in candidates:
+            if item.image_digest in seen:
+                self.skipped += 1
+                continue
+            seen.add(item.image_digest)
+
+            try:
+                apply_features(item, _exported_features(row) or extract_features(row.image_base64))
+            except Exception:
+                self._error(line_number, "invalid image data")
+                continue
+            if row.created_at is not None:
+                item.created_at = row.created_at
+            items.append(item)
+        return items
+
+    def _error(self, line_number: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line_number}: {message}")
+
+
+def _exported_features(row: ClothingImport) -> ImageFeatures | None:
+    # Trust analysis from our own export; anything partial or pending is recomputed.
+    values = (row.color_hex, row.hue, row.saturation, row.lightness, row.image_hash)
+    if row.status == ITEM_PENDING or any(value is None for value in values):
+        return None
+    return ImageFeatures(*values)
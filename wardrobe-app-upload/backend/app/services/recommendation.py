@@ -4,7 +4,14 @@ import itertools
 import random
 from dataclasses import dataclass
 
+from ..metrics import timed
 from ..models import ClothingItem
+from .image_analysis import hue_distance
+from .tagging import TAG_BITS
+
+
+# An outfit needs one of each; outer and accessory are added when available.
+REQUIRED_SLOTS = ("top", "bottom", "shoes")
 
 
 @dataclass
@@ -14,8 +21,14 @@ class OutfitResult:
     slots: dict[str, ClothingItem]
 
 
-def generate_outfit(items: list[ClothingItem], occasion: str = "all") -> OutfitResult | None:
-    candidate_items = [item for item in items if _occasion_match(item.occasion, occasion)]
+@timed("generate_outfit")
+def generate_outfit(
+    items: list[ClothingItem],
+    occasion: str = "all",
+    rng: random.Random | None = None,
+) -> OutfitResult | None:
+    rng = rng or random.Random()
+    candidate_items = [item for item in items if occasion_match(item.occasion, occasion)]
 
     groups = {
         "top": [i for i in candidate_items if i.category == "top"],
@@ -25,16 +38,16 @@ def generate_outfit(items: list[ClothingItem], occasion: str = "all") -> OutfitR
         "accessory": [i for i in candidate_items if i.category == "accessory"],
     }
 
-    if not groups["top"] or not groups["bottom"] or not groups["shoes"]:
+    if not all(groups[slot] for slot in REQUIRED_SLOTS):
         return None
 
     best: OutfitResult | None = None
 
-    top_pool = _sample(groups["top"], 12)
-    bottom_pool = _sample(groups["bottom"], 12)
-    shoes_pool = _sample(groups["shoes"], 10)
-    outer_pool = _sample(groups["outer"], 8)
-    accessory_pool = _sample(groups["accessory"], 8)
+    top_pool = _sample(groups["top"], 12, rng)
+    bottom_pool = _sample(groups["bottom"], 12, rng)
+    shoes_pool = _sample(groups["shoes"], 10, rng)
+    outer_pool = _sample(groups["outer"], 8, rng)
+    accessory_pool = _sample(groups["accessory"], 8, rng)
 
     for top, bottom, shoes in itertools.product(top_pool, bottom_pool, shoes_pool):
         slots = {
@@ -50,7 +63,7 @@ def generate_outfit(items: list[ClothingItem], occasion: str = "all") -> OutfitR
             slots["accessory"] = _pick_best_addon(accessory_pool, [top, bottom, shoes])
 
         score, reasons = _score_outfit(slots, occasion)
-        score += random.random() * 2.2
+        score += rng.random() * 2.2
 
         if not best or score > best.score:
             best = OutfitResult(score=score, reasons=reasons, slots=slots)
@@ -102,13 +115,13 @@ def _score_outfit(slots: dict[str, ClothingItem], occasion: str) -> tuple[float,
     score += occasion_bonus
 
     # Rule 6: style tags that mirror popular clean/commute aesthetics
-    tags = _collect_tags(slots)
-    if "clean" in tags:
+    tags = _collect_tag_mask(slots)
+    if tags & TAG_BITS["clean"]:
         score += 5
-    if occasion == "work" and "neutral" in tags:
+    if occasion == "work" and tags & TAG_BITS["neutral"]:
         score += 6
         reasons.append("通勤中性色稳定")
-    if occasion == "date" and "accent" in tags:
+    if occasion == "date" and tags & TAG_BITS["accent"]:
         score += 6
         reasons.append("约会造型有记忆点")
 
@@ -119,7 +132,7 @@ def _score_outfit(slots: dict[str, ClothingItem], occasion: str) -> tuple[float,
 
 
 def _pair_harmony(a: ClothingItem, b: ClothingItem) -> float:
-    hue_gap = _hue_distance(a.hue, b.hue)
+    hue_gap = hue_distance(a.hue, b.hue)
     sat_gap = abs(a.saturation - b.saturation)
 
     result = 0.0
@@ -136,12 +149,7 @@ def _pair_harmony(a: ClothingItem, b: ClothingItem) -> float:
     return result
 
 
-def _hue_distance(h1: float, h2: float) -> float:
-    gap = abs(h1 - h2)
-    return min(gap, 360 - gap)
-
-
-def _occasion_match(item_occasion: str, selected: str) -> bool:
+def occasion_match(item_occasion: str, selected: str) -> bool:
     if selected == "all":
         return True
     return item_occasion == selected or item_occasion == "all"
@@ -151,21 +159,16 @@ def _pick_best_addon(pool: list[ClothingItem], anchors: list[ClothingItem]) -> C
     return max(pool, key=lambda addon: sum(_pair_harmony(addon, a) for a in anchors))
 
 
-def _sample(pool: list[ClothingItem], max_count: int) -> list[ClothingItem]:
+def _sample(pool: list[ClothingItem], max_count: int, rng: random.Random) -> list[ClothingItem]:
     if len(pool) <= max_count:
         return pool
     copy = list(pool)
-    random.shuffle(copy)
+    rng.shuffle(copy)
     return copy[:max_count]
 
 
-def _collect_tags(slots: dict[str, ClothingItem]) -> set[str]:
-    tags: set[str] = set()
+def _collect_tag_mask(slots: dict[str, ClothingItem]) -> int:
+    mask = 0
     for item in slots.values():
-        raw_tags = item.style_tags.strip()
-        if raw_tags:
-            for tag in raw_tags.split(","):
-                clean = tag.strip()
-                if clean:
-                    tags.add(clean)
-    return tags
+        mask |= item.tag_mask or 0
+    return mask
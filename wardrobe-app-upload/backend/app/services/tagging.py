@@ -0,0 +1,26 @@
+﻿from __future__ import annotations
+
+# Tags produced by image analysis. Each gets a fixed bit so the recommender can
+# test tag membership on an integer instead of re-parsing strings.
+KNOWN_TAGS = ("neutral", "clean", "accent", "fresh", "warm")
+TAG_BITS = {tag: 1 << index for index, tag in enumerate(KNOWN_TAGS)}
+
+
+def normalize_tags(tags: list[str]) -> list[str]:
+    result: list[str] = []
+    for tag in tags:
+        clean = tag.strip().lower()
+        if clean and clean not in result:
+            result.append(clean)
+    return result
+
+
+def split_tags(raw: str) -> list[str]:
+    return [tag.strip() for tag in raw.split(",") if tag.strip()]
+
+
+def tag_mask(tags: list[str]) -> int:
+    mask = 0
+    for tag in tags:
+        mask |= TAG_BITS.get(tag, 0)
+    return mask
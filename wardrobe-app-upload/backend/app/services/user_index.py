@@ -0,0 +1,96 @@
+﻿from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models import WardrobeVersion
+
+T = TypeVar("T")
+
+
+class _Entry(Generic[T]):
+    __slots__ = ("version", "index")
+
+    def __init__(self, version: int, index: T):
+        self.version = version
+        self.index = index
+
+
+def wardrobe_version(db: Session, user_id: int) -> int:
+    return db.scalar(select(WardrobeVersion.version).where(WardrobeVersion.user_id == user_id)) or 0
+
+
+def bump_wardrobe_version(db: Session, user_id: int) -> int:
+    """Increment the user's version in the caller's transaction and return the new value."""
+    # Atomic in SQL so concurrent writers never hand out the same version twice.
+    if db.get_bind(WardrobeVersion.__mapper__).dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    table = WardrobeVersion.__table__
+    stmt = insert(table).values(user_id=user_id, version=1)
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.user_id], set_={"version": table.c.version + 1})
+    return db.execute(stmt.returning(table.c.version)).scalar_one()
+
+
+class UserIndexRegistry(Generic[T]):
+    """Keeps one lazily built in-memory index per user, evicting the least recently used.
+
+    Every index remembers the wardrobe_version it was built at. Writes from any process bump
+    that version in the user's shard, so an index older than the version a request sees is
+    rebuilt; workers never need to talk to each other to stay coherent.
+    """
+
+    def __init__(self, build: Callable[[Session, int], T], max_users: int = 512):
+        self._build = build
+        self._max_users = max_users
+        self._indexes: OrderedDict[int, _Entry[T]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: int, version: int | None = None) -> T:
+        """Pass the wardrobe_version the request already read to save a query."""
+        if version is None:
+            version = wardrobe_version(db, user_id)
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            if entry is not None and entry.version >= version:
+                self._indexes.move_to_end(user_id)
+                return entry.index
+
+        # The version was read before the rows, so the index is at least as new as its label.
+        index = self._build(db, user_id)
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            if entry is None or entry.version < version:
+                self._indexes[user_id] = _Entry(version, index)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self._max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def apply(self, user_id: int, version: int, change: Callable[[T], None]) -> None:
+        """Apply a committed local write, which moved the user to `version`, to a built index."""
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            if entry is None or entry.version >= version:
+                return
+            if entry.version != version - 1:
+                # Another process wrote in between; reload from the table on next use instead.
+                del self._indexes[user_id]
+                return
+            change(entry.index)
+            entry.version = version
+
+    def discard(self, user_id: int) -> None:
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
@@ -0,0 +1,132 @@
+﻿from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Iterable
+
+from sqlalchemy import Insert, select
+from sqlalchemy.orm import Session
+
+from ..models import ITEM_READY, ClothingItem, WardrobeCount
+from .recommendation import REQUIRED_SLOTS, occasion_match
+
+STATUS = "status"
+SLOT = "slot"
+COLOR = "color"
+
+# Same threshold as the "neutral" style tag; everything more saturated is bucketed by hue.
+NEUTRAL_SATURATION = 20
+HUE_BUCKET_DEGREES = 30
+
+SummaryDelta = Counter[tuple[str, str]]
+
+
+def color_bucket(hue: float, saturation: float, lightness: float) -> str:
+    if saturation < NEUTRAL_SATURATION:
+        if lightness < 35:
+            return "neutral-dark"
+        if lightness > 70:
+            return "neutral-light"
+        return "neutral-mid"
+    start = int(hue % 360 // HUE_BUCKET_DEGREES) * HUE_BUCKET_DEGREES
+    return f"hue-{start:03d}"
+
+
+def summary_keys(item: ClothingItem) -> list[tuple[str, str]]:
+    keys = [(STATUS, item.status)]
+    # Pending items only carry a placeholder color and cannot be recommended yet.
+    if item.status == ITEM_READY:
+        keys.append((SLOT, f"{item.category}|{item.occasion}"))
+        keys.append((COLOR, color_bucket(item.hue, item.saturation, item.lightness)))
+    return keys
+
+
+def summary_delta(items: Iterable[ClothingItem], sign: int = 1) -> SummaryDelta:
+    delta: SummaryDelta = Counter()
+    for item in items:
+        for key in summary_keys(item):
+            delta[key] += sign
+    return delta
+
+
+def update_summary(db: Session, user_id: int, delta: SummaryDelta) -> None:
+    """Apply count changes in the caller's transaction, so they commit or roll back with the items."""
+    stmt = summary_upsert(db.get_bind(WardrobeCount.__mapper__).dialect.name, user_id, delta)
+    if stmt is not None:
+        db.execute(stmt)
+
+
+def summary_upsert(dialect_name: str, user_id: int, delta: SummaryDelta) -> Insert | None:
+    rows = [
+        {"user_id": user_id, "dimension": dimension, "bucket": bucket, "item_count": count}
+        for (dimension, bucket), count in delta.items()
+        if count
+    ]
+    if not rows:
+        return None
+
+    # Both dialects spell the upsert the same way, but each needs its own insert construct.
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    table = WardrobeCount.__table__
+    stmt = insert(table).values(rows)
+    # One upsert per write; relative increments never lose a concurrent writer's update.
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.dimension, table.c.bucket],
+        set_={"item_count": table.c.item_count + stmt.excluded.item_count},
+    )
+
+
+def load_summary(db: Session, user_id: int) -> dict[str, object]:
+    rows = db.execute(
+        select(WardrobeCount.dimension, WardrobeCount.bucket, WardrobeCount.item_count)
+        .where(WardrobeCount.user_id == user_id, WardrobeCount.item_count > 0)
+        .order_by(WardrobeCount.dimension, WardrobeCount.bucket)
+    ).all()
+
+    statuses: dict[str, int] = {}
+    categories: Counter[str] = Counter()
+    occasions: Counter[str] = Counter()
+    by_category: dict[str, dict[str, int]] = {}
+    colors: dict[str, int] = {}
+    for dimension, bucket, count in rows:
+        if dimension == STATUS:
+            statuses[bucket] = count
+        elif dimension == SLOT:
+            category, occasion = bucket.split("|", 1)
+            categories[category] += count
+            occasions[occasion] += count
+            by_category.setdefault(category, {})[occasion] = count
+        elif dimension == COLOR:
+            colors[bucket] = count
+
+    return {
+        "total": sum(statuses.values()),
+        "statuses": statuses,
+        "categories": dict(categories),
+        "occasions": dict(occasions),
+        "category_occasions": by_category,
+        "colors": colors,
+    }
+
+
+def candidate_counts(db: Session, user_id: int, occasion: str) -> Counter[str]:
+    """Ready items per category that generate_outfit would consider for the occasion."""
+    rows = db.execute(
+        select(WardrobeCount.bucket, WardrobeCount.item_count).where(
+            WardrobeCount.user_id == user_id, WardrobeCount.dimension == SLOT, WardrobeCount.item_count > 0
+        )
+    ).all()
+
+    counts: Counter[str] = Counter()
+    for bucket, count in rows:
+        category, item_occasion = bucket.split("|", 1)
+        if occasion_match(item_occasion, occasion):
+            counts[category] += count
+    return counts
+
+
+def missing_slots(counts: Counter[str]) -> list[str]:
+    return [slot for slot in REQUIRED_SLOTS if not counts[slot]]
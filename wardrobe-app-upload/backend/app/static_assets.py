@@ -0,0 +1,102 @@
+﻿from __future__ import annotations
+
+import hashlib
+import mimetypes
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fastapi import Request, Response
+
+from .caching import etag_matches
+
+# Names produced by tools/build_frontend.py, e.g. assets/app.3f9c0b12aa.js.
+HASHED_NAME = re.compile(r"\.[0-9a-f]{10}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Preferred first when the client accepts several.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@dataclass
+class StaticAsset:
+    media_type: str
+    cache_control: str
+    etag: str
+    # Content-Encoding ("identity", "br", "gzip") -> file bytes.
+    bodies: dict[str, bytes] = field(default_factory=dict)
+
+
+class StaticAssetIndex:
+    """In-memory map of every servable frontend file, built once at startup.
+
+    Serving never touches the filesystem: no per-request stat calls, and precompressed
+    variants are picked by Accept-Encoding from memory.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._assets: dict[str, StaticAsset] = {}
+        if root.exists():
+            self._scan()
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._assets
+
+    def get(self, path: str) -> StaticAsset | None:
+        return self._assets.get(path)
+
+    def respond(self, request: Request, asset: StaticAsset) -> Response:
+        encoding = _negotiate(request.headers.get("accept-encoding", ""), asset)
+        etag = asset.etag if encoding == "identity" else f'{asset.etag[:-1]}-{encoding}"'
+        headers = {"Cache-Control": asset.cache_control, "ETag": etag, "Vary": "Accept-Encoding"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=asset.bodies[encoding], media_type=asset.media_type, headers=headers)
+
+    def _scan(self) -> None:
+        variant_suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        for path in self.root.rglob("*"):
+            if not path.is_file() or path.name.endswith(variant_suffixes):
+                continue
+
+            rel = path.relative_to(self.root).as_posix()
+            body = path.read_bytes()
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type in {"application/javascript", "application/json"}:
+                media_type += "; charset=utf-8"
+
+            asset = StaticAsset(
+                media_type=media_type,
+                cache_control=IMMUTABLE if HASHED_NAME.search(path.name) else REVALIDATE,
+                etag=f'"{hashlib.sha1(body).hexdigest()[:20]}"',
+                bodies={"identity": body},
+            )
+            for encoding, suffix in ENCODINGS:
+                variant = path.with_name(path.name + suffix)
+                if variant.exists():
+                    asset.bodies[encoding] = variant.read_bytes()
+            self._assets[rel] = asset
+
+
+def _negotiate(accept_encoding: str, asset: StaticAsset) -> str:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in {"q=0", "q=0.0", "q=0.00", "q=0.000"}:
+            continue
+        accepted.add(token.strip().lower())
+
+    for encoding, _ in ENCODINGS:
+        if encoding in asset.bodies and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+
+def frontend_root(frontend_dir: Path) -> Path:
+    # Serve the fingerprinted build when it exists, otherwise the raw sources (local development).
+    dist = frontend_dir / "dist"
+    return dist if (dist / "index.html").exists() else frontend_dir
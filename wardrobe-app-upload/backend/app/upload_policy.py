@@ -0,0 +1,86 @@
+﻿from __future__ import annotations
+
+import math
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+from .config import Settings, get_settings
+from .services.image_analysis import decode_base64, encoded_size, probe_image
+
+# Room for the other JSON fields and the data URL prefix around the base64 image.
+BODY_OVERHEAD_BYTES = 64 * 1024
+
+
+def upload_policy(settings: Settings | None = None) -> dict[str, object]:
+    settings = settings or get_settings()
+    return {
+        "max_dimension": settings.upload_max_dimension,
+        "max_bytes": settings.upload_max_bytes,
+        "format": settings.upload_format,
+        "fallback_format": settings.upload_fallback_format,
+        "quality": settings.upload_quality,
+        "accepted_formats": settings.upload_accepted_format_list,
+        "enforced": settings.upload_policy_enforced,
+    }
+
+
+def max_upload_body_bytes(settings: Settings | None = None) -> int:
+    settings = settings or get_settings()
+    return math.ceil(settings.upload_max_bytes / 3) * 4 + BODY_OVERHEAD_BYTES
+
+
+def check_upload(image_base64: str) -> bytes | None:
+    """Reject images outside the upload policy using only their length and header.
+
+    Returns the decoded bytes (None when the policy is off) so the request can analyze them
+    without decoding the base64 payload a second time.
+    """
+    settings = get_settings()
+    if not settings.upload_policy_enforced:
+        return None
+
+    size = encoded_size(image_base64)
+    if size > settings.upload_max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Image is {size} bytes; resize it to at most {settings.upload_max_bytes} bytes",
+        )
+
+    try:
+        raw = decode_base64(image_base64)
+        mime, width, height = probe_image(raw)
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail="Invalid image data") from exc
+
+    if mime not in settings.upload_accepted_format_list:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unsupported image format: {mime or 'unknown'}"
+        )
+    if max(width, height) > settings.upload_max_dimension:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Image is {width}x{height}; the longest edge may be at most {settings.upload_max_dimension}px",
+        )
+    return raw
+
+
+class UploadSizeLimitMiddleware:
+    """Pure ASGI middleware: answers 413 from Content-Length alone, before the body is read."""
+
+    def __init__(self, app, paths: set[tuple[str, str]], max_body_bytes: int):
+        self.app = app
+        self.paths = paths
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and (scope["method"], scope["path"].rstrip("/")) in self.paths:
+            for name, value in scope["headers"]:
+                if name == b"content-length" and value.isdigit() and int(value) > self.max_body_bytes:
+                    response = JSONResponse(
+                        {"detail": f"Request body is larger than {self.max_body_bytes} bytes"},
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    )
+                    await response(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
@@ -0,0 +1 @@
+﻿# Benchmarks for backend hot paths. Run from backend/: python -m benchmarks.<name>
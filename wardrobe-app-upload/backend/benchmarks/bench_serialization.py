@@ -0,0 +1,120 @@
+﻿"""Compare the legacy pydantic + response_model path with FastJSONResponse for item lists.
+
+    cd backend
+    python -m benchmarks.bench_serialization --items 200 --image-kb 400
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+# Benchmarks never touch the configured database.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.models import ClothingItem  # noqa: E402
+from app.schemas import ClothingOut  # noqa: E402
+from app.serializers import FastJSONResponse, item_to_dict  # noqa: E402
+from app.services.tagging import split_tags  # noqa: E402
+
+
+def build_items(count: int, image_kb: int, seed: int = 7) -> list[ClothingItem]:
+    rng = random.Random(seed)
+    image = "data:image/png;base64," + base64.b64encode(os.urandom(image_kb * 1024)).decode("ascii")
+    items = []
+    for index in range(count):
+        items.append(
+            ClothingItem(
+                id=index + 1,
+                user_id=1,
+                name=f"item {index}",
+                category=rng.choice(["top", "bottom", "shoes", "outer", "accessory"]),
+                occasion=rng.choice(["daily", "work", "date", "sport", "all"]),
+                image_base64=image,
+                color_hex="#aabbcc",
+                hue=rng.uniform(0, 360),
+                saturation=rng.uniform(0, 100),
+                lightness=rng.uniform(0, 100),
+                fit="regular",
+                warmth=2,
+                style_tags="clean,neutral",
+                style_tag_list=["clean", "neutral"],
+                created_at=datetime.now(tz=timezone.utc),
+            )
+        )
+    return items
+
+
+def _legacy_to_schema(item: ClothingItem) -> ClothingOut:
+    return ClothingOut(
+        id=item.id,
+        name=item.name,
+        category=item.category,
+        occasion=item.occasion,
+        image_base64=item.image_base64,
+        color_hex=item.color_hex,
+        hue=item.hue,
+        saturation=item.saturation,
+        lightness=item.lightness,
+        fit=item.fit,
+        warmth=item.warmth,
+        style_tags=split_tags(item.style_tags),
+        created_at=item.created_at,
+    )
+
+
+def build_app(items: list[ClothingItem]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/legacy", response_model=list[ClothingOut])
+    def legacy():
+        return [_legacy_to_schema(item) for item in items]
+
+    @app.get("/fast", response_model=list[ClothingOut])
+    def fast():
+        return FastJSONResponse([item_to_dict(item) for item in items])
+
+    return app
+
+
+def measure(client: TestClient, path: str, repeat: int) -> list[float]:
+    client.get(path)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--image-kb", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    items = build_items(args.items, args.image_kb)
+    with TestClient(build_app(items)) as client:
+        legacy = measure(client, "/legacy", args.repeat)
+        fast = measure(client, "/fast", args.repeat)
+
+    legacy_median = statistics.median(legacy)
+    fast_median = statistics.median(fast)
+    print(f"{args.items} items x {args.image_kb} KB images, {args.repeat} requests each")
+    print(f"legacy (pydantic + response_model): median {legacy_median:8.2f} ms")
+    print(f"fast   (FastJSONResponse):          median {fast_median:8.2f} ms")
+    print(f"speedup: {legacy_median / fast_median:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+﻿"""Cold-start budget check: import time of app.main and time to the first /api/health 200.
+
+    cd backend
+    python -m benchmarks.bench_startup --runs 5 --import-budget-ms 1200 --health-budget-ms 3000
+
+Each run uses a fresh interpreter and a fresh SQLite file, so schema creation is included
+in time-to-first-health-check. Exits non-zero when a median exceeds its budget.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+
+def _env(db_path: Path) -> dict[str, str]:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{db_path}"
+    env["PYTHONPATH"] = str(BACKEND_DIR)
+    return env
+
+
+def measure_import(db_path: Path) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        env=_env(db_path),
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def measure_first_health(db_path: Path, timeout: float = 30.0) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=_env(db_path),
+        cwd=BACKEND_DIR,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                    return (time.perf_counter() - start) * 1000
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError("server did not become healthy in time")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=1200)
+    parser.add_argument("--health-budget-ms", type=float, default=3000)
+    args = parser.parse_args()
+
+    imports: list[float] = []
+    healths: list[float] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(args.runs):
+            imports.append(measure_import(Path(tmp) / f"import-{run}.db"))
+            healths.append(measure_first_health(Path(tmp) / f"health-{run}.db"))
+
+    failed = False
+    for label, samples, budget in (
+        ("import app.main", imports, args.import_budget_ms),
+        ("first /api/health", healths, args.health_budget_ms),
+    ):
+        median = statistics.median(samples)
+        status = "ok" if median <= budget else "OVER BUDGET"
+        failed = failed or median > budget
+        print(f"{label:18} median {median:8.1f} ms  max {max(samples):8.1f} ms  budget {budget:8.1f} ms  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
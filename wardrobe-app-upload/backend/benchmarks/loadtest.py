@@ -0,0 +1,353 @@
+﻿"""End-to-end load test: seed synthetic users and wardrobes, then drive mixed traffic at the server.
+
+    cd backend
+    python -m benchmarks.loadtest --users 20 --items-per-user 15 --duration 30 --concurrency 32 --workers 2
+    python -m benchmarks.loadtest --database-url sqlite:////tmp/wardrobe-load.db --json results.json
+
+Everything runs offline on one box: the server is a uvicorn (or --server gunicorn) subprocess
+on a fresh database (a temporary SQLite file unless --database-url is given), schema set up
+once before it starts.
+The generator shares the CPU with the server, so compare runs made on the same machine.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+from PIL import Image, ImageDraw
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+CATEGORIES = ("top", "bottom", "shoes", "outer", "accessory")
+OCCASIONS = ("daily", "work", "date", "sport", "all")
+FITS = ("slim", "regular", "loose")
+DEFAULT_MIX = "list=5,recommend=3,upload=1,login=1"
+
+
+@dataclass
+class Result:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: dict[int, int] = field(default_factory=lambda: defaultdict(int))
+
+
+class Recorder:
+    def __init__(self):
+        self.results: dict[str, Result] = defaultdict(Result)
+
+    async def call(self, name: str, request, ok: tuple[int, ...] = (200, 201, 202)) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.results[name].errors += 1
+            self.results[name].statuses[0] += 1
+            return None
+        result = self.results[name]
+        result.latencies.append(time.perf_counter() - start)
+        result.statuses[response.status_code] += 1
+        if response.status_code not in ok:
+            result.errors += 1
+        return response
+
+
+def synthetic_image(rng: random.Random, size: int) -> str:
+    """A garment-like shape on a plain or transparent background, as a data URL."""
+    transparent = rng.random() < 0.5
+    background = (0, 0, 0, 0) if transparent else (*[rng.randint(200, 255)] * 3, 255)
+    image = Image.new("RGBA", (size, int(size * rng.uniform(1.0, 1.4))), background)
+    draw = ImageDraw.Draw(image)
+    color = tuple(rng.randint(0, 255) for _ in range(3)) + (255,)
+    width, height = image.size
+    draw.rounded_rectangle(
+        (width * 0.15, height * 0.1, width * 0.85, height * 0.9), radius=max(2, size // 10), fill=color
+    )
+    for _ in range(rng.randint(0, 6)):
+        x, y = rng.uniform(0.2, 0.8) * width, rng.uniform(0.2, 0.8) * height
+        radius = rng.uniform(0.02, 0.08) * size
+        spot = tuple(rng.randint(0, 255) for _ in range(3))
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=spot)
+
+    buffer = io.BytesIO()
+    if transparent:
+        image.save(buffer, "PNG", optimize=False)
+        mime = "png"
+    else:
+        image.convert("RGB").save(buffer, "JPEG", quality=85)
+        mime = "jpeg"
+    return f"data:image/{mime};base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def item_payload(rng: random.Random, images: list[str], category: str | None = None) -> dict:
+    return {
+        "name": f"item-{rng.randrange(1_000_000)}",
+        "category": category or rng.choice(CATEGORIES),
+        "occasion": rng.choice(OCCASIONS),
+        "image_base64": rng.choice(images),
+        "fit": rng.choice(FITS),
+        "warmth": rng.randint(1, 5),
+        "style_tags": rng.sample(["neutral", "clean", "accent", "fresh", "warm"], rng.randint(0, 2)),
+        "allow_duplicate": True,
+    }
+
+
+def start_server(args: argparse.Namespace, database_url: str, shard_url_template: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        {
+            "DATABASE_URL": database_url,
+            "SHARD_COUNT": str(args.shards),
+            "SHARD_URL_TEMPLATE": shard_url_template,
+            "PYTHONPATH": str(BACKEND_DIR),
+            # Schema is created once below; N workers migrating a fresh database at once would race.
+            "AUTO_MIGRATE": "false",
+            "DEBUG": "false",
+            # Every synthetic client shares one IP, so per-client limits would measure the limiter.
+            "RATE_LIMIT_ENABLED": "true" if args.rate_limit else "false",
+        }
+    )
+    subprocess.run([sys.executable, "-m", "app.migrations"], env=env, cwd=BACKEND_DIR, check=True)
+    if args.server == "gunicorn":
+        env["GUNICORN_ACCESS_LOG"] = ""
+        command = [
+            sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+            "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers), "--log-level", "warning",
+        ]
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+        ]
+    return subprocess.Popen(command, env=env, cwd=BACKEND_DIR)
+
+
+async def wait_healthy(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/api/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not become healthy")
+
+
+async def seed(client: httpx.AsyncClient, args: argparse.Namespace, images: list[str], recorder: Recorder):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    users: list[tuple[str, dict[str, str]]] = []
+
+    async def seed_user(index: int) -> None:
+        username = f"load{args.seed}_{index}"
+        async with semaphore:
+            response = await recorder.call(
+                "seed register",
+                client.post("/api/auth/register", json={"username": username, "password": "secret123"}),
+            )
+        if response is None or response.status_code != 200:
+            return
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        users.append((username, headers))
+
+        # Seeded per user, so wardrobes do not depend on the order requests complete in.
+        user_rng = random.Random(args.seed * 100_003 + index)
+        # Every wardrobe can produce an outfit: the first three items cover top, bottom and shoes.
+        for number in range(args.items_per_user):
+            category = ("top", "bottom", "shoes")[number] if number < 3 else None
+            async with semaphore:
+                await recorder.call(
+                    "seed upload",
+                    client.post("/api/items", json=item_payload(user_rng, images, category), headers=headers),
+                )
+
+    await asyncio.gather(*(seed_user(index) for index in range(args.users)))
+    return users
+
+
+async def drive(client, args, images, users, recorder: Recorder) -> float:
+    operations, weights = parse_mix(args.mix)
+    upload_headers = {"Prefer": "respond-async"} if args.async_upload else {}
+    deadline = time.perf_counter() + args.duration
+    registered = 0
+
+    async def virtual_user(number: int) -> None:
+        nonlocal registered
+        rng = random.Random(args.seed * 1000 + number)
+        while time.perf_counter() < deadline:
+            username, headers = rng.choice(users)
+            operation = rng.choices(operations, weights)[0]
+            if operation == "list":
+                await recorder.call("GET /api/items", client.get("/api/items", headers=headers))
+            elif operation == "recommend":
+                occasion = rng.choice(OCCASIONS)
+                # 400 means the wardrobe cannot dress this occasion; an answer, not a failure.
+                await recorder.call(
+                    "GET /api/recommend",
+                    client.get("/api/recommend", params={"occasion": occasion}, headers=headers),
+                    ok=(200, 400),
+                )
+            elif operation == "upload":
+                await recorder.call(
+                    "POST /api/items",
+                    client.post("/api/items", json=item_payload(rng, images), headers={**headers, **upload_headers}),
+                )
+            elif operation == "login":
+                await recorder.call(
+                    "POST /api/auth/login",
+                    client.post("/api/auth/login", json={"username": username, "password": "secret123"}),
+                )
+            elif operation == "register":
+                registered += 1
+                await recorder.call(
+                    "POST /api/auth/register",
+                    client.post(
+                        "/api/auth/register",
+                        json={"username": f"new{args.seed}_{number}_{registered}", "password": "secret123"},
+                    ),
+                )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(number) for number in range(args.concurrency)))
+    return time.perf_counter() - start
+
+
+def parse_mix(mix: str) -> tuple[list[str], list[float]]:
+    operations, weights = [], []
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in {"list", "recommend", "upload", "login", "register"}:
+            raise SystemExit(f"unknown operation in --mix: {name}")
+        operations.append(name.strip())
+        weights.append(float(weight or 1))
+    return operations, weights
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(recorder: Recorder, elapsed: float, names: list[str] | None = None) -> list[dict]:
+    rows = []
+    for name, result in sorted(recorder.results.items()):
+        if names is not None and name not in names:
+            continue
+        total = len(result.latencies) + result.statuses.get(0, 0)
+        rows.append(
+            {
+                "endpoint": name,
+                "requests": total,
+                "rps": total / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(result.latencies, 0.50) * 1000,
+                "p95_ms": percentile(result.latencies, 0.95) * 1000,
+                "p99_ms": percentile(result.latencies, 0.99) * 1000,
+                "max_ms": max(result.latencies, default=0.0) * 1000,
+                "error_rate": result.errors / total if total else 0.0,
+                "statuses": {str(code): count for code, count in sorted(result.statuses.items())},
+            }
+        )
+    return rows
+
+
+def print_table(title: str, rows: list[dict], elapsed: float) -> None:
+    total = sum(row["requests"] for row in rows)
+    print(f"\n{title}: {total} requests in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} req/s)")
+    print(f"{'endpoint':24} {'reqs':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'errors':>7}")
+    for row in rows:
+        print(
+            f"{row['endpoint']:24} {row['requests']:7d} {row['rps']:8.1f} {row['p50_ms']:8.1f} "
+            f"{row['p95_ms']:8.1f} {row['p99_ms']:8.1f} {row['max_ms']:8.1f} {row['error_rate']:7.1%}"
+        )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    sizes = [int(size) for size in args.image_sizes.split(",")]
+    images = [synthetic_image(rng, rng.choice(sizes)) for _ in range(args.image_pool)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{Path(tmp) / 'load.db'}"
+        shard_url_template = f"sqlite:///{Path(tmp) / 'load-shard{shard}.db'}"
+        port = args.port or _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(args, database_url, shard_url_template, port)
+        try:
+            await wait_healthy(base_url)
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+                recorder = Recorder()
+                seed_start = time.perf_counter()
+                users = await seed(client, args, images, recorder)
+                seed_elapsed = time.perf_counter() - seed_start
+                seed_rows = summarize(recorder, seed_elapsed)
+                if not users:
+                    raise SystemExit("seeding failed: no users registered")
+
+                recorder = Recorder()
+                elapsed = await drive(client, args, images, users, recorder)
+                rows = summarize(recorder, elapsed)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print_table("seed", seed_rows, seed_elapsed)
+    print_table("mixed traffic", rows, elapsed)
+    config = {key: value for key, value in vars(args).items() if key != "json"}
+    return {"config": config, "seed": seed_rows, "traffic": rows, "elapsed_s": elapsed}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--items-per-user", type=int, default=15)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of mixed traffic")
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users / open connections")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument(
+        "--server", choices=["uvicorn", "gunicorn"], default="uvicorn", help="gunicorn uses backend/gunicorn.conf.py"
+    )
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--shards", type=int, default=0, help="per-user SQLite shards (temporary files)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weights for list, recommend, upload, login, register")
+    parser.add_argument("--async-upload", action="store_true", help="upload with Prefer: respond-async")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the server's rate limits on")
+    parser.add_argument("--image-sizes", default="96,320,800", help="longest edges of synthetic images (px)")
+    parser.add_argument("--image-pool", type=int, default=48, help="distinct images generated up front")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+        print(f"\nwrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+﻿# pytest-benchmark suite for service-layer hot paths; see pytest.ini in this directory.
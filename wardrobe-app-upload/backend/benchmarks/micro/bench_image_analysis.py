@@ -0,0 +1,41 @@
+﻿from __future__ import annotations
+
+import random
+
+from app.services.image_analysis import (
+    decode_base64_image,
+    dominant_color_from_base64,
+    perceptual_hash,
+    rgb_to_hsl,
+    suggest_clothing_metadata,
+)
+
+from .conftest import SEED
+
+
+def bench_rgb_to_hsl(benchmark):
+    rng = random.Random(SEED)
+    colors = [tuple(rng.randint(0, 255) for _ in range(3)) for _ in range(1000)]
+
+    def convert_all():
+        for red, green, blue in colors:
+            rgb_to_hsl(red, green, blue)
+
+    benchmark(convert_all)
+
+
+def bench_decode_base64_image(benchmark, image_base64):
+    benchmark(decode_base64_image, image_base64)
+
+
+def bench_dominant_color_from_base64(benchmark, image_base64):
+    benchmark(dominant_color_from_base64, image_base64)
+
+
+def bench_suggest_clothing_metadata(benchmark, image_base64):
+    benchmark(suggest_clothing_metadata, image_base64)
+
+
+def bench_perceptual_hash(benchmark, image_base64):
+    image = decode_base64_image(image_base64)
+    benchmark(perceptual_hash, image)
@@ -0,0 +1,32 @@
+﻿from __future__ import annotations
+
+import itertools
+import random
+
+from app.services.recommendation import _pair_harmony, _score_outfit, generate_outfit
+
+from .conftest import SEED
+
+
+def bench_pair_harmony(benchmark, wardrobe):
+    pairs = list(itertools.islice(itertools.combinations(wardrobe, 2), 2000))
+
+    def score_pairs():
+        for a, b in pairs:
+            _pair_harmony(a, b)
+
+    benchmark(score_pairs)
+
+
+def bench_score_outfit(benchmark, wardrobe):
+    by_category = {item.category: item for item in wardrobe}
+    benchmark(_score_outfit, by_category, "all")
+
+
+def bench_generate_outfit(benchmark, wardrobe):
+    # A fresh seeded generator per round keeps every round doing identical work.
+    benchmark(lambda: generate_outfit(wardrobe, occasion="all", rng=random.Random(SEED)))
+
+
+def bench_generate_outfit_filtered(benchmark, wardrobe):
+    benchmark(lambda: generate_outfit(wardrobe, occasion="work", rng=random.Random(SEED)))
@@ -0,0 +1,85 @@
+﻿"""Compare two pytest-benchmark JSON files and flag regressions.
+
+    cd backend/benchmarks/micro
+    python -m pytest --benchmark-json=baselines/current.json       # on the change
+    python compare.py --threshold 15                               # against the committed baselines/main.json
+    python compare.py --update-baseline                            # on main: current.json becomes main.json
+
+Exits 1 when any benchmark's statistic (median by default) got slower by more than the
+threshold percentage. Baselines are machine specific: the committed main.json records the
+machine it came from in machine_info, so on other hardware regenerate it from main first.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+BASELINES = Path(__file__).resolve().parent / "baselines"
+
+
+def load(path: Path, stat: str) -> dict[str, float]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return {bench["fullname"]: bench["stats"][stat] for bench in data["benchmarks"]}
+
+
+def update_baseline(current: Path, baseline: Path) -> None:
+    data = json.loads(current.read_text(encoding="utf-8"))
+    for bench in data["benchmarks"]:
+        # Raw per-round timings make up nearly all of the file and compare() never reads them.
+        bench["stats"].pop("data", None)
+    baseline.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    print(f"wrote {len(data['benchmarks'])} benchmarks to {baseline}")
+
+
+def compare(baseline: dict[str, float], current: dict[str, float]) -> list[tuple[str, float, float, float]]:
+    rows = []
+    for name in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[name], current[name]
+        change = (after - before) / before * 100 if before else 0.0
+        rows.append((name, before, after, change))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", type=Path, nargs="?", default=BASELINES / "main.json")
+    parser.add_argument("current", type=Path, nargs="?", default=BASELINES / "current.json")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent")
+    parser.add_argument("--stat", default="median", choices=["min", "median", "mean"])
+    parser.add_argument("--update-baseline", action="store_true", help="replace baseline with current and exit")
+    args = parser.parse_args()
+
+    if args.update_baseline:
+        update_baseline(args.current, args.baseline)
+        return
+
+    baseline = load(args.baseline, args.stat)
+    current = load(args.current, args.stat)
+    rows = compare(baseline, current)
+
+    regressions = 0
+    width = max((len(name) for name, *_ in rows), default=20)
+    print(f"{'benchmark':{width}} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, before, after, change in rows:
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "  faster"
+        print(f"{name:{width}} {before * 1e6:10.1f}us {after * 1e6:10.1f}us {change:+8.1f}%{flag}")
+
+    for name in sorted(baseline.keys() - current.keys()):
+        print(f"missing from current: {name}")
+    for name in sorted(current.keys() - baseline.keys()):
+        print(f"new (no baseline): {name}")
+
+    print(f"\n{regressions} regression(s) over {args.threshold:.0f}% ({args.stat})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
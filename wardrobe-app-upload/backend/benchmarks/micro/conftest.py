@@ -0,0 +1,99 @@
+﻿from __future__ import annotations
+
+import base64
+import io
+import os
+import random
+
+import pytest
+
+# Nothing here touches a database; make sure importing app modules cannot open the real one.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from app.models import ClothingItem  # noqa: E402
+from app.services.image_analysis import rgb_to_hsl  # noqa: E402
+from app.services.tagging import tag_mask  # noqa: E402
+
+SEED = 20240601
+IMAGE_FORMATS = ("jpeg", "png_alpha", "webp")
+IMAGE_SIZES = (64, 256, 1024)
+WARDROBE_SIZES = (10, 60, 300)
+CATEGORIES = ("top", "bottom", "shoes", "outer", "accessory")
+OCCASIONS = ("daily", "work", "date", "sport", "all")
+TAGS = ("neutral", "clean", "accent", "fresh", "warm")
+
+
+def make_image(image_format: str, size: int, seed: int = SEED) -> str:
+    """Deterministic garment-like picture as a data URL: a colored block with a few spots."""
+    rng = random.Random(f"{seed}-{image_format}-{size}")
+    alpha = image_format == "png_alpha"
+    image = Image.new("RGBA", (size, size * 5 // 4), (0, 0, 0, 0) if alpha else (236, 236, 232, 255))
+    draw = ImageDraw.Draw(image)
+    width, height = image.size
+    draw.rectangle((width * 0.2, height * 0.1, width * 0.8, height * 0.9), fill=(180, 60, 70, 255))
+    for _ in range(8):
+        x, y = rng.uniform(0.25, 0.75) * width, rng.uniform(0.2, 0.8) * height
+        radius = rng.uniform(0.02, 0.06) * size
+        color = tuple(rng.randint(0, 255) for _ in range(3)) + (255,)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+
+    buffer = io.BytesIO()
+    if image_format == "jpeg":
+        image.convert("RGB").save(buffer, "JPEG", quality=85)
+        mime = "jpeg"
+    elif image_format == "webp":
+        image.convert("RGB").save(buffer, "WEBP", quality=80)
+        mime = "webp"
+    else:
+        image.save(buffer, "PNG")
+        mime = "png"
+    return f"data:image/{mime};base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def make_wardrobe(count: int, seed: int = SEED) -> list[ClothingItem]:
+    rng = random.Random(f"{seed}-wardrobe-{count}")
+    items = []
+    for index in range(count):
+        # The first three guarantee an outfit exists for every occasion.
+        category = ("top", "bottom", "shoes")[index] if index < 3 else rng.choice(CATEGORIES)
+        red, green, blue = (rng.randint(0, 255) for _ in range(3))
+        hue, saturation, lightness = rgb_to_hsl(red, green, blue)
+        tags = rng.sample(TAGS, rng.randint(0, 2))
+        items.append(
+            ClothingItem(
+                id=index + 1,
+                user_id=1,
+                name=f"item {index}",
+                category=category,
+                occasion="all" if index < 3 else rng.choice(OCCASIONS),
+                image_base64="",
+                color_hex=f"#{red:02x}{green:02x}{blue:02x}",
+                hue=hue,
+                saturation=saturation,
+                lightness=lightness,
+                fit=rng.choice(("slim", "regular", "loose")),
+                warmth=rng.randint(1, 5),
+                style_tags=",".join(tags),
+                style_tag_list=tags,
+                tag_mask=tag_mask(tags),
+                status="ready",
+            )
+        )
+    return items
+
+
+@pytest.fixture(scope="session", params=IMAGE_FORMATS)
+def image_format(request) -> str:
+    return request.param
+
+
+@pytest.fixture(scope="session", params=IMAGE_SIZES, ids=lambda size: f"{size}px")
+def image_base64(request, image_format: str) -> str:
+    return make_image(image_format, request.param)
+
+
+@pytest.fixture(scope="session", params=WARDROBE_SIZES, ids=lambda size: f"{size}items")
+def wardrobe(request) -> list[ClothingItem]:
+    return make_wardrobe(request.param)
@@ -0,0 +1,73 @@
+﻿"""Multi-process serving: gunicorn supervising uvicorn workers, one per core by default.
+
+    gunicorn -c backend/gunicorn.conf.py                 # from the project root, like the Dockerfile
+    WEB_CONCURRENCY=4 gunicorn -c backend/gunicorn.conf.py
+
+Image decoding, password hashing and outfit scoring are CPU bound, so a single process only
+ever uses one core. The app is imported once in the master (preload_app) and forked, and the
+schema is migrated there before any worker starts. `kill -HUP <master pid>` replaces workers
+one at a time, letting in-flight requests finish within graceful_timeout.
+
+Each worker keeps its own in-memory indexes, rate-limit buckets and metrics. The indexes stay
+coherent through each user's wardrobe version in the database; limits and metrics are per process.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+
+def _usable_cpus() -> int:
+    # Respect CPU affinity (containers, taskset) where the platform exposes it.
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off", "")
+
+
+pythonpath = str(Path(__file__).resolve().parent)
+wsgi_app = "app.main:app"
+worker_class = "uvicorn_worker.UvicornWorker"
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY") or _usable_cpus())
+preload_app = True
+
+# Seconds a silent worker may go before it is killed and replaced.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+# Recycle workers after this many requests (0 = never); jitter keeps them from restarting together.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+# The app resolves X-Forwarded-For itself (TRUSTED_PROXIES, networks allowed). Pin the server's
+# own rewrite to loopback so a FORWARDED_ALLOW_IPS="*" left in the environment cannot make
+# uvicorn believe the client-written leftmost hop before the app sees the request.
+forwarded_allow_ips = "127.0.0.1,::1"
+
+# "-" logs requests to stdout; set GUNICORN_ACCESS_LOG= (empty) to turn them off.
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+
+# Migrate once here instead of in every worker's lifespan, where N processes would race.
+_migrate = _env_flag("AUTO_MIGRATE", True)
+os.environ["AUTO_MIGRATE"] = "false"
+
+
+def on_starting(server) -> None:
+    if not _migrate:
+        return
+    from app.database import all_engines
+    from app.migrations import migrate_all
+
+    migrate_all()
+    # Pooled connections must not survive fork(); each worker opens its own.
+    for engine in all_engines():
+        engine.dispose()
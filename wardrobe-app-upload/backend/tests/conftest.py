@@ -0,0 +1,61 @@
+﻿from __future__ import annotations
+
+import base64
+import io
+import os
+import tempfile
+import uuid
+
+# Settings are read once per process, so the databases must be chosen before the app is imported.
+DATA_DIR = tempfile.mkdtemp(prefix="wardrobe-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{DATA_DIR}/main.db",
+    SHARD_URL_TEMPLATE=f"sqlite:///{DATA_DIR}/shard{{shard}}.db",
+    # Tests drive the ingest queue themselves.
+    INGEST_WORKERS="0",
+    RATE_LIMIT_ENABLED="false",
+    QUERY_BUDGET_STRICT="true",
+)
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+
+
+def image_data_url(
+    color: tuple[int, int, int] = (200, 30, 30), size: tuple[int, int] = (60, 80), fmt: str = "PNG"
+) -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, fmt)
+    return f"data:image/{fmt.lower()};base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def item_payload(category: str = "top", occasion: str = "work", **fields) -> dict[str, object]:
+    return {
+        "name": f"{category} {occasion}",
+        "category": category,
+        "occasion": occasion,
+        "image_base64": image_data_url(),
+        **fields,
+    }
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def auth(client) -> dict[str, str]:
+    """Headers for a freshly registered user, so tests never see each other's items."""
+    response = client.post("/api/auth/register", json={"username": f"u-{uuid.uuid4().hex[:12]}", "password": "secret1"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def user_id(client, auth) -> int:
+    return client.get("/api/auth/me", headers=auth).json()["id"]
@@ -0,0 +1,75 @@
+﻿from __future__ import annotations
+
+import pytest
+
+from conftest import image_data_url, item_payload
+
+
+def revalidate(client, auth, path: str, etag: str, **params):
+    return client.get(path, params=params, headers={**auth, "If-None-Match": etag})
+
+
+@pytest.mark.parametrize("path", ["/api/items", "/api/items/summary"])
+def test_unchanged_wardrobe_revalidates_with_304(client, auth, path):
+    assert client.post("/api/items", json=item_payload(), headers=auth).status_code == 201
+    first = client.get(path, headers=auth)
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    cached = revalidate(client, auth, path, first.headers["etag"])
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == first.headers["etag"]
+    # Weak validators and lists are compared the weak way.
+    assert revalidate(client, auth, path, f'"other", W/{first.headers["etag"]}').status_code == 304
+
+
+@pytest.mark.parametrize("path", ["/api/items", "/api/items/summary"])
+def test_writes_change_the_etag(client, auth, path):
+    created = client.post("/api/items", json=item_payload(), headers=auth).json()
+    etag = client.get(path, headers=auth).headers["etag"]
+
+    added = item_payload("bottom", image_base64=image_data_url((20, 40, 160), (80, 60)))
+    assert client.post("/api/items", json=added, headers=auth).status_code == 201
+    after_create = revalidate(client, auth, path, etag)
+    assert after_create.status_code == 200
+    assert after_create.headers["etag"] != etag
+
+    assert client.delete(f"/api/items/{created['id']}", headers=auth).status_code == 204
+    after_delete = revalidate(client, auth, path, after_create.headers["etag"])
+    assert after_delete.status_code == 200
+    assert after_delete.headers["etag"] not in {etag, after_create.headers["etag"]}
+
+
+def test_etag_depends_on_the_filters(client, auth):
+    assert client.post("/api/items", json=item_payload(style_tags=["casual"]), headers=auth).status_code == 201
+    everything = client.get("/api/items", headers=auth)
+    tops = client.get("/api/items", params={"category": "top"}, headers=auth)
+    assert everything.headers["etag"] != tops.headers["etag"]
+    assert revalidate(client, auth, "/api/items", everything.headers["etag"], category="top").status_code == 200
+
+
+def test_etags_are_per_user(client, auth):
+    etag = client.get("/api/items", headers=auth).headers["etag"]
+    other = client.post("/api/auth/register", json={"username": "etag-other", "password": "secret1"}).json()
+    other_auth = {"Authorization": f"Bearer {other['access_token']}"}
+    assert revalidate(client, other_auth, "/api/items", etag).status_code == 200
+
+
+def test_seeded_recommendation_revalidates_and_unseeded_is_not_cached(client, auth):
+    outfit = (("top", (200, 30, 30), (60, 80)), ("bottom", (30, 60, 160), (80, 60)), ("shoes", (40, 40, 40), (50, 50)))
+    for category, color, size in outfit:
+        payload = item_payload(category, image_base64=image_data_url(color, size))
+        assert client.post("/api/items", json=payload, headers=auth).status_code == 201
+
+    unseeded = client.get("/api/recommend", headers=auth)
+    assert unseeded.headers["cache-control"] == "no-store"
+    assert "etag" not in unseeded.headers
+
+    seeded = client.get("/api/recommend", params={"seed": 3}, headers=auth)
+    assert revalidate(client, auth, "/api/recommend", seeded.headers["etag"], seed=3).status_code == 304
+    assert revalidate(client, auth, "/api/recommend", seeded.headers["etag"], seed=4).status_code == 200
+
+
+def test_profile_revalidates(client, auth):
+    me = client.get("/api/auth/me", headers=auth)
+    assert revalidate(client, auth, "/api/auth/me", me.headers["etag"]).status_code == 304
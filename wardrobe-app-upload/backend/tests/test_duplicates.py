@@ -0,0 +1,41 @@
+﻿from __future__ import annotations
+
+import uuid
+
+from conftest import image_data_url, item_payload
+
+
+def test_duplicate_create_returns_matches(client, auth):
+    first = client.post("/api/items", json=item_payload(), headers=auth)
+    assert first.status_code == 201, first.text
+
+    again = client.post("/api/items", json=item_payload(), headers=auth)
+    assert again.status_code == 409
+    assert again.json()["detail"] == "Likely duplicate of an existing item"
+    assert again.json()["duplicate_item_ids"] == [first.json()["id"]]
+    assert len(client.get("/api/items", headers=auth).json()) == 1
+
+
+def test_allow_duplicate_uploads_anyway(client, auth):
+    client.post("/api/items", json=item_payload(), headers=auth)
+
+    response = client.post("/api/items", json=item_payload(allow_duplicate=True), headers=auth)
+    assert response.status_code == 201, response.text
+    assert len(client.get("/api/items", headers=auth).json()) == 2
+
+
+def test_analyze_flags_duplicates(client, auth):
+    item_id = client.post("/api/items", json=item_payload(), headers=auth).json()["id"]
+
+    copy = client.post("/api/items/analyze", json={"image_base64": image_data_url()}, headers=auth)
+    assert copy.json()["duplicate_item_ids"] == [item_id]
+
+    other = client.post("/api/items/analyze", json={"image_base64": image_data_url((30, 30, 200))}, headers=auth)
+    assert other.json()["duplicate_item_ids"] == []
+
+
+def test_duplicates_are_per_user(client, auth):
+    other = client.post("/api/auth/register", json={"username": f"u-{uuid.uuid4().hex[:12]}", "password": "secret1"})
+    client.post("/api/items", json=item_payload(), headers={"Authorization": f"Bearer {other.json()['access_token']}"})
+
+    assert client.post("/api/items", json=item_payload(), headers=auth).status_code == 201
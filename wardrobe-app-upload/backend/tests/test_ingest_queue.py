@@ -0,0 +1,178 @@
+﻿from __future__ import annotations
+
+import threading
+from datetime import timedelta
+
+from sqlalchemy import select, update
+
+from app.database import shard_session
+from app.models import ClothingItem, IngestJob, ItemChange, WardrobeCount, utc_now
+from app.services import ingest_queue
+from app.services.ingest_queue import claim_next_job, process_job
+
+from conftest import item_payload
+
+ASYNC = {"Prefer": "respond-async"}
+
+
+def enqueue(client, auth, **fields) -> int:
+    response = client.post("/api/items", json=item_payload(**fields), headers={**auth, **ASYNC})
+    assert response.status_code == 202, response.text
+    return response.json()["id"]
+
+
+def claim(db):
+    # Earlier tests may leave due jobs behind; claim until this test's job comes up.
+    while (claimed := claim_next_job(db)) is not None:
+        yield claimed
+
+
+def claim_job(db, job_id: int):
+    return next(claimed for claimed in claim(db) if claimed[0] == job_id)
+
+
+def counts(db, user_id: int) -> dict[tuple[str, str], int]:
+    rows = db.scalars(select(WardrobeCount).where(WardrobeCount.user_id == user_id, WardrobeCount.item_count != 0))
+    return {(row.dimension, row.bucket): row.item_count for row in rows}
+
+
+def test_async_upload_reaches_done(client, auth, user_id):
+    job_id = enqueue(client, auth)
+    assert client.get(f"/api/jobs/{job_id}", headers=auth).json()["status"] == "queued"
+
+    with shard_session(None) as db:
+        process_job(*claim_job(db, job_id))
+
+    job = client.get(f"/api/jobs/{job_id}", headers=auth).json()
+    assert job["status"] == "done"
+    assert job["item"]["status"] == "ready"
+    summary = client.get("/api/items/summary", headers=auth).json()
+    assert summary["statuses"] == {"ready": 1}
+
+
+def test_permanent_failure_discards_pending_item(client, auth, user_id, monkeypatch):
+    def undecodable(image_base64, raw=None):
+        raise ValueError("cannot identify image file")
+
+    monkeypatch.setattr(ingest_queue, "extract_features", undecodable)
+    job_id = enqueue(client, auth)
+    with shard_session(None) as db:
+        process_job(*claim_job(db, job_id))
+
+    job = client.get(f"/api/jobs/{job_id}", headers=auth).json()
+    assert (job["status"], job["error"], job["attempts"]) == ("failed", "Invalid image data", 1)
+    with shard_session(None) as db:
+        assert db.get(ClothingItem, job["item_id"]) is None
+        assert counts(db, user_id) == {}
+    assert client.get("/api/items", headers=auth).json() == []
+
+
+def test_transient_failure_retries_with_backoff(client, auth, monkeypatch):
+    def flaky(*args, **kwargs):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(ingest_queue, "find_duplicates", flaky)
+    job_id = enqueue(client, auth)
+    base = ingest_queue.get_settings().ingest_retry_base_seconds
+
+    with shard_session(None) as db:
+        for attempt in (1, 2):
+            before = utc_now()
+            process_job(*claim_job(db, job_id))
+            job = db.get(IngestJob, job_id)
+            db.refresh(job)
+            assert (job.status, job.attempts) == ("queued", attempt)
+            assert job.error == "RuntimeError: index unavailable"
+            delay = (job.run_after.replace(tzinfo=before.tzinfo) - before).total_seconds()
+            assert base * 2 ** (attempt - 1) <= delay < base * 2 ** (attempt - 1) + 1
+
+            # Not due yet: nobody may claim it before the backoff has passed.
+            assert all(claimed[0] != job_id for claimed in claim(db))
+            db.execute(update(IngestJob).where(IngestJob.id == job_id).values(run_after=utc_now()))
+            db.commit()
+
+    monkeypatch.undo()
+    with shard_session(None) as db:
+        process_job(*claim_job(db, job_id))
+    assert client.get(f"/api/jobs/{job_id}", headers=auth).json()["status"] == "done"
+
+
+def test_expired_lease_is_reclaimed_and_stale_result_dropped(client, auth, user_id):
+    job_id = enqueue(client, auth)
+    with shard_session(None) as db:
+        stale = claim_job(db, job_id)
+        # The first worker stalls past its lease; another worker claims the job again.
+        expired = utc_now() - timedelta(seconds=1)
+        db.execute(update(IngestJob).where(IngestJob.id == job_id).values(lease_expires_at=expired))
+        db.commit()
+        again = claim_job(db, job_id)
+        assert again[1] != stale[1]
+        assert db.get(IngestJob, job_id).attempts == 2
+
+    process_job(*stale)
+    with shard_session(None) as db:
+        assert db.get(IngestJob, job_id).status == "running"
+        assert counts(db, user_id) == {("status", "pending"): 1}
+
+    process_job(*again)
+    process_job(*again)
+    with shard_session(None) as db:
+        assert db.get(IngestJob, job_id).status == "done"
+        assert counts(db, user_id)[("status", "ready")] == 1
+        assert ("status", "pending") not in counts(db, user_id)
+
+
+def test_abandoned_job_fails_and_discards_pending_item(client, auth, user_id):
+    job_id = enqueue(client, auth)
+    with shard_session(None) as db:
+        # Every attempt so far killed its worker before the job was released.
+        db.execute(
+            update(IngestJob)
+            .where(IngestJob.id == job_id)
+            .values(
+                status="running", attempts=IngestJob.max_attempts, lease_expires_at=utc_now() - timedelta(seconds=1)
+            )
+        )
+        db.commit()
+        assert all(claimed[0] != job_id for claimed in claim(db))
+
+        job = db.get(IngestJob, job_id)
+        assert (job.status, job.error) == ("failed", "Worker stopped while processing the upload")
+        assert db.get(ClothingItem, job.item_id) is None
+        assert counts(db, user_id) == {}
+        ops = db.scalars(select(ItemChange.op).where(ItemChange.item_id == job.item_id).order_by(ItemChange.id)).all()
+        assert ops == ["upsert", "delete"]
+
+
+def test_worker_survives_process_job_errors(monkeypatch):
+    processed = []
+    done = threading.Event()
+
+    def broken(job_id, lease_expires_at, shard=None):
+        processed.append(job_id)
+        if len(processed) == 2:
+            done.set()
+        raise OSError("database is gone")
+
+    claims = iter([(1, utc_now(), None), (2, utc_now(), None)])
+    pool = ingest_queue.IngestWorkers()
+    monkeypatch.setattr(ingest_queue, "process_job", broken)
+    monkeypatch.setattr(pool, "_claim", lambda: next(claims, None))
+    pool.start(1, poll_seconds=0.01)
+    try:
+        assert done.wait(5)
+    finally:
+        pool.stop()
+    assert processed == [1, 2]
+
+
+def test_async_duplicate_fails(client, auth):
+    assert client.post("/api/items", json=item_payload(), headers=auth).status_code == 201
+    job_id = enqueue(client, auth)
+
+    with shard_session(None) as db:
+        process_job(*claim_job(db, job_id))
+
+    job = client.get(f"/api/jobs/{job_id}", headers=auth).json()
+    assert job["status"] == "failed"
+    assert job["error"] == "Likely duplicate of an existing item"
@@ -0,0 +1,81 @@
+﻿from __future__ import annotations
+
+from conftest import image_data_url, item_payload
+
+
+def create(client, auth, number: int) -> int:
+    color = (number * 40 % 256, 90, 200 - number * 30)
+    payload = item_payload(image_base64=image_data_url(color, (50 + number, 60)))
+    response = client.post("/api/items", json=payload, headers=auth)
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def changes(client, auth, since: int, **params) -> dict:
+    response = client.get("/api/items/changes", params={"since": since, **params}, headers=auth)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-store"
+    return response.json()
+
+
+def test_snapshot_then_deltas(client, auth):
+    first = create(client, auth, 1)
+    snapshot = changes(client, auth, 0)
+    assert snapshot["reset"] is True
+    assert [item["id"] for item in snapshot["items"]] == [first]
+
+    second = create(client, auth, 2)
+    delta = changes(client, auth, snapshot["cursor"])
+    assert (delta["reset"], delta["has_more"]) == (False, False)
+    assert [item["id"] for item in delta["items"]] == [second]
+    assert delta["deleted"] == []
+    assert delta["cursor"] > snapshot["cursor"]
+
+    # Nothing new: same cursor, empty page.
+    idle = changes(client, auth, delta["cursor"])
+    assert (idle["cursor"], idle["items"], idle["deleted"]) == (delta["cursor"], [], [])
+
+
+def test_deletes_arrive_as_tombstones(client, auth):
+    kept, removed = create(client, auth, 1), create(client, auth, 2)
+    cursor = changes(client, auth, 0)["cursor"]
+    assert client.delete(f"/api/items/{removed}", headers=auth).status_code == 204
+
+    delta = changes(client, auth, cursor)
+    assert delta["deleted"] == [removed]
+    assert delta["items"] == []
+    assert [item["id"] for item in changes(client, auth, 0)["items"]] == [kept]
+
+
+def test_created_then_deleted_within_a_page_is_only_a_tombstone(client, auth):
+    # A cursor of 0 asks for a snapshot, so start from one that has seen a change.
+    create(client, auth, 1)
+    cursor = changes(client, auth, 0)["cursor"]
+    short_lived = create(client, auth, 3)
+    assert client.delete(f"/api/items/{short_lived}", headers=auth).status_code == 204
+
+    delta = changes(client, auth, cursor)
+    assert (delta["items"], delta["deleted"]) == ([], [short_lived])
+
+
+def test_pages_follow_has_more_until_caught_up(client, auth):
+    ids = [create(client, auth, number) for number in range(5)]
+    # Change ids are per shard, not per user; start just before this user's first change.
+    cursor, seen, pages = changes(client, auth, 0)["cursor"] - len(ids), [], 0
+    while True:
+        page = changes(client, auth, cursor, limit=2)
+        pages += 1
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            break
+    assert sorted(seen) == ids
+    assert pages == 3
+
+
+def test_changes_are_per_user(client, auth):
+    create(client, auth, 1)
+    other = client.post("/api/auth/register", json={"username": "changes-other", "password": "secret1"}).json()
+    other_auth = {"Authorization": f"Bearer {other['access_token']}"}
+    snapshot = changes(client, other_auth, 0)
+    assert (snapshot["cursor"], snapshot["items"]) == (0, [])
@@ -0,0 +1,82 @@
+﻿from __future__ import annotations
+
+import json
+
+from app.services import item_transfer
+
+from conftest import image_data_url, item_payload
+
+WARDROBE = [
+    ("top", (200, 30, 30), (60, 80)),
+    ("bottom", (30, 60, 160), (80, 60)),
+    ("shoes", (40, 40, 40), (50, 50)),
+]
+
+
+def fill(client, auth) -> None:
+    for category, color, size in WARDROBE:
+        payload = item_payload(category, image_base64=image_data_url(color, size), style_tags=["Casual", "neutral"])
+        assert client.post("/api/items", json=payload, headers=auth).status_code == 201
+
+
+def export(client, auth) -> bytes:
+    response = client.get("/api/items/export", headers=auth)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return response.content
+
+
+def register(client, name: str) -> dict[str, str]:
+    token = client.post("/api/auth/register", json={"username": name, "password": "secret1"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_export_import_round_trip(client, auth):
+    fill(client, auth)
+    dump = export(client, auth)
+    exported = [json.loads(line) for line in dump.splitlines()]
+    assert len(exported) == len(WARDROBE)
+    assert all(record["image_hash"] for record in exported)
+
+    restored = register(client, "transfer-restore")
+    result = client.post("/api/items/import", content=dump, headers=restored).json()
+    assert result == {"imported": 3, "skipped": 0, "failed": 0, "errors": []}
+
+    fields = ("name", "category", "occasion", "image_base64", "color_hex", "style_tags", "status", "created_at")
+    copies = {item["image_base64"]: item for item in client.get("/api/items", headers=restored).json()}
+    for record in exported:
+        assert {field: copies[record["image_base64"]][field] for field in fields} == {
+            field: record[field] for field in fields
+        }
+    assert client.get("/api/items/summary", headers=restored).json()["total"] == 3
+
+
+def test_import_skips_items_already_present_by_digest(client, auth, monkeypatch):
+    fill(client, auth)
+    dump = export(client, auth)
+
+    again = client.post("/api/items/import", content=dump, headers=auth).json()
+    assert (again["imported"], again["skipped"]) == (0, 3)
+
+    # Copies inside one file are skipped too, in the same batch and in later ones.
+    monkeypatch.setattr(item_transfer, "IMPORT_BATCH_ITEMS", 2)
+    fresh = register(client, "transfer-copies")
+    first_line = dump.splitlines()[0] + b"\n"
+    result = client.post("/api/items/import", content=first_line * 3, headers=fresh).json()
+    assert (result["imported"], result["skipped"]) == (1, 2)
+    assert len(client.get("/api/items", headers=fresh).json()) == 1
+
+
+def test_import_reports_bad_lines_and_keeps_the_rest(client, auth, monkeypatch):
+    monkeypatch.setattr(item_transfer, "IMPORT_BATCH_ITEMS", 2)
+    lines = [
+        json.dumps(item_payload(image_base64=image_data_url((10, 200, 10)))),
+        "{not json",
+        json.dumps({"name": "missing fields"}),
+        json.dumps(item_payload("shoes", image_base64="data:image/png;base64,AAAA")),
+        "",
+        json.dumps(item_payload("bottom", image_base64=image_data_url((10, 10, 200), (80, 60)))),
+    ]
+    result = client.post("/api/items/import", content="\n".join(lines).encode(), headers=auth).json()
+    assert (result["imported"], result["failed"]) == (2, 3)
+    assert [error.split(":")[0] for error in result["errors"]] == ["line 2", "line 3", "line 4"]
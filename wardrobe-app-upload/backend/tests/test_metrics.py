@@ -0,0 +1,60 @@
+﻿from __future__ import annotations
+
+import re
+
+from conftest import item_payload
+
+
+def sample(text: str, name: str, **labels: str) -> float:
+    """Value of the one sample of `name` carrying exactly these labels, 0 when absent."""
+    rendered = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{re.escape(name)}\{{{re.escape(rendered)}\}} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def scrape(client) -> str:
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    return response.text
+
+
+def test_requests_are_counted_by_route_template(client, auth):
+    before = scrape(client)
+    created = client.post("/api/items", json=item_payload(), headers=auth).json()
+    assert client.delete(f"/api/items/{created['id']}", headers=auth).status_code == 204
+    assert client.delete(f"/api/items/{created['id']}", headers=auth).status_code == 404
+    after = scrape(client)
+
+    def delta(name: str, **labels: str) -> float:
+        return sample(after, name, **labels) - sample(before, name, **labels)
+
+    assert delta("http_requests_total", method="POST", route="/api/items", status="201") == 1
+    assert delta("http_requests_total", method="DELETE", route="/api/items/{item_id}", status="204") == 1
+    assert delta("http_requests_total", method="DELETE", route="/api/items/{item_id}", status="404") == 1
+    assert f"/api/items/{created['id']}" not in after
+
+    histogram = {"method": "DELETE", "route": "/api/items/{item_id}"}
+    assert delta("http_request_duration_seconds_count", **histogram) == 2
+    assert delta("http_request_duration_seconds_bucket", **histogram, le="+Inf") == 2
+    assert delta("wardrobe_operation_duration_seconds_count", operation="decode_image") >= 1
+    assert delta("wardrobe_operation_duration_seconds_count", operation="sql") >= 1
+
+
+def test_raw_paths_never_become_labels(client):
+    # Unknown API paths fall through to the frontend catch-all and are counted under its template.
+    assert client.get("/api/no-such-route/12345").status_code == 404
+    text = scrape(client)
+    assert sample(text, "http_requests_total", method="GET", route="/{file_path:path}", status="404") >= 1
+    assert "no-such-route" not in text
+
+
+def test_server_timing_reports_app_timers_and_queries(client, auth):
+    header = client.post("/api/items", json=item_payload(), headers=auth).headers["server-timing"]
+    assert re.search(r'(^|, )db;dur=\d+\.\d;desc="\d+ queries, \d+ rows"(, |$)', header)
+    assert re.search(r"(^|, )app;dur=\d+\.\d(, |$)", header)
+    assert re.search(r"(^|, )decode_image;dur=\d+\.\d(, |$)", header)
+
+
+def test_metrics_need_no_token(client):
+    assert client.get("/api/metrics").status_code == 200
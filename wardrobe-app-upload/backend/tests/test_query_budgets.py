@@ -0,0 +1,105 @@
+﻿from __future__ import annotations
+
+import re
+
+import pytest
+from sqlalchemy import select
+
+from app.config import get_settings
+from app.database import shard_session
+from app.query_tracing import QueryBudgetExceeded, expect_queries
+from app.serializers import render_json
+
+from conftest import image_data_url, item_payload
+
+# Every request below runs with QUERY_BUDGET_STRICT=true (see conftest): a route issuing more
+# queries than its query_budget() declares raises instead of logging, failing the test.
+
+WARDROBE = [
+    ("top", (200, 30, 30), (60, 80)),
+    ("bottom", (30, 60, 160), (80, 60)),
+    ("shoes", (40, 40, 40), (50, 50)),
+]
+
+
+def db_queries(response) -> int:
+    return int(re.search(r'db;[^,]*desc="(\d+) queries', response.headers["server-timing"]).group(1))
+
+
+def fill_wardrobe(client, auth) -> list[int]:
+    ids = []
+    for category, color, size in WARDROBE:
+        payload = item_payload(category, image_base64=image_data_url(color, size), style_tags=["casual"])
+        response = client.post("/api/items", json=payload, headers=auth)
+        assert response.status_code == 201, response.text
+        ids.append(response.json()["id"])
+    return ids
+
+
+def test_strict_mode_is_on():
+    assert get_settings().query_budget_strict
+    with pytest.raises(QueryBudgetExceeded), shard_session(None) as db, expect_queries(1):
+        db.execute(select(1))
+        db.execute(select(2))
+
+
+def test_auth_routes_stay_within_budget(client):
+    credentials = {"username": "budget-auth", "password": "secret1"}
+    assert client.post("/api/auth/register", json=credentials).status_code == 200
+    token = client.post("/api/auth/login", json=credentials).json()["access_token"]
+    assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+
+def test_item_writes_stay_within_budget_on_cold_indexes(client, auth):
+    # A new user's indexes are cold, the most expensive case for create, analyze and delete.
+    analyzed = client.post("/api/items/analyze", json={"image_base64": image_data_url()}, headers=auth)
+    assert analyzed.status_code == 200
+    ids = fill_wardrobe(client, auth)
+    copy = item_payload(image_base64=image_data_url((200, 30, 30), (60, 80)))
+    duplicate = client.post("/api/items", json=copy, headers=auth)
+    assert duplicate.status_code == 409
+    assert client.post("/api/items/analyze", json={"image_base64": image_data_url()}, headers=auth).status_code == 200
+
+    queued = client.post("/api/items", json=item_payload(), headers={**auth, "Prefer": "respond-async"})
+    assert queued.status_code == 202
+    assert client.get(f"/api/jobs/{queued.json()['id']}", headers=auth).status_code == 200
+
+    for item_id in ids:
+        assert client.delete(f"/api/items/{item_id}", headers=auth).status_code == 204
+
+
+def test_item_reads_stay_within_budget(client, auth):
+    ids = fill_wardrobe(client, auth)
+    listed = client.get("/api/items", headers=auth)
+    assert listed.status_code == 200
+    assert client.get("/api/items", headers={**auth, "If-None-Match": listed.headers["etag"]}).status_code == 304
+    assert client.get("/api/items", params={"tag": "casual", "category": "top"}, headers=auth).status_code == 200
+    assert client.get("/api/items/summary", headers=auth).status_code == 200
+
+    snapshot = client.get("/api/items/changes", headers=auth).json()
+    assert client.get("/api/items/changes", params={"since": snapshot["cursor"] - 2}, headers=auth).status_code == 200
+
+    assert client.get("/api/items/similar", params={"color": "#c81e1e"}, headers=auth).status_code == 200
+    assert client.get("/api/items/similar", params={"item_id": ids[0]}, headers=auth).status_code == 200
+
+    assert client.get("/api/recommend", headers=auth).status_code == 200
+    assert client.get("/api/recommend", params={"seed": 7, "occasion": "work"}, headers=auth).status_code == 200
+
+
+def test_recommend_fast_fail_stays_within_budget(client, auth):
+    assert client.get("/api/recommend", headers=auth).status_code == 400
+
+
+def test_import_batches_its_queries(client, auth):
+    # Import has no fixed budget, it grows with the number of batches. Within a batch only the
+    # item rows cost a query each: SQLite cannot return the ids of a multi-row insert in order.
+    def ndjson(colors):
+        payloads = [item_payload(image_base64=image_data_url(color, (70, 70))) for color in colors]
+        return b"".join(render_json(payload) + b"\n" for payload in payloads)
+
+    one = client.post("/api/items/import", content=ndjson([(10, 200, 10)]), headers=auth)
+    batch = client.post(
+        "/api/items/import", content=ndjson([(10, 10, 200), (200, 200, 10), (90, 10, 90)]), headers=auth
+    )
+    assert (one.json()["imported"], batch.json()["imported"]) == (1, 3)
+    assert db_queries(batch) == db_queries(one) + 2
@@ -0,0 +1,87 @@
+﻿from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+from pydantic import ValidationError
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from app.config import Settings
+from app.rate_limit import RateLimitMiddleware
+
+PROXY = ("10.0.0.5", 41000)
+
+
+def build_app(trusted: str = "10.0.0.0/8", max_in_flight: int = 0, gate: asyncio.Event | None = None):
+    async def endpoint(request):
+        if gate is not None:
+            await gate.wait()
+        return JSONResponse({"client": request.client.host})
+
+    inner = Starlette(routes=[Route("/api/auth/login", endpoint, methods=["POST"]), Route("/api/slow", endpoint)])
+    limited = RateLimitMiddleware(
+        inner,
+        api_prefix="/api",
+        default_rate="1000/60",
+        route_rates={("POST", "/auth/login"): ("login", "3/60")},
+        max_in_flight=max_in_flight,
+        max_queue_seconds=0.05,
+    )
+    return ProxyHeadersMiddleware(limited, trusted_hosts=trusted)
+
+
+async def _login_statuses(app, peer: tuple[str, int], forwarded_for: list[str]) -> list[httpx.Response]:
+    transport = httpx.ASGITransport(app=app, client=peer)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return [
+            await client.post("/api/auth/login", headers={"x-forwarded-for": value}) for value in forwarded_for
+        ]
+
+
+def test_rotated_leftmost_forwarded_for_still_hits_login_bucket():
+    # The proxy appends the address it saw; everything left of it is written by the client.
+    spoofed = [f"198.51.100.{n}, 203.0.113.7" for n in range(5)]
+    responses = asyncio.run(_login_statuses(build_app(), PROXY, spoofed))
+
+    assert {r.json()["client"] for r in responses[:3]} == {"203.0.113.7"}
+    assert [r.status_code for r in responses] == [200, 200, 200, 429, 429]
+    assert int(responses[3].headers["retry-after"]) >= 1
+
+
+def test_trusted_hops_are_skipped_from_the_right():
+    responses = asyncio.run(_login_statuses(build_app(), PROXY, ["198.51.100.1, 203.0.113.7, 10.1.2.3"]))
+    assert responses[0].json()["client"] == "203.0.113.7"
+
+
+def test_untrusted_peer_cannot_set_its_address():
+    peer = ("192.0.2.44", 41000)
+    responses = asyncio.run(_login_statuses(build_app(), peer, [f"198.51.100.{n}" for n in range(4)]))
+
+    assert responses[0].json()["client"] == "192.0.2.44"
+    assert [r.status_code for r in responses] == [200, 200, 200, 429]
+
+
+def test_wildcard_proxy_trust_is_refused():
+    with pytest.raises(ValidationError):
+        Settings(trusted_proxies="*")
+
+
+def test_requests_waiting_past_max_queue_seconds_are_shed():
+    async def scenario() -> list[httpx.Response]:
+        gate = asyncio.Event()
+        transport = httpx.ASGITransport(app=build_app(max_in_flight=1, gate=gate), client=PROXY)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/api/slow"))
+            await asyncio.sleep(0.01)
+            shed = await client.get("/api/slow")
+            gate.set()
+            return [await first, shed]
+
+    done, shed = asyncio.run(scenario())
+    assert done.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "1"
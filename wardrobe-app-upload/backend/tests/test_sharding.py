@@ -0,0 +1,101 @@
+﻿from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from sqlalchemy import Engine, event, func, select
+
+from app.config import get_settings
+from app.database import get_engine, get_shard_engines
+from app.migrations import migrate_all
+from app.models import ClothingItem, ItemChange, WardrobeCount, WardrobeVersion
+from tools.rebalance_shards import move_user
+
+from conftest import image_data_url, item_payload
+
+
+@contextmanager
+def sharded(count: int) -> Iterator[tuple[Engine, ...]]:
+    settings = get_settings()
+    previous = settings.shard_count
+    settings.shard_count = count
+    get_shard_engines.cache_clear()
+    try:
+        migrate_all()
+        yield get_shard_engines()
+    finally:
+        for engine in get_shard_engines():
+            engine.dispose()
+        settings.shard_count = previous
+        get_shard_engines.cache_clear()
+
+
+@contextmanager
+def statements(engine: Engine) -> Iterator[list[str]]:
+    seen: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def item_count(engine: Engine, user_id: int) -> int:
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(ClothingItem).where(ClothingItem.user_id == user_id))
+
+
+def test_item_writes_go_to_the_users_shard_only(client, auth, user_id):
+    with sharded(2) as shards, statements(get_engine()) as main_statements:
+        created = client.post("/api/items", json=item_payload(), headers=auth)
+        assert created.status_code == 201, created.text
+        assert client.delete(f"/api/items/{created.json()['id']}", headers=auth).status_code == 204
+        payload = item_payload(image_base64=image_data_url((20, 90, 200)))
+        created = client.post("/api/items", json=payload, headers=auth)
+        assert created.status_code == 201, created.text
+
+        home, other = shards[user_id % 2], shards[(user_id + 1) % 2]
+        assert item_count(home, user_id) == 1
+        assert item_count(other, user_id) == 0
+        with home.connect() as conn:
+            assert conn.scalar(select(WardrobeVersion.version).where(WardrobeVersion.user_id == user_id)) == 3
+        # The main database only answers the token lookups.
+        assert main_statements and all(statement.lstrip().startswith("SELECT users.") for statement in main_statements)
+
+
+def test_rebalance_moves_a_wardrobe_and_bumps_its_version(client, auth, user_id):
+    with sharded(2) as shards:
+        for color in ((200, 30, 30), (30, 160, 60)):
+            response = client.post("/api/items", json=item_payload(image_base64=image_data_url(color)), headers=auth)
+            assert response.status_code == 201, response.text
+        listed = client.get("/api/items", headers=auth)
+        old_ids = sorted(item["id"] for item in listed.json())
+        cursor = client.get("/api/items/changes", headers=auth).json()["cursor"]
+
+        home = shards[user_id % 2]
+        assert move_user(user_id, home, get_engine()) == 2
+        assert item_count(home, user_id) == 0
+
+    with get_engine().connect() as conn:
+        assert conn.scalar(select(WardrobeVersion.version).where(WardrobeVersion.user_id == user_id)) == 3
+        counts = conn.execute(
+            select(WardrobeCount.dimension, WardrobeCount.bucket, WardrobeCount.item_count).where(
+                WardrobeCount.user_id == user_id, WardrobeCount.dimension == "status"
+            )
+        ).all()
+        assert counts == [("status", "ready", 2)]
+        assert conn.scalar(select(func.max(ItemChange.id)).where(ItemChange.user_id == user_id)) > cursor
+
+    moved = client.get("/api/items", headers={**auth, "If-None-Match": listed.headers["etag"]})
+    assert moved.status_code == 200
+    new_ids = sorted(item["id"] for item in moved.json())
+    assert len(new_ids) == 2
+
+    # Ids are per file, so an old id may come back as a new one; then only the upsert remains.
+    changes = client.get("/api/items/changes", params={"since": cursor}, headers=auth).json()
+    assert set(changes["deleted"]) == set(old_ids) - set(new_ids)
+    assert sorted(item["id"] for item in changes["items"]) == new_ids
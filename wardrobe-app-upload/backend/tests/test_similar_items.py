@@ -0,0 +1,77 @@
+﻿from __future__ import annotations
+
+import random
+
+from app.serializers import render_json
+from app.services.color_index import SCAN_THRESHOLD, color_distance
+from app.services.image_analysis import hex_to_rgb, rgb_to_hsl
+
+from conftest import image_data_url, item_payload
+
+
+def import_palette(client, auth, count: int) -> None:
+    # Exported analysis is trusted on import, so the colors land exactly as given.
+    rng = random.Random(27)
+    lines = []
+    for number in range(count):
+        hue, saturation, lightness = rng.uniform(0, 360), rng.uniform(0, 100), rng.uniform(0, 100)
+        payload = item_payload(
+            image_base64=image_data_url((number % 256, number // 256, 99)),
+            color_hex="#808080",
+            hue=hue,
+            saturation=saturation,
+            lightness=lightness,
+            image_hash=f"{number:016x}",
+            status="ready",
+        )
+        lines.append(render_json(payload) + b"\n")
+    response = client.post("/api/items/import", content=b"".join(lines), headers=auth)
+    assert response.json()["imported"] == count
+
+
+def brute_force(items: list[dict], query: tuple[float, float, float], k: int, exclude: int | None = None):
+    distances = sorted(
+        (color_distance(query, (item["hue"], item["saturation"], item["lightness"])), item["id"])
+        for item in items
+        if item["id"] != exclude
+    )
+    return distances[:k]
+
+
+def distances_of(result: list[dict], query: tuple[float, float, float]) -> list[float]:
+    return [color_distance(query, (item["hue"], item["saturation"], item["lightness"])) for item in result]
+
+
+def test_similar_matches_brute_force_beyond_the_linear_scan(client, auth):
+    import_palette(client, auth, SCAN_THRESHOLD * 2)
+    items = client.get("/api/items", headers=auth).json()
+
+    for color in ("#c81e1e", "#1ec8c8", "#808080", "#fafafa", "#101010", "#ff00ff"):
+        query = rgb_to_hsl(*hex_to_rgb(color))
+        result = client.get("/api/items/similar", params={"color": color, "k": 7}, headers=auth).json()
+        expected = brute_force(items, query, 7)
+        assert distances_of(result, query) == [distance for distance, _ in expected]
+
+    anchor = items[5]
+    query = (anchor["hue"], anchor["saturation"], anchor["lightness"])
+    result = client.get("/api/items/similar", params={"item_id": anchor["id"], "k": 5}, headers=auth).json()
+    assert anchor["id"] not in {item["id"] for item in result}
+    assert distances_of(result, query) == [distance for distance, _ in brute_force(items, query, 5, anchor["id"])]
+
+
+def test_similar_follows_deletes(client, auth):
+    import_palette(client, auth, 10)
+    items = client.get("/api/items", headers=auth).json()
+    color = "#c81e1e"
+    nearest = client.get("/api/items/similar", params={"color": color, "k": 1}, headers=auth).json()[0]
+
+    assert client.delete(f"/api/items/{nearest['id']}", headers=auth).status_code == 204
+    result = client.get("/api/items/similar", params={"color": color, "k": 9}, headers=auth).json()
+    assert nearest["id"] not in {item["id"] for item in result}
+    assert len(result) == len(items) - 1
+
+
+def test_similar_rejects_bad_queries(client, auth):
+    assert client.get("/api/items/similar", headers=auth).status_code == 400
+    assert client.get("/api/items/similar", params={"color": "red"}, headers=auth).status_code == 400
+    assert client.get("/api/items/similar", params={"item_id": 999999}, headers=auth).status_code == 404
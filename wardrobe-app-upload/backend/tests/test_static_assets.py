@@ -0,0 +1,84 @@
+﻿from __future__ import annotations
+
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.static_assets import IMMUTABLE, REVALIDATE, StaticAssetIndex
+from tools.build_frontend import ROOT, build
+
+
+@pytest.fixture(scope="module")
+def built(tmp_path_factory):
+    dest = tmp_path_factory.mktemp("frontend") / "dist"
+    renamed = build(ROOT / "frontend", dest)
+    index = StaticAssetIndex(dest)
+
+    app = FastAPI()
+
+    @app.get("/{path:path}")
+    def serve(path: str, request: Request):
+        return index.respond(request, index.get(path or "index.html"))
+
+    with TestClient(app) as client:
+        yield client, renamed
+
+
+def test_hashed_assets_are_immutable_and_referenced_by_index(built):
+    client, renamed = built
+    app_js = renamed["assets/app.js"]
+    assert app_js != "assets/app.js"
+
+    response = client.get(f"/{app_js}", headers={"Accept-Encoding": "identity"})
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert response.headers["content-type"].endswith("javascript; charset=utf-8")
+
+    index = client.get("/index.html")
+    assert index.headers["cache-control"] == REVALIDATE
+    assert f"/{app_js}" in index.text
+    assert "/assets/app.js" not in index.text
+
+
+def test_runtime_config_keeps_its_name_and_revalidates(built):
+    client, renamed = built
+    assert "assets/runtime-config.js" not in renamed
+    assert client.get("/assets/runtime-config.js").headers["cache-control"] == REVALIDATE
+
+
+@pytest.mark.parametrize(
+    ("accept", "encoding"),
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip", "gzip"),
+        ("br;q=0, gzip", "gzip"),
+        ("*", "br"),
+        ("", None),
+        ("br;q=0, gzip;q=0.0", None),
+    ],
+)
+def test_precompressed_variant_is_negotiated(built, accept, encoding):
+    client, renamed = built
+    path = f"/{renamed['assets/app.js']}"
+    identity = client.get(path, headers={"Accept-Encoding": "identity"})
+
+    # httpx would decode the body itself; ask for the raw stream to see what was sent.
+    with client.stream("GET", path, headers={"Accept-Encoding": accept}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers.get("content-encoding") == encoding
+    decode = {"br": brotli.decompress, "gzip": gzip.decompress, None: bytes}[encoding]
+    assert decode(raw) == identity.content
+
+
+def test_each_encoding_revalidates_with_its_own_etag(built):
+    client, renamed = built
+    path = f"/{renamed['assets/styles.css']}"
+    br = client.get(path, headers={"Accept-Encoding": "br"})
+    gz = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert br.headers["etag"] != gz.headers["etag"]
+
+    assert client.get(path, headers={"Accept-Encoding": "br", "If-None-Match": br.headers["etag"]}).status_code == 304
+    assert client.get(path, headers={"Accept-Encoding": "gzip", "If-None-Match": br.headers["etag"]}).status_code == 200
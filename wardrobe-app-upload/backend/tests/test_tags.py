@@ -0,0 +1,64 @@
+﻿from __future__ import annotations
+
+from sqlalchemy import create_engine, text
+
+from app.database import Base
+from app.migrations import upgrade_schema
+
+from conftest import image_data_url, item_payload
+
+
+def add_item(client, auth, category: str, color: tuple[int, int, int], tags: list[str]) -> int:
+    payload = item_payload(category, image_base64=image_data_url(color), style_tags=tags)
+    response = client.post("/api/items", json=payload, headers=auth)
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def listed(client, auth, **params) -> set[int]:
+    response = client.get("/api/items", params=params, headers=auth)
+    assert response.status_code == 200, response.text
+    return {item["id"] for item in response.json()}
+
+
+def test_tags_are_stored_normalized(client, auth):
+    add_item(client, auth, "top", (200, 30, 30), [" Casual", "casual", "NEUTRAL", ""])
+    assert client.get("/api/items", headers=auth).json()[0]["style_tags"] == ["casual", "neutral"]
+
+
+def test_tag_filter_is_case_insensitive_and_ands_tags(client, auth):
+    both = add_item(client, auth, "top", (200, 30, 30), ["casual", "neutral"])
+    casual = add_item(client, auth, "top", (30, 160, 60), ["Casual"])
+    add_item(client, auth, "top", (30, 60, 160), ["neutral"])
+
+    assert listed(client, auth, tag="CASUAL") == {both, casual}
+    assert listed(client, auth, tag=["casual", " Neutral "]) == {both}
+    assert listed(client, auth, tag="formal") == set()
+
+
+def test_category_filter(client, auth):
+    top = add_item(client, auth, "top", (200, 30, 30), ["casual"])
+    shoes = add_item(client, auth, "shoes", (30, 60, 160), ["casual"])
+
+    assert listed(client, auth, category="top") == {top}
+    assert listed(client, auth, category="shoes", tag="casual") == {shoes}
+    assert listed(client, auth, category="outer") == set()
+
+
+def test_upgrade_backfills_the_tag_list(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE clothing_items DROP COLUMN style_tag_list"))
+        conn.execute(
+            text(
+                "INSERT INTO clothing_items (user_id, name, category, occasion, image_base64, color_hex, hue, "
+                "saturation, lightness, fit, warmth, style_tags, tag_mask, status, created_at) VALUES (1, 'old', 'top', "
+                "'work', '', '#000000', 0, 0, 0, 'regular', 2, 'clean,neutral', 0, 'ready', CURRENT_TIMESTAMP)"
+            )
+        )
+
+    upgrade_schema(engine)
+    with engine.connect() as conn:
+        assert conn.scalar(text("SELECT style_tag_list FROM clothing_items")) == '["clean", "neutral"]'
+    engine.dispose()
@@ -0,0 +1,70 @@
+﻿from __future__ import annotations
+
+import base64
+
+import pytest
+
+from app.config import get_settings
+from app.upload_policy import max_upload_body_bytes
+
+from conftest import image_data_url, item_payload
+
+
+def oversized_payload(extra: int) -> str:
+    raw = b"\0" * (get_settings().upload_max_bytes + extra)
+    return "data:image/png;base64," + base64.b64encode(raw).decode()
+
+
+def test_policy_is_advertised(client):
+    response = client.get("/api/upload/policy")
+    settings = get_settings()
+    assert response.json()["max_dimension"] == settings.upload_max_dimension
+    assert response.json()["max_bytes"] == settings.upload_max_bytes
+    assert response.json()["enforced"] is True
+    assert "max-age" in response.headers["cache-control"]
+
+
+@pytest.mark.parametrize("path", ["/api/items", "/api/items/analyze"])
+def test_body_over_the_limit_is_refused_from_content_length(client, auth, path):
+    body = b'{"image_base64": "' + b"A" * max_upload_body_bytes() + b'"}'
+    response = client.post(path, content=body, headers={**auth, "Content-Type": "application/json"})
+    assert response.status_code == 413
+    assert "Request body is larger" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("path", ["/api/items", "/api/items/analyze"])
+def test_image_over_max_bytes_is_413(client, auth, path):
+    # Under the body limit, which leaves room for the other fields, but over the image limit.
+    response = client.post(path, json=item_payload(image_base64=oversized_payload(1024)), headers=auth)
+    assert response.status_code == 413
+    assert "resize it to at most" in response.json()["detail"]
+
+
+@pytest.mark.parametrize(
+    ("image", "detail"),
+    [
+        (image_data_url(size=(1300, 20)), "the longest edge may be at most 1280px"),
+        (image_data_url(size=(20, 1300)), "the longest edge may be at most 1280px"),
+        (image_data_url(fmt="GIF"), "Unsupported image format: image/gif"),
+    ],
+)
+@pytest.mark.parametrize("path", ["/api/items", "/api/items/analyze"])
+def test_images_outside_the_policy_are_422(client, auth, path, image, detail):
+    response = client.post(path, json=item_payload(image_base64=image), headers=auth)
+    assert response.status_code == 422
+    assert detail in response.json()["detail"]
+
+
+def test_rejected_uploads_store_nothing(client, auth):
+    for image in (oversized_payload(1024), image_data_url(size=(1300, 20)), "data:image/png;base64,AAAA"):
+        for headers in (auth, {**auth, "Prefer": "respond-async"}):
+            response = client.post("/api/items", json=item_payload(image_base64=image), headers=headers)
+            assert response.status_code in {400, 413, 422}
+    assert client.get("/api/items", headers=auth).json() == []
+    assert client.get("/api/items/summary", headers=auth).json()["total"] == 0
+
+
+def test_images_within_the_policy_are_accepted(client, auth):
+    edge = get_settings().upload_max_dimension
+    payload = item_payload(image_base64=image_data_url(size=(edge, 16), fmt="JPEG"))
+    assert client.post("/api/items", json=payload, headers=auth).status_code == 201
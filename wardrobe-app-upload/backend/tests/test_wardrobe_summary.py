@@ -0,0 +1,104 @@
+﻿from __future__ import annotations
+
+from collections import Counter
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.database import shard_session
+from app.services import ingest_queue
+from app.services.ingest_queue import claim_next_job, process_job
+from app.services.wardrobe_summary import color_bucket, summary_upsert
+
+from conftest import image_data_url, item_payload
+
+DELTA = Counter({("status", "pending"): -1, ("status", "ready"): 1, ("slot", "top|work"): 1})
+
+
+def test_upsert_compiles_for_postgresql():
+    sql = str(summary_upsert("postgresql", 7, DELTA).compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (user_id, dimension, bucket) DO UPDATE" in sql
+    assert "item_count = (wardrobe_counts.item_count + excluded.item_count)" in sql
+
+
+def test_upsert_compiles_for_sqlite():
+    sql = str(summary_upsert("sqlite", 7, DELTA).compile(dialect=sqlite.dialect()))
+    assert "ON CONFLICT (user_id, dimension, bucket) DO UPDATE" in sql
+
+
+def test_upsert_skips_zero_deltas():
+    assert summary_upsert("postgresql", 7, Counter({("status", "ready"): 0})) is None
+
+
+def recount(client, auth) -> dict[str, object]:
+    """The summary computed the slow way, from the items themselves."""
+    items = client.get("/api/items", headers=auth).json()
+    statuses, categories, colors = Counter(), Counter(), Counter()
+    for item in items:
+        statuses[item["status"]] += 1
+        if item["status"] == "ready":
+            categories[item["category"]] += 1
+            colors[color_bucket(item["hue"], item["saturation"], item["lightness"])] += 1
+    return {"total": len(items), "statuses": dict(statuses), "categories": dict(categories), "colors": dict(colors)}
+
+
+def summary(client, auth) -> dict[str, object]:
+    body = client.get("/api/items/summary", headers=auth).json()
+    return {key: body[key] for key in ("total", "statuses", "categories", "colors")}
+
+
+def create(client, auth, category: str, color: tuple[int, int, int], size: tuple[int, int], **headers) -> dict:
+    payload = item_payload(category, image_base64=image_data_url(color, size))
+    response = client.post("/api/items", json=payload, headers={**auth, **headers})
+    assert response.status_code in {201, 202}, response.text
+    return response.json()
+
+
+def run_queue() -> None:
+    with shard_session(None) as db:
+        while (claimed := claim_next_job(db)) is not None:
+            process_job(*claimed)
+
+
+def test_summary_follows_create_delete_and_ingest(client, auth, monkeypatch):
+    top = create(client, auth, "top", (200, 30, 30), (60, 80))
+    create(client, auth, "bottom", (30, 60, 160), (80, 60))
+    assert summary(client, auth) == recount(client, auth)
+
+    assert client.delete(f"/api/items/{top['id']}", headers=auth).status_code == 204
+    assert summary(client, auth) == recount(client, auth)
+
+    create(client, auth, "shoes", (40, 40, 40), (50, 50), Prefer="respond-async")
+    pending = summary(client, auth)
+    assert pending == recount(client, auth)
+    assert pending["statuses"] == {"ready": 1, "pending": 1}
+    assert "shoes" not in pending["categories"]
+
+    run_queue()
+    assert summary(client, auth) == recount(client, auth)
+    assert summary(client, auth)["categories"] == {"bottom": 1, "shoes": 1}
+
+    def undecodable(image_base64, raw=None):
+        raise ValueError("cannot identify image file")
+
+    monkeypatch.setattr(ingest_queue, "extract_features", undecodable)
+    create(client, auth, "top", (250, 250, 250), (40, 90), Prefer="respond-async")
+    run_queue()
+    assert summary(client, auth) == recount(client, auth)
+    assert summary(client, auth)["total"] == 2
+
+
+def test_recommend_fails_fast_until_every_slot_has_a_ready_item(client, auth):
+    create(client, auth, "top", (200, 30, 30), (60, 80))
+    create(client, auth, "bottom", (30, 60, 160), (80, 60))
+    assert client.get("/api/recommend", headers=auth).status_code == 400
+
+    # A pending pair of shoes cannot be scored yet, so it does not fill the slot.
+    create(client, auth, "shoes", (40, 40, 40), (50, 50), Prefer="respond-async")
+    response = client.get("/api/recommend", headers=auth)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Not enough items to generate outfit"
+
+    run_queue()
+    outfit = client.get("/api/recommend", headers=auth)
+    assert outfit.status_code == 200
+    assert client.get("/api/recommend", params={"occasion": "sport"}, headers=auth).status_code == 400
@@ -0,0 +1,105 @@
+﻿"""Build frontend/dist: content-hashed asset names plus precompressed .gz/.br siblings.
+
+    python backend/tools/build_frontend.py
+
+index.html and sw.js are rewritten to reference the hashed names, and the service worker
+cache name is derived from the build hash so it no longer needs hand-bumping.
+assets/runtime-config.js keeps its name: it is per-deploy configuration, edited after the
+build, and is served with no-cache so a changed API base reaches clients on their next load.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import shutil
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+ROOT = Path(__file__).resolve().parents[2]
+FINGERPRINT_DIRS = ("assets",)
+NOT_FINGERPRINTED = {"assets/runtime-config.js"}
+COMPRESSIBLE = {".html", ".js", ".css", ".json", ".svg", ".txt", ".webmanifest"}
+MIN_COMPRESS_BYTES = 512
+HASH_LENGTH = 10
+
+
+def build(source: Path, dest: Path) -> dict[str, str]:
+    if dest.exists():
+        shutil.rmtree(dest)
+    dest.mkdir(parents=True)
+
+    files = sorted(path for path in source.rglob("*") if path.is_file() and dest not in path.parents)
+    renamed: dict[str, str] = {}
+    for path in files:
+        rel = path.relative_to(source).as_posix()
+        if rel.split("/", 1)[0] in FINGERPRINT_DIRS and rel not in NOT_FINGERPRINTED:
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()[:HASH_LENGTH]
+            renamed[rel] = f"{path.parent.relative_to(source).as_posix()}/{path.stem}.{digest}{path.suffix}"
+
+    build_hash = hashlib.sha256(json.dumps(renamed, sort_keys=True).encode("utf-8")).hexdigest()[:HASH_LENGTH]
+    for path in files:
+        rel = path.relative_to(source).as_posix()
+        target = dest / renamed.get(rel, rel)
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        if rel in {"index.html", "sw.js"}:
+            text = _rewrite_references(path.read_text(encoding="utf-8-sig"), renamed)
+            if rel == "sw.js":
+                text = re.sub(r'const CACHE_NAME = "[^"]*";', f'const CACHE_NAME = "wardrobe-pwa-{build_hash}";', text)
+            target.write_text(text, encoding="utf-8")
+        else:
+            shutil.copyfile(path, target)
+
+    for target in sorted(dest.rglob("*")):
+        if target.is_file():
+            _precompress(target)
+
+    manifest = {"build": build_hash, "assets": renamed}
+    (dest / "asset-manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return renamed
+
+
+def _rewrite_references(text: str, renamed: dict[str, str]) -> str:
+    for original, hashed in renamed.items():
+        text = text.replace(f"/{original}", f"/{hashed}")
+    return text
+
+
+def _precompress(path: Path) -> None:
+    if path.suffix not in COMPRESSIBLE:
+        return
+    raw = path.read_bytes()
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return
+
+    gz = gzip.compress(raw, compresslevel=9, mtime=0)
+    if len(gz) < len(raw):
+        path.with_name(path.name + ".gz").write_bytes(gz)
+    if brotli is not None:
+        br = brotli.compress(raw, quality=11)
+        if len(br) < len(raw):
+            path.with_name(path.name + ".br").write_bytes(br)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", type=Path, default=ROOT / "frontend")
+    parser.add_argument("--dest", type=Path, default=ROOT / "frontend" / "dist")
+    args = parser.parse_args()
+
+    renamed = build(args.source, args.dest)
+    for original, hashed in renamed.items():
+        print(f"{original} -> {hashed}")
+    print(f"built {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
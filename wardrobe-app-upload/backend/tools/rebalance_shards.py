@@ -0,0 +1,151 @@
+﻿"""Move wardrobes between storage layouts: the single database, or N per-user SQLite shards.
+
+    # stop the app first, then e.g. single database -> 4 shards, then restart with SHARD_COUNT=4
+    python backend/tools/rebalance_shards.py --to-shards 4
+    python backend/tools/rebalance_shards.py --from-shards 4 --to-shards 8 --dry-run
+
+Layout 0 keeps every table in DATABASE_URL; shard k of a layout with N > 0 shards is
+SHARD_URL_TEMPLATE formatted with shard=k and holds users with user_id % N == k. Accounts
+always stay in DATABASE_URL. Users whose rows already sit in the right file are skipped.
+
+Item ids are only unique within a shard, so moved items get new ids. The user's change log is
+rewritten as a delete for every old id followed by an upsert for every new one, numbered above
+any cursor a client can hold, and the wardrobe version moves along one higher: syncing clients
+simply converge. Each user is copied in one transaction and only then removed from the source,
+so an interrupted run can be started again.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from sqlalchemy import Engine, create_engine, delete, func, insert, select
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import models  # noqa: E402
+from app.config import get_settings  # noqa: E402
+from app.database import SHARDED_TABLES, Base  # noqa: E402
+from app.migrations import upgrade_schema  # noqa: E402
+
+ITEMS = models.ClothingItem.__table__
+TAGS = models.ClothingTag.__table__
+CHANGES = models.ItemChange.__table__
+JOBS = models.IngestJob.__table__
+COUNTS = models.WardrobeCount.__table__
+VERSIONS = models.WardrobeVersion.__table__
+USERS = models.User.__table__
+
+
+class Layout:
+    def __init__(self, shard_count: int, database_url: str, template: str):
+        self.shard_count = shard_count
+        self.urls = [template.format(shard=shard) for shard in range(shard_count)] or [database_url]
+        self._engines: dict[str, Engine] = {}
+
+    def url_for(self, user_id: int) -> str:
+        return self.urls[user_id % len(self.urls)]
+
+    def engine(self, url: str) -> Engine:
+        if url not in self._engines:
+            connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+            self._engines[url] = create_engine(url, connect_args=connect_args)
+        return self._engines[url]
+
+
+def move_user(user_id: int, source: Engine, target: Engine) -> int:
+    with source.connect() as src:
+        if src.scalar(select(func.count()).select_from(CHANGES).where(CHANGES.c.user_id == user_id)) == 0:
+            # Nothing logged means nothing stored: a new user, or one an earlier run already moved.
+            return 0
+
+    with source.connect() as src, target.begin() as dst:
+        # Leftovers from an interrupted run; the source still holds the real rows.
+        _delete_user_rows(dst, user_id)
+
+        id_map: dict[int, int] = {}
+        item_ids = src.scalars(select(ITEMS.c.id).where(ITEMS.c.user_id == user_id).order_by(ITEMS.c.id)).all()
+        for old_id in item_ids:
+            # One row at a time: images make whole wardrobes too large to hold at once.
+            row = src.execute(select(ITEMS).where(ITEMS.c.id == old_id)).mappings().one()
+            values = {key: value for key, value in row.items() if key != "id"}
+            id_map[old_id] = dst.execute(insert(ITEMS).values(values)).inserted_primary_key[0]
+
+        for row in src.execute(select(TAGS).where(TAGS.c.user_id == user_id)).mappings():
+            if row["item_id"] in id_map:
+                dst.execute(insert(TAGS).values({**row, "item_id": id_map[row["item_id"]]}))
+
+        for row in src.execute(select(JOBS).where(JOBS.c.user_id == user_id)).mappings():
+            values = {key: value for key, value in row.items() if key != "id"}
+            dst.execute(insert(JOBS).values({**values, "item_id": id_map.get(row["item_id"], 0)}))
+
+        for row in src.execute(select(COUNTS).where(COUNTS.c.user_id == user_id)).mappings():
+            dst.execute(insert(COUNTS).values(row))
+
+        # Invalidates ETags and every worker's cached indexes for this user.
+        version = src.scalar(select(VERSIONS.c.version).where(VERSIONS.c.user_id == user_id)) or 0
+        dst.execute(insert(VERSIONS).values(user_id=user_id, version=version + 1))
+
+        # New change ids must exceed every cursor the user's clients got from the source.
+        cursor = src.scalar(select(func.max(CHANGES.c.id)).where(CHANGES.c.user_id == user_id)) or 0
+        next_id = max(cursor, dst.scalar(select(func.max(CHANGES.c.id))) or 0) + 1
+        log = [(old_id, "delete") for old_id in id_map] + [(new_id, "upsert") for new_id in id_map.values()]
+        for offset, (item_id, op) in enumerate(log):
+            dst.execute(insert(CHANGES).values(id=next_id + offset, user_id=user_id, item_id=item_id, op=op))
+
+    with source.begin() as src:
+        _delete_user_rows(src, user_id)
+    return len(id_map)
+
+
+def _delete_user_rows(conn, user_id: int) -> None:
+    for table in (TAGS, JOBS, CHANGES, COUNTS, VERSIONS, ITEMS):
+        conn.execute(delete(table).where(table.c.user_id == user_id))
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--from-shards", type=int, default=settings.shard_count, help="current layout (0 = single database)"
+    )
+    parser.add_argument("--to-shards", type=int, required=True, help="new layout (0 = single database)")
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--template", default=settings.shard_url_template, help="shard URL with a {shard} field")
+    parser.add_argument("--dry-run", action="store_true", help="only report which users would move")
+    args = parser.parse_args()
+
+    source = Layout(args.from_shards, args.database_url, args.template)
+    target = Layout(args.to_shards, args.database_url, args.template)
+    main_engine = target.engine(args.database_url)
+
+    if not args.dry_run:
+        sharded = [table for table in Base.metadata.sorted_tables if table.name in SHARDED_TABLES]
+        for url in target.urls:
+            upgrade_schema(target.engine(url), None if args.to_shards == 0 else sharded)
+
+    with main_engine.connect() as conn:
+        user_ids = conn.scalars(select(USERS.c.id).order_by(USERS.c.id)).all()
+
+    moved_users = moved_items = 0
+    for user_id in user_ids:
+        source_url, target_url = source.url_for(user_id), target.url_for(user_id)
+        if source_url == target_url:
+            continue
+        moved_users += 1
+        if args.dry_run:
+            print(f"user {user_id}: {source_url} -> {target_url}")
+            continue
+
+        moved_items += move_user(user_id, source.engine(source_url), target.engine(target_url))
+
+    verb = "would move" if args.dry_run else "moved"
+    print(f"{verb} {moved_users} of {len(user_ids)} users ({moved_items} items)")
+    if not args.dry_run:
+        print(f"now start the app with SHARD_COUNT={args.to_shards}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
 ﻿const TOKEN_KEY = "wardrobe_token_v1";
 const THEME_KEY = "wardrobe_theme_v1";
+const SNAPSHOT_CACHE = "wardrobe-snapshot-v1";
 const DEFAULT_THEME = "atelier";
 const API_BASE = resolveApiBase();
+// Used until GET /upload/policy answers (or if it cannot be reached); mirrors the server defaults.
+const DEFAULT_UPLOAD_POLICY = {
+  max_dimension: 1280,
+  max_bytes: 2 * 1024 * 1024,
+  format: "image/webp",
+  fallback_format: "image/png",
+  quality: 0.85,
+  accepted_formats: ["image/webp", "image/png", "image/jpeg"],
+};
 
 
 const THEME_META = {
@@ -36,7 +46,14 @@ const state = {
   token: localStorage.getItem(TOKEN_KEY) || "",
   user: null,
   items: [],
+  // Delta-sync cursor matching state.items; 0 means "no local copy yet".
+  cursor: 0,
   providerStatus: {},
+  // GET path -> { etag, payload }, replayed when the server answers 304.
+  etags: new Map(),
+  uploadPolicy: null,
+  // Uploads the server flagged as likely duplicates, waiting for "upload anyway" or "skip".
+  duplicates: [],
 };
 
 const el = {
@@ -44,6 +61,7 @@ const el = {
   appView: document.getElementById("app-view"),
   authMessage: document.getElementById("auth-message"),
   uploadMessage: document.getElementById("upload-message"),
+  duplicateReview: document.getElementById("duplicate-review"),
   recommendMessage: document.getElementById("recommend-message"),
   welcomeTitle: document.getElementById("welcome-title"),
   themeSelect: document.getElementById("theme-select"),
@@ -311,15 +329,104 @@ async function hydrateUser() {
 }
 
 async function refreshItems() {
+  if (!state.cursor) {
+    await loadSnapshot();
+  }
+
   try {
-    const items = await apiFetch("/items");
-    state.items = items;
+    let hasMore = true;
+    while (hasMore) {
+      const delta = await apiFetch(`/items/changes?since=${state.cursor}`);
+      applyDelta(delta);
+      hasMore = delta.has_more;
+    }
     renderCloset();
+    await saveSnapshot();
   } catch (error) {
+    renderCloset();
     setText(el.uploadMessage, error.message, true);
   }
 }
 
+function applyDelta(delta) {
+  const byId = new Map(delta.reset ? [] : state.items.map((item) => [item.id, item]));
+  for (const id of delta.deleted) {
+    byId.delete(id);
+  }
+  for (const item of delta.items) {
+    byId.set(item.id, item);
+  }
+  state.items = Array.from(byId.values()).sort((a, b) => b.id - a.id);
+  state.cursor = delta.cursor;
+}
+
+function snapshotKey() {
+  return `/__snapshot/items/${state.user?.id || "anonymous"}`;
+}
+
+async function loadSnapshot() {
+  if (!("caches" in window) || !state.user) {
+    return;
+  }
+  try {
+    const cache = await caches.open(SNAPSHOT_CACHE);
+    const response = await cache.match(snapshotKey());
+    if (response) {
+      const snapshot = await response.json();
+      state.items = snapshot.items || [];
+      state.cursor = snapshot.cursor || 0;
+    }
+  } catch {
+    // A missing or corrupt snapshot only costs a full sync.
+  }
+}
+
+async function saveSnapshot() {
+  if (!("caches" in window) || !state.user) {
+    return;
+  }
+  try {
+    const cache = await caches.open(SNAPSHOT_CACHE);
+    const body = JSON.stringify({ cursor: state.cursor, items: state.items });
+    await cache.put(snapshotKey(), new Response(body, { headers: { "Content-Type": "application/json" } }));
+  } catch {
+    // Storage quota or private mode; the in-memory copy still works.
+  }
+}
+
+async function clearSnapshot(key = snapshotKey()) {
+  if (!("caches" in window)) {
+    return;
+  }
+  try {
+    const cache = await caches.open(SNAPSHOT_CACHE);
+    await cache.delete(key);
+  } catch {
+    // Nothing to clear.
+  }
+}
+
+// Drops API responses an older service worker may have stored for the signed-in user.
+async function clearApiCache() {
+  if (!("caches" in window)) {
+    return;
+  }
+  try {
+    const keys = await caches.keys();
+    for (const key of keys.filter((name) => name.startsWith("wardrobe-pwa-"))) {
+      const cache = await caches.open(key);
+      const requests = await cache.keys();
+      await Promise.all(
+        requests
+          .filter((request) => new URL(request.url).pathname.includes("/api/"))
+          .map((request) => cache.delete(request))
+      );
+    }
+  } catch {
+    // Nothing to clear.
+  }
+}
+
 async function onUpload(event) {
   event.preventDefault();
 
@@ -343,9 +450,10 @@ async function onUpload(event) {
 
   try {
     let created = 0;
+    let flagged = 0;
     for (let index = 0; index < pngFiles.length; index += 1) {
       const file = pngFiles[index];
-      const base64 = await fileToDataUrl(file);
+      const base64 = await prepareUpload(file);
 
       let analysis = null;
       if (selectedCategory === "auto" || selectedFit === "auto") {
@@ -369,16 +477,95 @@ async function onUpload(event) {
         style_tags: tags,
       };
 
-      await apiFetch("/items", {
-        method: "POST",
-        body: JSON.stringify(payload),
-      });
-      created += 1;
+      if (analysis?.duplicate_item_ids?.length) {
+        state.duplicates.push({ payload, matchIds: analysis.duplicate_item_ids });
+        flagged += 1;
+        continue;
+      }
+
+      try {
+        await apiFetch("/items", {
+          method: "POST",
+          body: JSON.stringify(payload),
+        });
+        created += 1;
+      } catch (error) {
+        if (error.status !== 409) {
+          throw error;
+        }
+        state.duplicates.push({ payload, matchIds: error.payload?.duplicate_item_ids || [] });
+        flagged += 1;
+      }
     }
 
     el.uploadForm.reset();
-    setText(el.uploadMessage, `上传成功，共 ${created} 件。`);
+    const flaggedText = flagged ? `，${flagged} 件疑似重复，请在下方确认` : "";
+    setText(el.uploadMessage, `上传成功，共 ${created} 件${flaggedText}。`);
     await refreshItems();
+    renderDuplicateReview();
+  } catch (error) {
+    setText(el.uploadMessage, error.message, true);
+  }
+}
+
+function renderDuplicateReview() {
+  el.duplicateReview.innerHTML = "";
+  el.duplicateReview.classList.toggle("hidden", !state.duplicates.length);
+
+  for (const entry of state.duplicates) {
+    const row = document.createElement("div");
+    row.className = "duplicate-entry";
+
+    const text = document.createElement("p");
+    text.className = "line";
+    text.textContent = `「${entry.payload.name}」与已有衣物很像：`;
+    row.appendChild(text);
+
+    const thumbs = document.createElement("div");
+    thumbs.className = "duplicate-thumbs";
+    const matches = state.items.filter((item) => entry.matchIds.includes(item.id));
+    for (const item of [entry.payload, ...matches]) {
+      const image = document.createElement("img");
+      image.src = item.image_base64;
+      image.alt = item.name;
+      image.title = item.name;
+      thumbs.appendChild(image);
+    }
+    row.appendChild(thumbs);
+
+    const actions = document.createElement("div");
+    actions.className = "duplicate-actions";
+    const uploadBtn = document.createElement("button");
+    uploadBtn.type = "button";
+    uploadBtn.className = "primary-btn";
+    uploadBtn.textContent = "仍然上传";
+    uploadBtn.addEventListener("click", () => resolveDuplicate(entry, true));
+    const skipBtn = document.createElement("button");
+    skipBtn.type = "button";
+    skipBtn.className = "ghost-btn";
+    skipBtn.textContent = "跳过";
+    skipBtn.addEventListener("click", () => resolveDuplicate(entry, false));
+    actions.append(uploadBtn, skipBtn);
+    row.appendChild(actions);
+
+    el.duplicateReview.appendChild(row);
+  }
+}
+
+async function resolveDuplicate(entry, upload) {
+  try {
+    if (upload) {
+      await apiFetch("/items", {
+        method: "POST",
+        body: JSON.stringify({ ...entry.payload, allow_duplicate: true }),
+      });
+      setText(el.uploadMessage, `已上传「${entry.payload.name}」。`);
+    }
+    state.duplicates = state.duplicates.filter((pending) => pending !== entry);
+    if (upload) {
+      await refreshItems();
+    }
+    renderDuplicateReview();
   } catch (error) {
     setText(el.uploadMessage, error.message, true);
   }
@@ -493,9 +680,15 @@ function showApp() {
 }
 
 function logout(showMsg = false) {
+  clearSnapshot();
+  clearApiCache();
   state.token = "";
   state.user = null;
   state.items = [];
+  state.cursor = 0;
+  state.duplicates = [];
+  renderDuplicateReview();
+  state.etags.clear();
   localStorage.removeItem(TOKEN_KEY);
 
   showAuth(showMsg ? "你已退出登录。" : "");
@@ -518,6 +711,12 @@ async function apiFetch(path, options = {}) {
     headers.set("Authorization", `Bearer ${state.token}`);
   }
 
+  const isGet = !rest.method || rest.method === "GET";
+  const cached = isGet ? state.etags.get(path) : null;
+  if (cached) {
+    headers.set("If-None-Match", cached.etag);
+  }
+
   const response = await fetch(`${API_BASE}${path}`, {
     ...rest,
     headers,
@@ -527,12 +726,24 @@ async function apiFetch(path, options = {}) {
     return null;
   }
 
+  if (response.status === 304 && cached) {
+    return cached.payload;
+  }
+
   const text = await response.text();
   const payload = text ? safeJsonParse(text) : {};
 
   if (!response.ok) {
     const detail = payload?.detail || `请求失败 (${response.status})`;
-    throw new Error(detail);
+    const error = new Error(detail);
+    error.status = response.status;
+    error.payload = payload;
+    throw error;
+  }
+
+  const etag = isGet ? response.headers.get("ETag") : null;
+  if (etag) {
+    state.etags.set(path, { etag, payload });
   }
 
   return payload;
@@ -546,6 +757,69 @@ function safeJsonParse(text) {
   }
 }
 
+async function loadUploadPolicy() {
+  if (!state.uploadPolicy) {
+    try {
+      state.uploadPolicy = await apiFetch("/upload/policy", { skipAuth: true });
+    } catch {
+      return DEFAULT_UPLOAD_POLICY;
+    }
+  }
+  return state.uploadPolicy;
+}
+
+// Downscale and re-encode on a canvas so only what the server keeps crosses the network.
+async function prepareUpload(file) {
+  const policy = await loadUploadPolicy();
+  const image = await loadImage(file);
+  const longest = Math.max(image.naturalWidth, image.naturalHeight);
+  const scale = Math.min(1, policy.max_dimension / longest);
+
+  if (scale === 1 && file.size <= policy.max_bytes && policy.accepted_formats.includes(file.type)) {
+    return fileToDataUrl(file);
+  }
+
+  const canvas = document.createElement("canvas");
+  canvas.width = Math.max(1, Math.round(image.naturalWidth * scale));
+  canvas.height = Math.max(1, Math.round(image.naturalHeight * scale));
+  const context = canvas.getContext("2d");
+  context.imageSmoothingQuality = "high";
+  context.drawImage(image, 0, 0, canvas.width, canvas.height);
+
+  // Browsers that cannot encode the preferred format silently return PNG instead.
+  let blob = await canvasToBlob(canvas, policy.format, policy.quality);
+  if (!blob || blob.type !== policy.format) {
+    blob = await canvasToBlob(canvas, policy.fallback_format, policy.quality);
+  }
+  if (!blob) {
+    throw new Error("图片压缩失败");
+  }
+  if (blob.size > policy.max_bytes) {
+    throw new Error(`图片压缩后仍超过 ${Math.round(policy.max_bytes / 1024 / 1024)} MB，请换一张图片。`);
+  }
+  return fileToDataUrl(blob);
+}
+
+function loadImage(file) {
+  return new Promise((resolve, reject) => {
+    const url = URL.createObjectURL(file);
+    const image = new Image();
+    image.onload = () => {
+      URL.revokeObjectURL(url);
+      resolve(image);
+    };
+    image.onerror = () => {
+      URL.revokeObjectURL(url);
+      reject(new Error("图片读取失败"));
+    };
+    image.src = url;
+  });
+}
+
+function canvasToBlob(canvas, type, quality) {
+  return new Promise((resolve) => canvas.toBlob(resolve, type, quality));
+}
+
 function fileToDataUrl(file) {
   return new Promise((resolve, reject) => {
     const reader = new FileReader();
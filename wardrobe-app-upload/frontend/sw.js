@@ -1,4 +1,4 @@
-﻿const CACHE_NAME = "wardrobe-pwa-v1";
+﻿const CACHE_NAME = "wardrobe-pwa-v3";
 const STATIC_ASSETS = [
   "/",
   "/assets/styles.css",
@@ -12,7 +12,14 @@ self.addEventListener("install", (event) => {
 
 self.addEventListener("activate", (event) => {
   event.waitUntil(
-    caches.keys().then((keys) => Promise.all(keys.filter((key) => key !== CACHE_NAME).map((key) => caches.delete(key))))
+    caches
+      .keys()
+      .then((keys) =>
+        Promise.all(
+          // Only old app-shell caches; the page's wardrobe snapshot cache must survive upgrades.
+          keys.filter((key) => key.startsWith("wardrobe-pwa-") && key !== CACHE_NAME).map((key) => caches.delete(key))
+        )
+      )
   );
 });
 
@@ -21,6 +28,13 @@ self.addEventListener("fetch", (event) => {
     return;
   }
 
+  const url = new URL(event.request.url);
+  // Per-deploy settings must not be pinned by the cache-first path below.
+  if (url.pathname.includes("/api/") || url.pathname.endsWith("/runtime-config.js")) {
+    event.respondWith(networkFirst(event.request));
+    return;
+  }
+
   event.respondWith(
     caches.match(event.request).then((cached) => {
       if (cached) {
@@ -40,4 +54,24 @@ self.addEventListener("fetch", (event) => {
         .catch(() => caches.match("/"));
     })
   );
-});
+});
+
+// API responses: always ask the server first (it answers 304 cheaply when nothing changed),
+// keep a copy only of shared responses, and fall back to it when offline. The cache is keyed by
+// URL alone, so per-user responses are never stored; the page keeps its own per-user snapshot.
+function networkFirst(request) {
+  return fetch(request)
+    .then((response) => {
+      const cacheControl = response.headers.get("Cache-Control") || "";
+      const shared =
+        !request.headers.has("Authorization") &&
+        !cacheControl.includes("private") &&
+        !cacheControl.includes("no-store");
+      if (response.status === 200 && shared) {
+        const cloned = response.clone();
+        caches.open(CACHE_NAME).then((cache) => cache.put(request, cloned));
+      }
+      return response;
+    })
+    .catch(() => caches.match(request).then((cached) => cached || Response.error()));
+}
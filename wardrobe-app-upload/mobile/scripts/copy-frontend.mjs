@@ -14,6 +14,7 @@ if (existsSync(dest)) {
 }
 
 mkdirSync(dest, { recursive: true });
-cpSync(src, dest, { recursive: true });
+// dist/ is the fingerprinted server build; the app shell bundles the plain sources.
+cpSync(src, dest, { recursive: true, filter: (path) => path !== resolve(src, "dist") });
 
 console.log(`Copied frontend -> ${dest}`);